@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Unión de MP3 de Edge TTS sin recodificar.
+
+Cuando entre las partes solo hay silencios (sin crossfade), decodificar cada MP3 con
+pydub y volver a codificar el resultado no aporta nada. Aquí el silencio se genera una
+sola vez como MP3 con los mismos parámetros que la salida de Edge TTS y las partes se
+concatenan con el demuxer concat de FFmpeg copiando el stream (-c copy). Si se pide
+crossfade, o FFmpeg no está disponible o falla, se decodifica a PCM (pcm_audio) y se
+codifica una sola vez al final.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import subprocess
+from pcm_audio import AudioPCM, unir
+
+# Formato de salida por defecto de Edge TTS (audio-24khz-48kbitrate-mono-mp3)
+FRECUENCIA_EDGE_TTS = 24000
+BITRATE_EDGE_TTS = "48k"
+CANALES_EDGE_TTS = 1
+
+_silencios_mp3 = {}
+_lock_silencios = threading.Lock()
+
+def ffmpeg_disponible():
+    return shutil.which("ffmpeg") is not None
+
+def silencio_mp3(duracion_ms):
+    """MP3 de silencio con los parámetros de Edge TTS (se genera una vez por duración)"""
+    with _lock_silencios:
+        if duracion_ms not in _silencios_mp3:
+            canales = "mono" if CANALES_EDGE_TTS == 1 else "stereo"
+            resultado = subprocess.run(
+                ["ffmpeg", "-v", "error", "-f", "lavfi",
+                 "-i", f"anullsrc=r={FRECUENCIA_EDGE_TTS}:cl={canales}",
+                 "-t", f"{duracion_ms / 1000:.3f}",
+                 "-c:a", "libmp3lame", "-b:a", BITRATE_EDGE_TTS, "-f", "mp3", "-"],
+                capture_output=True, check=True
+            )
+            _silencios_mp3[duracion_ms] = resultado.stdout
+        return _silencios_mp3[duracion_ms]
+
+def _unir_con_ffmpeg(partes, ruta_salida):
+    """Concatena MP3 (bytes) con el demuxer concat de FFmpeg sin recodificar"""
+    with tempfile.TemporaryDirectory(prefix="union_mp3_") as carpeta_temp:
+        lista = os.path.join(carpeta_temp, "lista.txt")
+        archivos = {}
+        with open(lista, 'w', encoding='utf-8') as f:
+            for i, datos in enumerate(partes):
+                # Los silencios repetidos se escriben una sola vez
+                ruta = archivos.get(id(datos))
+                if ruta is None:
+                    ruta = os.path.join(carpeta_temp, f"{i:04d}.mp3")
+                    with open(ruta, 'wb') as parte:
+                        parte.write(datos)
+                    archivos[id(datos)] = ruta
+                f.write(f"file '{ruta}'\n")
+        subprocess.run(
+            ["ffmpeg", "-v", "error", "-y", "-f", "concat", "-safe", "0", "-i", lista,
+             "-c", "copy", "-f", "mp3", ruta_salida],
+            capture_output=True, check=True
+        )
+
+def _unir_decodificando(partes, ruta_salida, crossfade_ms=0):
+    """Une decodificando cada parte una vez a PCM (necesario para crossfade) y codifica al final"""
+    audios = [parte if isinstance(parte, int) else AudioPCM.desde_bytes(parte) for parte in partes]
+    unir(audios, crossfade_ms).exportar(ruta_salida, "mp3")
+
+def unir_mp3(partes, ruta_salida, crossfade_ms=0):
+    """Une en orden una lista de partes en ruta_salida.
+    Cada parte es un MP3 en bytes o un entero con la duración en ms de un silencio."""
+    if not partes:
+        raise ValueError("No hay partes de audio que unir")
+    if not crossfade_ms and ffmpeg_disponible():
+        try:
+            _unir_con_ffmpeg([silencio_mp3(p) if isinstance(p, int) else p for p in partes], ruta_salida)
+            return ruta_salida
+        except subprocess.CalledProcessError as e:
+            print(f"Advertencia: Falló la unión sin recodificar ({e.stderr.decode(errors='ignore').strip()}). Se decodifica.")
+    _unir_decodificando(partes, ruta_salida, crossfade_ms)
+    return ruta_salida
@@ -1,24 +1,86 @@
 # -*- coding: utf-8 -*-
 import os
+import time
 import asyncio
-from pydub import AudioSegment
-from tts_engine import edge_tts_sintetizar, add_silence, run_async
-from openai_client import generar_texto_con_openai
-from data_manager import dataframe_a_json
+from tts_engine import (sintetizar_con_reintentos, sintetizar_fragmentado, unir_fragmentos,
+                        run_async, TTS_FRAGMENTOS_SIMULTANEOS)
+from audio_join import unir_mp3, BITRATE_EDGE_TTS
+from openai_client import generar_texto_con_openai_async, generar_texto_stream_async
+from text_chunker import SeparadorOraciones
+from data_manager import fila_a_json
+from entry_store import obtener_almacen
+from output_allocator import reservar_numero, escritura_atomica
 
 # Carpeta de salida
 carpeta_salida = "audios_generados"
 
+# Silencio entre intro, texto y outro
+SILENCIO_MS = 500
+
+# Sintetizar el texto de la IA mientras se genera (por oraciones/párrafos)
+STREAMING_IA = True
+
 async def procesar_entrada_json(indice, df, voz, velocidad, api_key=None):
     """Procesa una entrada de JSON y genera el audio correspondiente"""
-    try:
-        if indice < 0 or indice >= len(df):
-            return None, f"Error: Índice {indice} fuera de rango"
+    if indice < 0 or indice >= len(df):
+        return None, f"Error: Índice {indice} fuera de rango"
+    
+    # Convertir solo la fila solicitada (no toda la tabla)
+    return await procesar_entrada(fila_a_json(df, indice), voz, velocidad, api_key)
+
+def unir_cuerpo(datos_texto):
+    """Une los fragmentos del texto principal en un solo MP3. Dentro de una oración la unión
+    debe ser exacta a nivel de muestra, así que se decodifican y unen como PCM (unir_fragmentos)
+    y se codifican una vez con los parámetros de Edge TTS; la concatenación sin recodificar
+    queda solo para las fronteras intro / silencio / cuerpo / outro."""
+    if len(datos_texto) == 1:
+        return datos_texto[0]
+    return unir_fragmentos(datos_texto).a_bytes("mp3", bitrate=BITRATE_EDGE_TTS)
+
+async def sintetizar_stream_llm(trozos_texto, voz, velocidad, al_fragmento_listo=None, semaforo=None):
+    """Corta el stream del LLM en oraciones/párrafos y sintetiza cada fragmento en cuanto está
+    completo, mientras sigue llegando texto. semaforo limita las peticiones a Edge TTS en curso
+    (por defecto TTS_FRAGMENTOS_SIMULTANEOS, como sintetizar_fragmentado). Devuelve los MP3 de
+    los fragmentos en orden y los segundos hasta que estuvo listo el primero."""
+    separador = SeparadorOraciones()
+    if semaforo is None:
+        semaforo = asyncio.Semaphore(TTS_FRAGMENTOS_SIMULTANEOS)
+    tareas = []
+    inicio = time.perf_counter()
+    primer_fragmento_s = None
+    
+    def lanzar(fragmento):
+        indice = len(tareas)
         
-        # Convertir DataFrame a lista de diccionarios
-        entradas = dataframe_a_json(df)
-        entrada = entradas[indice]
+        async def sintetizar():
+            nonlocal primer_fragmento_s
+            datos = await sintetizar_con_reintentos(fragmento, voz, velocidad, semaforo=semaforo)
+            if indice == 0:
+                primer_fragmento_s = time.perf_counter() - inicio
+            if al_fragmento_listo:
+                al_fragmento_listo(indice, fragmento, datos)
+            return datos
         
+        tareas.append(asyncio.create_task(sintetizar()))
+    
+    try:
+        async for trozo in trozos_texto:
+            for fragmento in separador.agregar(trozo):
+                lanzar(fragmento)
+        for fragmento in separador.finalizar():
+            lanzar(fragmento)
+        if not tareas:
+            raise RuntimeError("OpenAI no devolvió texto")
+        return await asyncio.gather(*tareas), primer_fragmento_s
+    finally:
+        for tarea in tareas:
+            if not tarea.done():
+                tarea.cancel()
+
+async def procesar_entrada(entrada, voz, velocidad, api_key=None, streaming=STREAMING_IA):
+    """Genera el audio de una entrada (diccionario con los campos de audio.json).
+    Con streaming, el texto de la IA se sintetiza por fragmentos mientras se genera."""
+    try:
         # Preparar componentes del audio
         series = entrada["series"]
         part = entrada["part"]
@@ -28,53 +90,60 @@ async def procesar_entrada_json(indice, df, voz, velocidad, api_key=None):
         tipo = entrada.get("tipo", "Historia")
         etiquetas = entrada.get("etiquetas", "")
         
-        # Conseguir el texto principal según si es IA o no
+        # Validar el texto principal antes de lanzar ninguna síntesis
         if entrada["IA"]:
             if not entrada["textAI"]:
                 return None, "Error: El campo textAI está vacío pero IA está activado"
-            
-            texto_generado = generar_texto_con_openai(entrada["textAI"], tipo, etiquetas, api_key)
-            if texto_generado.startswith("Error:"):
-                return None, texto_generado
-            texto_principal = texto_generado
-        else:
-            texto_principal = entrada["text"]
-            if not texto_principal:
-                return None, "Error: El campo text está vacío pero IA está desactivado"
+        elif not entrada["text"]:
+            return None, "Error: El campo text está vacío pero IA está desactivado"
         
         # Componer el texto completo con pausas representadas por puntos
         intro = f"{series}, parte {part}"
         
-        # Generar audio completo
-        nombre_archivo_final = os.path.join(carpeta_salida, f"audio_completo_{abs(hash(str(os.urandom(4)))) % 10000000}.mp3")
-        
-        # Asegurarse de que exista la carpeta de salida
-        os.makedirs(carpeta_salida, exist_ok=True)
-        
-        # Generar componentes por separado y unirlos con silencio
-        archivo_intro = await edge_tts_sintetizar(intro, voz, velocidad)
-        archivo_texto = await edge_tts_sintetizar(texto_principal, voz, velocidad)
-        archivo_outro = await edge_tts_sintetizar(outro, voz, velocidad)
-        
-        # Unir con silencios usando pydub
-        audio_intro = AudioSegment.from_mp3(archivo_intro)
-        audio_texto = AudioSegment.from_mp3(archivo_texto)
-        audio_outro = AudioSegment.from_mp3(archivo_outro)
-        
-        silencio = add_silence(500)  # 0.5 segundos de silencio
+        # Intro y outro no dependen del texto principal: se sintetizan (en memoria, con reintentos)
+        # mientras se genera el texto con la IA y se sintetiza el cuerpo. Todas las síntesis de
+        # la entrada comparten el mismo límite de peticiones a Edge TTS
+        semaforo = asyncio.Semaphore(TTS_FRAGMENTOS_SIMULTANEOS)
+        tarea_intro = asyncio.create_task(sintetizar_con_reintentos(intro, voz, velocidad, semaforo=semaforo))
+        tarea_outro = asyncio.create_task(sintetizar_con_reintentos(outro, voz, velocidad, semaforo=semaforo))
+        try:
+            # Conseguir el texto principal según si es IA o no
+            if entrada["IA"] and streaming:
+                # Se sintetiza cada oración/párrafo en cuanto el LLM lo termina de escribir
+                trozos = generar_texto_stream_async(entrada["textAI"], tipo, etiquetas, api_key)
+                datos_texto, primer_fragmento_s = await sintetizar_stream_llm(trozos, voz, velocidad, semaforo=semaforo)
+                detalle = f" (primer fragmento de audio en {primer_fragmento_s:.1f}s)"
+            else:
+                if entrada["IA"]:
+                    # Cliente asíncrono: no bloquea el event loop mientras intro/outro se sintetizan
+                    texto_generado = await generar_texto_con_openai_async(entrada["textAI"], tipo, etiquetas, api_key)
+                    if texto_generado.startswith("Error:"):
+                        return None, texto_generado
+                    texto_principal = texto_generado
+                else:
+                    texto_principal = entrada["text"]
+                
+                # Textos largos: fragmentos por oraciones sintetizados en paralelo
+                datos_texto = await sintetizar_fragmentado(texto_principal, voz, velocidad, semaforo=semaforo)
+                detalle = ""
+            datos_intro, datos_outro = await asyncio.gather(tarea_intro, tarea_outro)
+        finally:
+            # Si algo falla antes de terminar, no dejar síntesis huérfanas
+            for tarea in (tarea_intro, tarea_outro):
+                if not tarea.done():
+                    tarea.cancel()
         
-        audio_final = audio_intro + silencio + audio_texto + silencio + audio_outro
-        audio_final.export(nombre_archivo_final, format="mp3")
+        # Unir con silencios: el cuerpo se une como PCM y, sin crossfade, las cinco partes
+        # se concatenan sin recodificar (FFmpeg concat)
+        datos_cuerpo = await asyncio.to_thread(unir_cuerpo, datos_texto)
+        partes = [datos_intro, SILENCIO_MS, datos_cuerpo, SILENCIO_MS, datos_outro]
         
-        # Limpiar archivos temporales
-        try:
-            os.remove(archivo_intro)
-            os.remove(archivo_texto)
-            os.remove(archivo_outro)
-        except Exception as e:
-            print(f"Advertencia: No se pudieron eliminar archivos temporales: {e}")
+        # Nombre único (contador persistente de la carpeta) y escritura atómica
+        nombre_archivo_final = os.path.join(carpeta_salida, f"audio_completo_{reservar_numero(carpeta_salida):06d}.mp3")
+        with escritura_atomica(nombre_archivo_final) as ruta_temp:
+            await asyncio.to_thread(unir_mp3, partes, ruta_temp)
         
-        return nombre_archivo_final, f"Audio generado exitosamente para '{series}, parte {part}'"
+        return nombre_archivo_final, f"Audio generado exitosamente para '{series}, parte {part}'{detalle}"
         
     except Exception as e:
         print(f"Error procesando entrada JSON: {e}")
@@ -92,4 +161,20 @@ def generar_audio_desde_json(indice, df, voz_edge, velocidad, api_key=None):
     except ValueError:
         return None, "Error: El índice debe ser un número válido"
     except Exception as e:
-        return None, f"Error inesperado: {str(e)}"
\ No newline at end of file
+        return None, f"Error inesperado: {str(e)}"
+
+def generar_audio_desde_almacen(indice, voz_edge, velocidad, api_key=None):
+    """Genera audio para una fila de la base de datos SQLite (lee solo esa fila)"""
+    try:
+        id_entrada = int(indice)
+        if id_entrada < 1:
+            return None, "Error: El índice debe ser un número positivo"
+        
+        entrada = obtener_almacen().obtener(id_entrada)
+        if entrada is None:
+            return None, f"Error: La fila {id_entrada} no existe en la base de datos"
+        return run_async(procesar_entrada, entrada, voz_edge, velocidad, api_key)
+    except ValueError:
+        return None, "Error: El índice debe ser un número válido"
+    except Exception as e:
+        return None, f"Error inesperado: {str(e)}"
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""Procesamiento por lotes (sin interfaz) de las filas de audio.json.
+
+Uso:
+    python batch_runner.py --json audio.json --workers 4 --tipo Historia --ia si --desde 1 --hasta 50
+
+El estado de cada fila se guarda en audios_generados/lote_estado.json, de modo que
+si el proceso se interrumpe, al volver a lanzarlo solo se procesan las filas pendientes.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from tts_engine import voz_defecto_corta, carpeta_salida, run_async
+from audio_processor import procesar_entrada
+from data_manager import DEFAULT_JSON_PATH, cargar_entradas_json
+
+# Archivo con el estado por fila del lote (permite reanudar tras un fallo)
+ARCHIVO_ESTADO_LOTE = os.path.join(carpeta_salida, "lote_estado.json")
+WORKERS_POR_DEFECTO = 4
+
+def clave_fila(indice, entrada):
+    """Identifica una fila por su posición y contenido (si se edita, se vuelve a procesar)"""
+    contenido = json.dumps(entrada, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{indice + 1}:{hashlib.sha1(contenido.encode('utf-8')).hexdigest()[:12]}"
+
+def filtrar_entradas(entradas, tipo=None, ia=None, desde=None, hasta=None):
+    """Devuelve [(indice, entrada)] que cumplen los filtros (desde/hasta en base 1, inclusivos)"""
+    seleccion = []
+    for indice, entrada in enumerate(entradas):
+        numero = indice + 1
+        if desde is not None and numero < desde:
+            continue
+        if hasta is not None and numero > hasta:
+            continue
+        if tipo and entrada.get("tipo", "Historia") != tipo:
+            continue
+        if ia is not None and bool(entrada.get("IA")) != ia:
+            continue
+        seleccion.append((indice, entrada))
+    return seleccion
+
+def cargar_estado(ruta=ARCHIVO_ESTADO_LOTE):
+    """Carga el estado guardado de un lote anterior"""
+    if not os.path.exists(ruta):
+        return {}
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            return json.load(f).get("filas", {})
+    except Exception as e:
+        print(f"Advertencia: No se pudo leer el estado del lote ({e}). Empezando de cero.")
+        return {}
+
+def guardar_estado(estado, resumen=None, ruta=ARCHIVO_ESTADO_LOTE):
+    """Guarda el estado del lote de forma atómica (temporal + os.replace)"""
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    ruta_temp = f"{ruta}.tmp"
+    with open(ruta_temp, 'w', encoding='utf-8') as f:
+        json.dump({"filas": estado, "resumen": resumen}, f, indent=4, ensure_ascii=False)
+    os.replace(ruta_temp, ruta)
+
+def fila_completada(info):
+    """Una fila está completa si terminó bien y su audio sigue en disco"""
+    return bool(info) and info.get("estado") == "ok" and os.path.exists(info.get("archivo") or "")
+
+async def procesar_lote(entradas, voz, velocidad, api_key=None, workers=WORKERS_POR_DEFECTO,
+                        ruta_estado=ARCHIVO_ESTADO_LOTE, reiniciar=False):
+    """Procesa las entradas [(indice, entrada)] con un pool de workers y devuelve el resumen"""
+    estado = {} if reiniciar else cargar_estado(ruta_estado)
+    pendientes = []
+    omitidas = 0
+    for indice, entrada in entradas:
+        clave = clave_fila(indice, entrada)
+        if fila_completada(estado.get(clave)):
+            omitidas += 1
+            continue
+        estado[clave] = {"fila": indice + 1, "estado": "pendiente", "archivo": None, "mensaje": "", "duracion_s": None}
+        pendientes.append((clave, entrada))
+
+    print(f"Filas seleccionadas: {len(entradas)} | ya completadas: {omitidas} | pendientes: {len(pendientes)}")
+    guardar_estado(estado, ruta=ruta_estado)
+
+    cola = asyncio.Queue()
+    for item in pendientes:
+        cola.put_nowait(item)
+    lock_estado = asyncio.Lock()
+    inicio_lote = time.perf_counter()
+
+    async def worker(numero_worker):
+        while True:
+            try:
+                clave, entrada = cola.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            info = estado[clave]
+            info["estado"] = "procesando"
+            inicio = time.perf_counter()
+            try:
+                archivo, mensaje = await procesar_entrada(entrada, voz, velocidad, api_key)
+            except Exception as e:
+                archivo, mensaje = None, f"Error: {str(e)}"
+            info.update({
+                "estado": "ok" if archivo else "error",
+                "archivo": archivo,
+                "mensaje": mensaje,
+                "duracion_s": round(time.perf_counter() - inicio, 2),
+            })
+            print(f"[worker {numero_worker}] Fila {info['fila']}: {info['estado']} ({info['duracion_s']}s) {mensaje}")
+            async with lock_estado:
+                guardar_estado(estado, ruta=ruta_estado)
+            cola.task_done()
+
+    await asyncio.gather(*(worker(i + 1) for i in range(max(1, workers))))
+
+    duracion = time.perf_counter() - inicio_lote
+    procesadas = [estado[clave] for clave, _ in pendientes]
+    correctas = [info for info in procesadas if info["estado"] == "ok"]
+    fallidas = [info for info in procesadas if info["estado"] == "error"]
+    resumen = {
+        "seleccionadas": len(entradas),
+        "omitidas": omitidas,
+        "procesadas": len(procesadas),
+        "correctas": len(correctas),
+        "fallidas": len(fallidas),
+        "duracion_s": round(duracion, 2),
+        "filas_por_minuto": round(len(procesadas) / duracion * 60, 2) if duracion > 0 else 0.0,
+        "workers": workers,
+        "errores": {str(info["fila"]): info["mensaje"] for info in fallidas},
+    }
+    guardar_estado(estado, resumen, ruta=ruta_estado)
+    return resumen
+
+def imprimir_resumen(resumen):
+    """Muestra el resumen del lote"""
+    print("=" * 60)
+    print("RESUMEN DEL LOTE")
+    print("-" * 60)
+    print(f"Filas seleccionadas: {resumen['seleccionadas']} (omitidas por estar completas: {resumen['omitidas']})")
+    print(f"Procesadas: {resumen['procesadas']} | Correctas: {resumen['correctas']} | Fallidas: {resumen['fallidas']}")
+    print(f"Duración: {resumen['duracion_s']}s | Rendimiento: {resumen['filas_por_minuto']} filas/min con {resumen['workers']} workers")
+    for fila, mensaje in resumen["errores"].items():
+        print(f"  Fila {fila}: {mensaje}")
+    print("=" * 60)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera en lote los audios de un archivo audio.json")
+    parser.add_argument("--json", default=DEFAULT_JSON_PATH, help="Ruta del archivo JSON de entradas")
+    parser.add_argument("--voz", default=voz_defecto_corta, help="Voz de Edge TTS (nombre corto)")
+    parser.add_argument("--velocidad", type=float, default=1.0, help="Velocidad de habla (1.0 = normal)")
+    parser.add_argument("--workers", type=int, default=WORKERS_POR_DEFECTO, help="Filas procesadas en paralelo")
+    parser.add_argument("--tipo", default=None, help="Procesar solo filas de este tipo")
+    parser.add_argument("--ia", choices=["si", "no"], default=None, help="Filtrar por el campo IA")
+    parser.add_argument("--desde", type=int, default=None, help="Primera fila a procesar (base 1)")
+    parser.add_argument("--hasta", type=int, default=None, help="Última fila a procesar (base 1, inclusiva)")
+    parser.add_argument("--api-key", default=None, help="API Key de OpenAI (opcional)")
+    parser.add_argument("--estado", default=ARCHIVO_ESTADO_LOTE, help="Archivo de estado para reanudar")
+    parser.add_argument("--reiniciar", action="store_true", help="Ignorar el estado previo y procesar todo")
+    args = parser.parse_args(argv)
+
+    try:
+        entradas = cargar_entradas_json(args.json)
+    except Exception as e:
+        print(f"Error al cargar {args.json}: {e}")
+        return 1
+
+    ia = None if args.ia is None else args.ia == "si"
+    seleccion = filtrar_entradas(entradas, args.tipo, ia, args.desde, args.hasta)
+    if not seleccion:
+        print("No hay filas que cumplan los filtros.")
+        return 0
+
+    resumen = run_async(procesar_lote, seleccion, args.voz, args.velocidad, args.api_key,
+                        args.workers, args.estado, args.reiniciar)
+    imprimir_resumen(resumen)
+    return 1 if resumen["fallidas"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
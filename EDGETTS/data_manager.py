@@ -2,7 +2,11 @@
 import os
 import json
 import time
+import atexit
+import hashlib
+import threading
 import pandas as pd
+from output_allocator import escribir_atomico
 
 # Ruta al archivo JSON predeterminado
 DEFAULT_JSON_PATH = os.path.join(os.path.dirname(__file__), "audio.json")
@@ -10,21 +14,43 @@ DEFAULT_JSON_PATH = os.path.join(os.path.dirname(__file__), "audio.json")
 # Tipos válidos para el selector de tipo de contenido
 TIPOS_CONTENIDO = ["Historia", "Resumen", "Cuento", "Fantasía", "Chisme", "Curiosidades", "Datos"]
 
+# Valores de una fila nueva
+FILA_VACIA = {
+    "series": "",
+    "seed": "random",
+    "part": "1",
+    "IA": False,
+    "outro": "",
+    "text": "",
+    "textAI": "",
+    "randomVideo": False,
+    "video": "",
+    "tipo": "Historia",
+    "etiquetas": ""
+}
+
+# Autoguardado diferido: las ediciones dentro de esta ventana se agrupan en una sola escritura
+RETARDO_AUTOGUARDADO_S = 1.5
+_lock_guardado = threading.Lock()
+_lock_escritura = threading.Lock()
+_temporizador_guardado = None
+_df_pendiente = None
+_ultimo_hash_guardado = None  # Hash del último contenido escrito/leído de audio.json
+
 def inicializar_tabla():
     """Inicializa la tabla con datos del archivo audio.json o con datos de ejemplo si no existe"""
+    global _ultimo_hash_guardado
     try:
         # Intentar cargar desde audio.json
         if os.path.exists(DEFAULT_JSON_PATH):
-            with open(DEFAULT_JSON_PATH, 'r', encoding='utf-8') as f:
-                datos_json = json.load(f)
+            with open(DEFAULT_JSON_PATH, 'rb') as f:
+                contenido = f.read()
+                _ultimo_hash_guardado = hashlib.sha256(contenido).hexdigest()
+                datos_json = json.loads(contenido.decode('utf-8'))
                 print(f"Archivo {DEFAULT_JSON_PATH} cargado correctamente.")
                 
                 # Asegurar que los datos existentes tengan los nuevos campos
-                for item in datos_json:
-                    if "tipo" not in item:
-                        item["tipo"] = "Historia"  # Valor por defecto
-                    if "etiquetas" not in item:
-                        item["etiquetas"] = ""
+                completar_campos(datos_json)
                 
                 return pd.DataFrame(datos_json)
         else:
@@ -64,6 +90,29 @@ def inicializar_tabla():
     
     return pd.DataFrame(data)
 
+def normalizar_booleano(valor):
+    """Convierte booleanos representados como strings a booleanos reales"""
+    return valor == 'True' if isinstance(valor, str) else bool(valor)
+
+def completar_campos(datos_json):
+    """Asegura que las entradas tengan los campos nuevos (tipo y etiquetas)"""
+    for item in datos_json:
+        if "tipo" not in item:
+            item["tipo"] = "Historia"  # Valor por defecto
+        if "etiquetas" not in item:
+            item["etiquetas"] = ""
+    return datos_json
+
+def cargar_entradas_json(ruta=DEFAULT_JSON_PATH):
+    """Carga las entradas de un archivo JSON como lista de diccionarios (sin pandas)"""
+    with open(ruta, 'r', encoding='utf-8') as f:
+        datos_json = completar_campos(json.load(f))
+    for item in datos_json:
+        for col in ['IA', 'randomVideo']:
+            if col in item:
+                item[col] = normalizar_booleano(item[col])
+    return datos_json
+
 def dataframe_a_json(df):
     """Convierte un DataFrame a formato JSON"""
     # Convertir tipos de datos para asegurar compatibilidad JSON
@@ -72,26 +121,49 @@ def dataframe_a_json(df):
     # Convertir booleanos representados como strings a booleanos reales
     for col in ['IA', 'randomVideo']:
         if col in df_copy.columns:
-            df_copy[col] = df_copy[col].apply(lambda x: x == 'True' if isinstance(x, str) else bool(x))
+            df_copy[col] = df_copy[col].apply(normalizar_booleano)
     
     # Convertir a lista de diccionarios (formato JSON)
     return df_copy.to_dict('records')
 
+def fila_a_json(df, indice):
+    """Convierte una sola fila del DataFrame a diccionario, sin copiar la tabla completa"""
+    entrada = df.iloc[indice].to_dict()
+    for col in ['IA', 'randomVideo']:
+        if col in entrada:
+            entrada[col] = normalizar_booleano(entrada[col])
+    return entrada
+
+def _escribir_json(datos_json, ruta=DEFAULT_JSON_PATH):
+    """Escribe el JSON de forma atómica; devuelve False si el contenido no cambió desde la última escritura"""
+    global _ultimo_hash_guardado
+    contenido = json.dumps(datos_json, indent=4, ensure_ascii=False).encode('utf-8')
+    hash_contenido = hashlib.sha256(contenido).hexdigest()
+    with _lock_escritura:
+        if hash_contenido == _ultimo_hash_guardado:
+            return False
+        escribir_atomico(ruta, contenido)
+        _ultimo_hash_guardado = hash_contenido
+    return True
+
+def _cancelar_guardado_pendiente():
+    """Cancela el guardado diferido (si lo hay) y devuelve el DataFrame que estaba pendiente"""
+    global _temporizador_guardado, _df_pendiente
+    with _lock_guardado:
+        if _temporizador_guardado is not None:
+            _temporizador_guardado.cancel()
+            _temporizador_guardado = None
+        df, _df_pendiente = _df_pendiente, None
+    return df
+
 def guardar_json_auto(df):
-    """Guarda automáticamente el dataframe en el archivo audio.json"""
+    """Guarda inmediatamente el dataframe en el archivo audio.json (descarta cualquier guardado diferido)"""
+    _cancelar_guardado_pendiente()
     try:
-        datos_json = dataframe_a_json(df)
-        
-        # Asegurar que el directorio existe
-        directorio = os.path.dirname(DEFAULT_JSON_PATH)
-        if directorio and not os.path.exists(directorio):
-            os.makedirs(directorio)
-            
-        # Guardar con codificación UTF-8
-        with open(DEFAULT_JSON_PATH, 'w', encoding='utf-8') as f:
-            json.dump(datos_json, f, indent=4, ensure_ascii=False)
-        
-        mensaje = f"Datos guardados correctamente en {DEFAULT_JSON_PATH}"
+        if _escribir_json(dataframe_a_json(df)):
+            mensaje = f"Datos guardados correctamente en {DEFAULT_JSON_PATH}"
+        else:
+            mensaje = f"Sin cambios que guardar en {DEFAULT_JSON_PATH}"
         print(mensaje)
         return mensaje
     except Exception as e:
@@ -99,6 +171,28 @@ def guardar_json_auto(df):
         print(error)
         return error
 
+def guardar_pendiente():
+    """Escribe ya el último DataFrame pendiente del guardado diferido (si lo hay)"""
+    df = _cancelar_guardado_pendiente()
+    if df is not None:
+        return guardar_json_auto(df)
+    return None
+
+def programar_guardado(df, retardo=RETARDO_AUTOGUARDADO_S):
+    """Agrupa las ediciones: solo se escribe el último estado tras 'retardo' segundos sin cambios"""
+    global _temporizador_guardado, _df_pendiente
+    with _lock_guardado:
+        if _temporizador_guardado is not None:
+            _temporizador_guardado.cancel()
+        _df_pendiente = df
+        _temporizador_guardado = threading.Timer(retardo, guardar_pendiente)
+        _temporizador_guardado.daemon = True
+        _temporizador_guardado.start()
+    return f"Cambios pendientes. Se guardarán en {retardo:g}s sin ediciones."
+
+# No perder el último cambio si el proceso termina con un guardado pendiente
+atexit.register(guardar_pendiente)
+
 def cargar_json(archivo_json):
     """Carga datos desde un archivo JSON subido"""
     try:
@@ -109,11 +203,7 @@ def cargar_json(archivo_json):
         datos_json = json.loads(contenido)
         
         # Asegurar que los datos cargados tengan los nuevos campos
-        for item in datos_json:
-            if "tipo" not in item:
-                item["tipo"] = "Historia"  # Valor por defecto
-            if "etiquetas" not in item:
-                item["etiquetas"] = ""
+        completar_campos(datos_json)
                 
         df = pd.DataFrame(datos_json)
         guardar_json_auto(df)  # Guardar en el archivo predeterminado
@@ -147,25 +237,13 @@ def crear_archivo_json(texto_json):
         return None
 
 def on_table_change(df):
-    """Maneja los cambios en la tabla y los guarda automáticamente"""
-    mensaje = guardar_json_auto(df)
+    """Maneja los cambios en la tabla y programa su guardado automático"""
+    mensaje = programar_guardado(df)
     return df, mensaje
 
 def agregar_fila(df):
     """Agrega una fila vacía al DataFrame"""
-    nueva_fila = pd.DataFrame([{
-        "series": "",
-        "seed": "random",
-        "part": "1",
-        "IA": False,
-        "outro": "",
-        "text": "",
-        "textAI": "",
-        "randomVideo": False,
-        "video": "",
-        "tipo": "Historia",
-        "etiquetas": ""
-    }])
+    nueva_fila = pd.DataFrame([dict(FILA_VACIA)])
     df_nuevo = pd.concat([df, nueva_fila], ignore_index=True)
-    guardar_json_auto(df_nuevo)
+    programar_guardado(df_nuevo)
     return df_nuevo, f"Nueva fila agregada. Total: {len(df_nuevo)} filas"
\ No newline at end of file
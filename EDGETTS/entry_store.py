@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""Almacenamiento alternativo de entradas en SQLite.
+
+A diferencia de audio.json (que se carga y reescribe completo en cada cambio),
+aquí agregar, actualizar u obtener una fila solo toca esa fila, y la tabla de la
+interfaz se puede paginar sin cargar todo el conjunto de datos en memoria.
+"""
+import os
+import json
+import sqlite3
+import threading
+import pandas as pd
+
+from data_manager import DEFAULT_JSON_PATH, FILA_VACIA, cargar_entradas_json, completar_campos, normalizar_booleano
+
+# Ruta de la base de datos (junto a audio.json por defecto)
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), "audio.db")
+TAMANO_PAGINA = 50
+
+# Columnas en el mismo orden que audio.json
+COLUMNAS = ["series", "seed", "part", "IA", "outro", "text", "textAI", "randomVideo", "video", "tipo", "etiquetas"]
+COLUMNAS_BOOLEANAS = ["IA", "randomVideo"]
+
+class AlmacenEntradas:
+    """Entradas de audio guardadas en SQLite con índice por series/part/tipo"""
+
+    def __init__(self, ruta=DEFAULT_DB_PATH):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        # Gradio atiende callbacks desde varios hilos: una conexión protegida por lock
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.row_factory = sqlite3.Row
+        with self._conexion:
+            self._conexion.execute("PRAGMA journal_mode=WAL")
+            self._conexion.execute(f"""
+                CREATE TABLE IF NOT EXISTS entradas (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    {", ".join(f'"{c}" {"INTEGER" if c in COLUMNAS_BOOLEANAS else "TEXT"}' for c in COLUMNAS)}
+                )
+            """)
+            self._conexion.execute(
+                "CREATE INDEX IF NOT EXISTS idx_entradas_series_part_tipo ON entradas (series, part, tipo)"
+            )
+            # Origen de las filas importadas ("<ruta del JSON>#<posición>"); NULL en las creadas
+            # desde la interfaz. Bases anteriores no tienen la columna: se agrega
+            columnas_tabla = {fila["name"] for fila in self._conexion.execute("PRAGMA table_info(entradas)")}
+            if "origen" not in columnas_tabla:
+                self._conexion.execute("ALTER TABLE entradas ADD COLUMN origen TEXT")
+            self._conexion.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_entradas_origen ON entradas (origen)")
+
+    @staticmethod
+    def _a_valores(entrada):
+        """Normaliza una entrada (diccionario) a la tupla de valores de las columnas"""
+        entrada = completar_campos([dict(entrada)])[0]
+        valores = []
+        for col in COLUMNAS:
+            valor = entrada.get(col, "")
+            if col in COLUMNAS_BOOLEANAS:
+                valor = int(normalizar_booleano(valor))
+            elif valor is None:
+                valor = ""
+            else:
+                valor = str(valor)
+            valores.append(valor)
+        return valores
+
+    @staticmethod
+    def _a_entrada(fila, incluir_id=False):
+        entrada = {col: fila[col] for col in COLUMNAS}
+        for col in COLUMNAS_BOOLEANAS:
+            entrada[col] = bool(entrada[col])
+        if incluir_id:
+            entrada = {"id": fila["id"], **entrada}
+        return entrada
+
+    def agregar(self, entrada):
+        """Agrega una entrada y devuelve su id (número de fila, base 1)"""
+        columnas = ", ".join(f'"{c}"' for c in COLUMNAS)
+        marcadores = ", ".join("?" for _ in COLUMNAS)
+        with self._lock, self._conexion:
+            cursor = self._conexion.execute(
+                f"INSERT INTO entradas ({columnas}) VALUES ({marcadores})", self._a_valores(entrada)
+            )
+            return cursor.lastrowid
+
+    def agregar_varias(self, entradas):
+        """Agrega varias entradas en una sola transacción"""
+        columnas = ", ".join(f'"{c}"' for c in COLUMNAS)
+        marcadores = ", ".join("?" for _ in COLUMNAS)
+        with self._lock, self._conexion:
+            self._conexion.executemany(
+                f"INSERT INTO entradas ({columnas}) VALUES ({marcadores})",
+                [self._a_valores(e) for e in entradas]
+            )
+
+    def actualizar(self, id_entrada, entrada):
+        """Actualiza una entrada existente por id"""
+        asignaciones = ", ".join(f'"{c}" = ?' for c in COLUMNAS)
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                f"UPDATE entradas SET {asignaciones} WHERE id = ?", [*self._a_valores(entrada), int(id_entrada)]
+            )
+
+    def actualizar_varias(self, entradas_con_id):
+        """Actualiza varias entradas (cada una con su campo 'id') en una sola transacción"""
+        asignaciones = ", ".join(f'"{c}" = ?' for c in COLUMNAS)
+        with self._lock, self._conexion:
+            self._conexion.executemany(
+                f"UPDATE entradas SET {asignaciones} WHERE id = ?",
+                [[*self._a_valores(e), int(e["id"])] for e in entradas_con_id]
+            )
+
+    def obtener(self, id_entrada):
+        """Devuelve la entrada con ese id (o None)"""
+        with self._lock:
+            fila = self._conexion.execute("SELECT * FROM entradas WHERE id = ?", (int(id_entrada),)).fetchone()
+        return self._a_entrada(fila) if fila else None
+
+    def buscar(self, series=None, part=None, tipo=None):
+        """Busca entradas por series/part/tipo usando el índice"""
+        condiciones, valores = [], []
+        for col, valor in (("series", series), ("part", part), ("tipo", tipo)):
+            if valor is not None:
+                condiciones.append(f"{col} = ?")
+                valores.append(str(valor))
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        with self._lock:
+            filas = self._conexion.execute(f"SELECT * FROM entradas {where} ORDER BY id", valores).fetchall()
+        return [self._a_entrada(f, incluir_id=True) for f in filas]
+
+    def contar(self):
+        with self._lock:
+            return self._conexion.execute("SELECT COUNT(*) FROM entradas").fetchone()[0]
+
+    def pagina(self, numero_pagina=1, tamano=TAMANO_PAGINA):
+        """Devuelve las entradas de una página (base 1), incluyendo su id"""
+        desplazamiento = max(0, int(numero_pagina) - 1) * int(tamano)
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT * FROM entradas ORDER BY id LIMIT ? OFFSET ?", (int(tamano), desplazamiento)
+            ).fetchall()
+        return [self._a_entrada(f, incluir_id=True) for f in filas]
+
+    def importar_json(self, ruta=DEFAULT_JSON_PATH):
+        """Importa las entradas de un archivo JSON. Cada entrada se identifica por su posición en
+        el archivo: la primera importación las agrega al final y las siguientes actualizan esas
+        mismas filas (las entradas editadas en el JSON se reflejan, nada se duplica ni se
+        descarta). Devuelve (agregadas, actualizadas)."""
+        entradas = cargar_entradas_json(ruta)
+        ruta_origen = os.path.abspath(ruta)
+        prefijo = f"{ruta_origen}#"
+        origenes = [f"{prefijo}{posicion}" for posicion in range(len(entradas))]
+        columnas = ", ".join(f'"{c}"' for c in [*COLUMNAS, "origen"])
+        marcadores = ", ".join("?" for _ in range(len(COLUMNAS) + 1))
+        asignaciones = ", ".join(f'"{c}" = excluded."{c}"' for c in COLUMNAS)
+        with self._lock, self._conexion:
+            # Filas de este archivo que ya estaban importadas (para el recuento)
+            existentes = {fila["origen"] for fila in self._conexion.execute(
+                "SELECT origen FROM entradas WHERE substr(origen, 1, ?) = ?",
+                (len(prefijo), prefijo)
+            )}
+            self._conexion.executemany(
+                f"INSERT INTO entradas ({columnas}) VALUES ({marcadores}) "
+                f"ON CONFLICT(origen) DO UPDATE SET {asignaciones}",
+                [[*self._a_valores(entrada), origen] for entrada, origen in zip(entradas, origenes)]
+            )
+        actualizadas = sum(1 for origen in origenes if origen in existentes)
+        return len(entradas) - actualizadas, actualizadas
+
+    def exportar_json(self, ruta):
+        """Exporta todas las entradas al formato de audio.json"""
+        with self._lock:
+            filas = self._conexion.execute("SELECT * FROM entradas ORDER BY id").fetchall()
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump([self._a_entrada(fila) for fila in filas], f, indent=4, ensure_ascii=False)
+        return len(filas)
+
+    def cerrar(self):
+        with self._lock:
+            self._conexion.close()
+
+
+_almacen = None
+_lock_almacen = threading.Lock()
+
+def obtener_almacen(ruta=DEFAULT_DB_PATH):
+    """Devuelve el almacén compartido (lo crea la primera vez)"""
+    global _almacen
+    with _lock_almacen:
+        if _almacen is None:
+            _almacen = AlmacenEntradas(ruta)
+        return _almacen
+
+# --- Callbacks para la pestaña de base de datos de la interfaz ---
+
+def _total_paginas(almacen, tamano=TAMANO_PAGINA):
+    return max(1, -(-almacen.contar() // tamano))
+
+def cargar_pagina(numero_pagina, tamano=TAMANO_PAGINA):
+    """Carga solo las filas de una página en la tabla de la interfaz"""
+    try:
+        almacen = obtener_almacen()
+        total = _total_paginas(almacen, tamano)
+        numero_pagina = min(max(1, int(numero_pagina or 1)), total)
+        df = pd.DataFrame(almacen.pagina(numero_pagina, tamano), columns=["id"] + COLUMNAS)
+        return df, numero_pagina, f"Página {numero_pagina}/{total} ({almacen.contar()} filas en {almacen.ruta})"
+    except Exception as e:
+        return pd.DataFrame(columns=["id"] + COLUMNAS), 1, f"Error al cargar la página: {str(e)}"
+
+def guardar_pagina(df):
+    """Guarda en la base de datos solo las filas de la página editada"""
+    try:
+        registros = [r for r in df.to_dict('records') if str(r.get("id", "")).strip()]
+        obtener_almacen().actualizar_varias(registros)
+        return f"{len(registros)} filas guardadas en la base de datos"
+    except Exception as e:
+        return f"Error al guardar la página: {str(e)}"
+
+def agregar_fila_bd(tamano=TAMANO_PAGINA):
+    """Agrega una fila vacía y muestra la última página"""
+    try:
+        almacen = obtener_almacen()
+        id_nuevo = almacen.agregar(FILA_VACIA)
+        df, numero_pagina, _ = cargar_pagina(_total_paginas(almacen, tamano), tamano)
+        return df, numero_pagina, f"Nueva fila agregada (#{id_nuevo}). Total: {almacen.contar()} filas"
+    except Exception as e:
+        return pd.DataFrame(columns=["id"] + COLUMNAS), 1, f"Error al agregar fila: {str(e)}"
+
+def importar_json_bd(ruta=DEFAULT_JSON_PATH):
+    """Importa audio.json a la base de datos y muestra la primera página"""
+    try:
+        agregadas, actualizadas = obtener_almacen().importar_json(ruta)
+        df, numero_pagina, estado = cargar_pagina(1)
+        return df, numero_pagina, f"{agregadas} entradas agregadas y {actualizadas} actualizadas desde {ruta}. {estado}"
+    except Exception as e:
+        return pd.DataFrame(columns=["id"] + COLUMNAS), 1, f"Error al importar {ruta}: {str(e)}"
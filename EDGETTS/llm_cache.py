@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""Caché persistente de respuestas de LLM compartida por EDGETTS y NewEdgeTTS.
+
+La clave es un hash estable (SHA-256) de los parámetros de la petición: modelo,
+prompts del sistema y del usuario, seed y demás opciones. Como la seed también se
+calcula con un hash estable (no con hash(), que cambia en cada proceso), repetir
+un lote tras un fallo o refrescar la interfaz reutiliza las respuestas ya pagadas.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+ARCHIVO_CACHE_LLM = os.environ.get(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "llm_respuestas.db")
+)
+TTL_CACHE_LLM_DIAS = float(os.environ.get("LLM_CACHE_TTL_DAYS", "30"))
+MAX_ENTRADAS_CACHE_LLM = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+def semilla_estable(texto, modulo=10000000):
+    """Seed determinista para un texto (igual en todos los procesos y ejecuciones)"""
+    return int(hashlib.sha256(texto.encode('utf-8')).hexdigest()[:12], 16) % modulo
+
+def clave_peticion(peticion):
+    """Hash estable de los parámetros de una petición de chat"""
+    contenido = json.dumps(peticion, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+class CacheLLM:
+    """Respuestas de LLM en SQLite con caducidad (TTL) y límite de entradas (LRU)"""
+
+    def __init__(self, ruta=ARCHIVO_CACHE_LLM, ttl_dias=TTL_CACHE_LLM_DIAS, max_entradas=MAX_ENTRADAS_CACHE_LLM):
+        self.ruta = ruta
+        self.ttl_s = ttl_dias * 86400
+        self.max_entradas = max_entradas
+        self.aciertos = 0
+        self.fallos = 0
+        self._lock = threading.Lock()
+        self._conexion = None
+
+    def _conectar(self):
+        if self._conexion is None:
+            os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+            self._conexion = sqlite3.connect(self.ruta, check_same_thread=False)
+            with self._conexion:
+                self._conexion.execute(
+                    "CREATE TABLE IF NOT EXISTS respuestas ("
+                    "clave TEXT PRIMARY KEY, respuesta TEXT NOT NULL, creado REAL NOT NULL, usado REAL NOT NULL)"
+                )
+                self._conexion.execute("CREATE INDEX IF NOT EXISTS idx_respuestas_usado ON respuestas (usado)")
+        return self._conexion
+
+    def obtener(self, peticion):
+        """Devuelve la respuesta guardada para la petición o None (si no existe o caducó)"""
+        clave = clave_peticion(peticion)
+        ahora = time.time()
+        with self._lock:
+            conexion = self._conectar()
+            fila = conexion.execute("SELECT respuesta, creado FROM respuestas WHERE clave = ?", (clave,)).fetchone()
+            if fila is None or ahora - fila[1] > self.ttl_s:
+                if fila is not None:
+                    with conexion:
+                        conexion.execute("DELETE FROM respuestas WHERE clave = ?", (clave,))
+                self.fallos += 1
+                return None
+            with conexion:
+                conexion.execute("UPDATE respuestas SET usado = ? WHERE clave = ?", (ahora, clave))
+            self.aciertos += 1
+            return fila[0]
+
+    def guardar(self, peticion, respuesta):
+        """Guarda una respuesta y expulsa las menos usadas si se supera el límite"""
+        if not respuesta:
+            return
+        clave = clave_peticion(peticion)
+        ahora = time.time()
+        with self._lock:
+            conexion = self._conectar()
+            with conexion:
+                conexion.execute(
+                    "INSERT OR REPLACE INTO respuestas (clave, respuesta, creado, usado) VALUES (?, ?, ?, ?)",
+                    (clave, respuesta, ahora, ahora)
+                )
+                conexion.execute("DELETE FROM respuestas WHERE creado < ?", (ahora - self.ttl_s,))
+                conexion.execute(
+                    "DELETE FROM respuestas WHERE clave IN ("
+                    "SELECT clave FROM respuestas ORDER BY usado DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entradas,)
+                )
+
+    def estadisticas(self):
+        with self._lock:
+            entradas = self._conectar().execute("SELECT COUNT(*) FROM respuestas").fetchone()[0]
+        return {"aciertos": self.aciertos, "fallos": self.fallos, "entradas": entradas}
+
+
+# Instancia compartida
+cache_llm = CacheLLM()
@@ -13,10 +13,14 @@ from ui import crear_interfaz
 carpeta_salida = "audios_generados"
 os.makedirs(carpeta_salida, exist_ok=True)
 
+# Peticiones de la UI atendidas a la vez (todas comparten el loop de fondo de tts_engine)
+peticiones_simultaneas = int(os.environ.get("UI_PETICIONES_SIMULTANEAS", "4"))
+
 # Inicializar voces
 voces_edge_tts, voces_espanol = inicializar_voces()
 
 if __name__ == "__main__":
     print("\nIniciando interfaz web. Espera un momento...\n")
     interfaz = crear_interfaz(voces_edge_tts, voces_espanol)
+    interfaz.queue(default_concurrency_limit=peticiones_simultaneas)
     interfaz.launch(share=False)
\ No newline at end of file
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 import os
+import asyncio
 from dotenv import load_dotenv
+from llm_cache import cache_llm, semilla_estable
 
 # Cargar variables de entorno si no se ha hecho
 load_dotenv()
@@ -8,6 +10,11 @@ load_dotenv()
 # Cliente global de OpenAI
 client = None
 
+# Cliente asíncrono (con pool de conexiones) y peticiones en curso para agruparlas
+client_async = None
+MAX_CONEXIONES_OPENAI = int(os.environ.get("OPENAI_MAX_CONEXIONES", "10"))
+_peticiones_en_curso = {}
+
 def inicializar_openai_client(api_key=None):
     """Inicializa el cliente de OpenAI con una clave API proporcionada"""
     global client
@@ -72,6 +79,21 @@ def get_user_prompt_by_type(tipo, texto_prompt):
     
     return prompts.get(tipo, prompts["Historia"])
 
+def construir_peticion(prompt, tipo="Historia", etiquetas=""):
+    """Devuelve los parámetros de la petición de chat para el tipo de contenido y etiquetas"""
+    # Obtener los prompts específicos para el tipo de contenido
+    system_prompt = get_system_prompt_by_type(tipo, etiquetas)
+    user_prompt = get_user_prompt_by_type(tipo, prompt)
+    
+    return {
+        "model": "gpt-4o-mini",
+        "seed": semilla_estable(prompt),
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+    }
+
 def generar_texto_con_openai(prompt, tipo="Historia", etiquetas="", api_key=None):
     """Genera texto usando OpenAI API según el tipo de contenido y etiquetas"""
     global client
@@ -85,22 +107,120 @@ def generar_texto_con_openai(prompt, tipo="Historia", etiquetas="", api_key=None
     if not client:
         return "Error: Cliente OpenAI no inicializado. Por favor ingrese una clave API válida en la pestaña de configuración."
     
+    peticion = construir_peticion(prompt, tipo, etiquetas)
+    respuesta = cache_llm.obtener(peticion)
+    if respuesta is not None:
+        return respuesta
+    
+    try:
+        response = client.chat.completions.create(**peticion)
+        respuesta = response.choices[0].message.content.strip()
+        cache_llm.guardar(peticion, respuesta)
+        return respuesta
+    except Exception as e:
+        return f"Error al generar texto con OpenAI: {str(e)}"
+
+def inicializar_openai_client_async(api_key=None):
+    """Inicializa el cliente asíncrono de OpenAI con un pool de conexiones reutilizables"""
+    global client_async
+    try:
+        import httpx
+        from openai import AsyncOpenAI
+        
+        api_key = api_key or os.environ.get("OPENAI_API_KEY")
+        if api_key:
+            limites = httpx.Limits(
+                max_connections=MAX_CONEXIONES_OPENAI,
+                max_keepalive_connections=MAX_CONEXIONES_OPENAI
+            )
+            client_async = AsyncOpenAI(api_key=api_key, http_client=httpx.AsyncClient(limits=limites, timeout=120))
+        
+        return client_async is not None, "Cliente OpenAI asíncrono inicializado correctamente" if client_async else "No se pudo inicializar el cliente OpenAI. Ingrese una clave API válida."
+    except ImportError:
+        return False, "Error: El paquete OpenAI no está instalado. Instálelo con 'pip install openai'"
+    except Exception as e:
+        return False, f"Error al inicializar OpenAI: {str(e)}"
+
+async def _llamar_openai_async(peticion):
     try:
-        # Obtener los prompts específicos para el tipo de contenido
-        system_prompt = get_system_prompt_by_type(tipo, etiquetas)
-        user_prompt = get_user_prompt_by_type(tipo, prompt)
-        
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            seed=abs(hash(prompt)) % 10000000,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-        )
-        return response.choices[0].message.content.strip()
+        response = await client_async.chat.completions.create(**peticion)
+        respuesta = response.choices[0].message.content.strip()
+        cache_llm.guardar(peticion, respuesta)
+        return respuesta
     except Exception as e:
         return f"Error al generar texto con OpenAI: {str(e)}"
 
+async def generar_texto_con_openai_async(prompt, tipo="Historia", etiquetas="", api_key=None):
+    """Versión asíncrona de generar_texto_con_openai; no bloquea el event loop.
+    Las peticiones idénticas (prompt, tipo, etiquetas y seed) en curso se agrupan en una sola llamada."""
+    if not client_async:
+        success, _ = inicializar_openai_client_async(api_key)
+        if not success:
+            return "Error: Cliente OpenAI no inicializado. Por favor ingrese una clave API válida en la pestaña de configuración."
+    
+    peticion = construir_peticion(prompt, tipo, etiquetas)
+    # Respuesta ya pagada en una ejecución anterior
+    respuesta = cache_llm.obtener(peticion)
+    if respuesta is not None:
+        return respuesta
+    
+    clave = (prompt, tipo, etiquetas, peticion["seed"])
+    
+    # Agrupa también con un stream en curso (generar_texto_stream_async) de la misma petición
+    tarea = _peticiones_en_curso.get(clave)
+    if tarea is None:
+        tarea = asyncio.ensure_future(_llamar_openai_async(peticion))
+        _peticiones_en_curso[clave] = tarea
+        tarea.add_done_callback(lambda _: _peticiones_en_curso.pop(clave, None))
+    # shield: si un solicitante se cancela, la llamada sigue para los demás
+    return await asyncio.shield(tarea)
+
+async def generar_texto_stream_async(prompt, tipo="Historia", etiquetas="", api_key=None):
+    """Genera texto con OpenAI en modo stream: devuelve (async) los trozos de texto según llegan.
+    Lanza una excepción si no se puede generar. Si la respuesta está en caché, o la misma petición
+    ya está en curso (en stream o no), se espera a esa llamada y el texto se entrega de una vez."""
+    if not client_async:
+        success, mensaje = inicializar_openai_client_async(api_key)
+        if not success:
+            raise RuntimeError(mensaje)
+    
+    peticion = construir_peticion(prompt, tipo, etiquetas)
+    respuesta = cache_llm.obtener(peticion)
+    if respuesta is not None:
+        yield respuesta
+        return
+    
+    clave = (prompt, tipo, etiquetas, peticion["seed"])
+    tarea = _peticiones_en_curso.get(clave)
+    if tarea is not None:
+        respuesta = await asyncio.shield(tarea)
+        if respuesta.startswith("Error"):
+            raise RuntimeError(respuesta)
+        yield respuesta
+        return
+    
+    # Las peticiones idénticas que lleguen mientras dura el stream esperan su texto completo
+    # (mismo contrato que _llamar_openai_async: texto o mensaje "Error...")
+    resultado = asyncio.get_running_loop().create_future()
+    _peticiones_en_curso[clave] = resultado
+    resultado.add_done_callback(lambda _: _peticiones_en_curso.pop(clave, None))
+    try:
+        partes = []
+        stream = await client_async.chat.completions.create(**peticion, stream=True)
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                partes.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+        respuesta = "".join(partes).strip()
+        cache_llm.guardar(peticion, respuesta)
+        resultado.set_result(respuesta)
+    except Exception as e:
+        resultado.set_result(f"Error al generar texto con OpenAI: {str(e)}")
+        raise
+    finally:
+        # Stream abandonado por el consumidor (cancelación o cierre del generador)
+        if not resultado.done():
+            resultado.set_result("Error al generar texto con OpenAI: stream interrumpido")
+
 # Intentar inicializar OpenAI al inicio usando la clave en .env
 inicializar_openai_client()
\ No newline at end of file
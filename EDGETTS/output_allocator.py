@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""Asignación de nombres de salida sin colisiones y escritura atómica de archivos.
+
+Cada carpeta de salida tiene un contador persistente (.contador) protegido por un
+lock de archivo, así que los números son únicos entre hilos, procesos y reinicios.
+
+Migración: en una carpeta sin .contador el primer número se calcula a partir de los
+archivos existentes (_numero_inicial). Los audio_completo_N con números aleatorios de
+versiones anteriores no se renombran ni se usan como base; el contador arranca después
+del total de archivos, así que la numeración nueva empieza baja y con ancho fijo.
+Los archivos se escriben con un nombre temporal y se renombran al final, de modo
+que nadie llega a ver un MP3 a medias.
+"""
+import os
+import re
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
+
+ARCHIVO_CONTADOR = ".contador"
+ARCHIVO_LOCK = ".contador.lock"
+LOCK_CADUCADO_S = 30  # Un lock más viejo que esto se considera de un proceso muerto
+TIMEOUT_LOCK_S = 10
+
+_lock_hilos = threading.Lock()
+
+@contextmanager
+def bloqueo_archivo(ruta_lock, timeout=TIMEOUT_LOCK_S):
+    """Lock entre procesos basado en la creación exclusiva de ruta_lock.
+    Pensado para secciones cortas: un lock con más de LOCK_CADUCADO_S se da por abandonado."""
+    inicio = time.monotonic()
+    while True:
+        try:
+            os.close(os.open(ruta_lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(ruta_lock) > LOCK_CADUCADO_S:
+                    os.remove(ruta_lock)
+                    continue
+            except OSError:
+                continue  # Lo liberó otro proceso entre medias
+            if time.monotonic() - inicio > timeout:
+                raise TimeoutError(f"No se pudo obtener el lock {ruta_lock}")
+            time.sleep(0.01)
+    try:
+        yield
+    finally:
+        try:
+            os.remove(ruta_lock)
+        except OSError:
+            pass
+
+def _bloqueo_carpeta(carpeta, timeout=TIMEOUT_LOCK_S):
+    """Lock del contador de la carpeta"""
+    return bloqueo_archivo(os.path.join(carpeta, ARCHIVO_LOCK), timeout)
+
+def _numero_inicial(carpeta):
+    """Primer número libre para una carpeta sin contador.
+    Los NNN_... (contador secuencial de edge_tts_sintetizar) se respetan tal cual. Los
+    audio_completo_N antiguos usaban números aleatorios de hasta 7 cifras sin relleno, así que
+    no se usan como máximo: solo cuentan los de formato nuevo (6 cifras con ceros a la
+    izquierda) y, como mínimo, el número total de audio_completo_ ya existentes."""
+    maximo = 0
+    completos = 0
+    for nombre in os.listdir(carpeta):
+        coincidencia = re.match(r"^(\d+)_", nombre)
+        if coincidencia:
+            maximo = max(maximo, int(coincidencia.group(1)))
+            continue
+        coincidencia = re.match(r"^audio_completo_(\d+)\.", nombre)
+        if coincidencia:
+            completos += 1
+            if re.fullmatch(r"0\d{5}", coincidencia.group(1)):
+                maximo = max(maximo, int(coincidencia.group(1)))
+    return max(maximo, completos) + 1
+
+def reservar_numero(carpeta):
+    """Reserva y devuelve el siguiente número de salida de la carpeta (único y creciente)"""
+    os.makedirs(carpeta, exist_ok=True)
+    ruta_contador = os.path.join(carpeta, ARCHIVO_CONTADOR)
+    with _lock_hilos, _bloqueo_carpeta(carpeta):
+        try:
+            with open(ruta_contador, 'r', encoding='utf-8') as f:
+                numero = int(f.read().strip())
+        except (OSError, ValueError):
+            numero = _numero_inicial(carpeta)
+        escribir_atomico(ruta_contador, str(numero + 1).encode('utf-8'))
+    return numero
+
+@contextmanager
+def escritura_atomica(ruta_final):
+    """Entrega una ruta temporal en la misma carpeta; al salir sin errores se renombra a ruta_final"""
+    carpeta = os.path.dirname(ruta_final) or "."
+    os.makedirs(carpeta, exist_ok=True)
+    extension = os.path.splitext(ruta_final)[1]
+    fd, ruta_temp = tempfile.mkstemp(prefix=".parcial_", suffix=extension, dir=carpeta)
+    os.close(fd)
+    try:
+        yield ruta_temp
+        os.replace(ruta_temp, ruta_final)
+    except BaseException:
+        if os.path.exists(ruta_temp):
+            os.remove(ruta_temp)
+        raise
+
+def escribir_atomico(ruta_final, datos):
+    """Escribe bytes en ruta_final de forma atómica"""
+    with escritura_atomica(ruta_final) as ruta_temp:
+        with open(ruta_temp, 'wb') as f:
+            f.write(datos)
+    return ruta_final
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""Representación interna del audio del pipeline: PCM int16 en arrays de NumPy.
+
+Las partes se decodifican una sola vez desde el MP3 de Edge TTS a AudioPCM; unir,
+insertar silencios y hacer crossfades trabaja sobre los arrays (sin pasar por MP3)
+y solo se codifica a MP3/AAC en la exportación final.
+
+Para guardar partes intermedias en disco se usa un formato mínimo: una cabecera de
+16 bytes (firma, frecuencia, canales) seguida de las muestras int16, que se puede
+abrir como memoria mapeada sin copiarla a RAM.
+"""
+import io
+import struct
+import numpy as np
+from pydub import AudioSegment
+
+TIPO_MUESTRA = np.dtype("<i2")
+FIRMA_PCM = b"PCM16\x00\x00\x00"
+CABECERA_PCM = struct.Struct("<8sII")  # firma, frecuencia, canales
+SUELO_FUNDIDO_DB = -120.0  # Igual que pydub: el fundido va de -120 dB a 0 dB
+
+class AudioPCM:
+    """Audio PCM int16 con forma (frames, canales)"""
+
+    __slots__ = ("muestras", "frecuencia")
+
+    def __init__(self, muestras, frecuencia):
+        muestras = np.asarray(muestras, dtype=TIPO_MUESTRA)
+        self.muestras = muestras.reshape(-1, 1) if muestras.ndim == 1 else muestras
+        self.frecuencia = int(frecuencia)
+
+    @property
+    def canales(self):
+        return self.muestras.shape[1]
+
+    @property
+    def frames(self):
+        return self.muestras.shape[0]
+
+    def __len__(self):
+        """Duración en milisegundos (como len() de AudioSegment)"""
+        return round(self.frames * 1000 / self.frecuencia)
+
+    @classmethod
+    def desde_audiosegment(cls, segmento):
+        if segmento.sample_width != TIPO_MUESTRA.itemsize:
+            segmento = segmento.set_sample_width(TIPO_MUESTRA.itemsize)
+        # Vista directa sobre los bytes del segmento (sin copiar)
+        muestras = np.frombuffer(segmento.raw_data, dtype=TIPO_MUESTRA).reshape(-1, segmento.channels)
+        return cls(muestras, segmento.frame_rate)
+
+    @classmethod
+    def desde_bytes(cls, datos, formato="mp3"):
+        """Decodifica un MP3 (u otro formato) en memoria"""
+        return cls.desde_audiosegment(AudioSegment.from_file(io.BytesIO(datos), format=formato))
+
+    @classmethod
+    def silencio(cls, duracion_ms, frecuencia, canales=1):
+        return cls(np.zeros((ms_a_frames(duracion_ms, frecuencia), canales), dtype=TIPO_MUESTRA), frecuencia)
+
+    def a_audiosegment(self):
+        return AudioSegment(
+            data=np.ascontiguousarray(self.muestras).tobytes(),
+            sample_width=TIPO_MUESTRA.itemsize,
+            frame_rate=self.frecuencia,
+            channels=self.canales,
+        )
+
+    def convertir(self, frecuencia, canales):
+        """Devuelve el audio con otra frecuencia/canales (solo remuestrea si hace falta)"""
+        if frecuencia == self.frecuencia and canales == self.canales:
+            return self
+        segmento = self.a_audiosegment().set_frame_rate(frecuencia).set_channels(canales)
+        return AudioPCM.desde_audiosegment(segmento)
+
+    def exportar(self, destino, formato="mp3", **opciones):
+        """Codifica el audio (única codificación del pipeline) en una ruta o un objeto de archivo"""
+        return self.a_audiosegment().export(destino, format=formato, **opciones)
+
+    def a_bytes(self, formato="mp3", **opciones):
+        buffer = io.BytesIO()
+        self.exportar(buffer, formato, **opciones)
+        return buffer.getvalue()
+
+    def guardar(self, ruta):
+        """Guarda el PCM con una cabecera mínima (legible con cargar(), mapeado en memoria)"""
+        with open(ruta, 'wb') as f:
+            f.write(CABECERA_PCM.pack(FIRMA_PCM, self.frecuencia, self.canales))
+            f.write(np.ascontiguousarray(self.muestras).tobytes())
+        return ruta
+
+    @classmethod
+    def cargar(cls, ruta):
+        """Abre un archivo guardado con guardar() como memoria mapeada (no se lee a RAM)"""
+        with open(ruta, 'rb') as f:
+            firma, frecuencia, canales = CABECERA_PCM.unpack(f.read(CABECERA_PCM.size))
+        if firma != FIRMA_PCM:
+            raise ValueError(f"{ruta} no es un archivo PCM del pipeline")
+        muestras = np.memmap(ruta, dtype=TIPO_MUESTRA, mode="r", offset=CABECERA_PCM.size)
+        return cls(muestras.reshape(-1, canales), frecuencia)
+
+
+def ms_a_frames(duracion_ms, frecuencia):
+    return int(round(duracion_ms * frecuencia / 1000.0))
+
+def _ganancias_fundido(frames, entrada):
+    """Curva de ganancia lineal en dB (como AudioSegment.fade) de 'frames' muestras"""
+    db = SUELO_FUNDIDO_DB * (1.0 - np.arange(frames, dtype=np.float64) / frames)
+    if not entrada:
+        db = db[::-1]
+    return (10.0 ** (db / 20.0))[:, np.newaxis]
+
+def mezclar_crossfade(salida, inicio, muestras, frames):
+    """Funde en su sitio el final ya escrito en salida[inicio:inicio+frames] con el principio de muestras"""
+    zona = slice(inicio, inicio + frames)
+    mezcla = (salida[zona] * _ganancias_fundido(frames, entrada=False)
+              + muestras[:frames] * _ganancias_fundido(frames, entrada=True))
+    limites = np.iinfo(salida.dtype)
+    salida[zona] = np.clip(np.round(mezcla), limites.min, limites.max).astype(salida.dtype)
+
+def unir(partes, crossfade_ms=0):
+    """Une en orden partes AudioPCM y silencios (enteros, en ms) en un buffer preasignado.
+    El crossfade se aplica entre dos partes de audio consecutivas (no a través de un silencio)
+    y se limita a la mitad de cada una. crossfade_ms puede ser un valor para todas las uniones
+    o una lista con el de cada parte de audio con la anterior (0 = unión directa)."""
+    audios = [p for p in partes if not isinstance(p, int)]
+    if not audios:
+        raise ValueError("No hay partes de audio que unir")
+    frecuencia = max(a.frecuencia for a in audios)
+    canales = max(a.canales for a in audios)
+    if not isinstance(crossfade_ms, (list, tuple)):
+        crossfade_ms = [crossfade_ms] * len(audios)
+
+    plan = []
+    posicion = 0
+    anterior = None
+    for parte in partes:
+        if isinstance(parte, int):
+            posicion += ms_a_frames(parte, frecuencia)
+            anterior = None
+            continue
+        muestras = parte.convertir(frecuencia, canales).muestras
+        frames_cf = 0
+        if crossfade_ms[len(plan)] and anterior is not None:
+            frames_cf = min(ms_a_frames(crossfade_ms[len(plan)], frecuencia), len(anterior) // 2, len(muestras) // 2)
+        plan.append((muestras, posicion - frames_cf, frames_cf))
+        posicion += len(muestras) - frames_cf
+        anterior = muestras
+
+    salida = np.zeros((posicion, canales), dtype=TIPO_MUESTRA)
+    for i, (muestras, inicio, frames_cf) in enumerate(plan):
+        plan[i] = None # Liberar cada parte convertida en cuanto está copiada
+        if frames_cf:
+            mezclar_crossfade(salida, inicio, muestras, frames_cf)
+        salida[inicio + frames_cf:inicio + len(muestras)] = muestras[frames_cf:]
+    return AudioPCM(salida, frecuencia)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Pruebas de la importación de audio.json a SQLite (python -m unittest test_entry_store)"""
+import os
+import json
+import tempfile
+import unittest
+
+from data_manager import FILA_VACIA
+from entry_store import AlmacenEntradas
+
+class ImportarJsonTest(unittest.TestCase):
+    def setUp(self):
+        self.carpeta = tempfile.TemporaryDirectory()
+        self.ruta_json = os.path.join(self.carpeta.name, "audio.json")
+        self.almacen = AlmacenEntradas(os.path.join(self.carpeta.name, "audio.db"))
+
+    def tearDown(self):
+        self.almacen.cerrar()
+        self.carpeta.cleanup()
+
+    def _escribir_json(self, entradas):
+        with open(self.ruta_json, "w", encoding="utf-8") as f:
+            json.dump(entradas, f, ensure_ascii=False)
+
+    def test_filas_con_la_misma_clave_no_se_descartan(self):
+        # Varias filas en blanco comparten series/part/tipo pero son entradas distintas
+        entradas = [dict(FILA_VACIA) for _ in range(3)]
+        entradas.append({**FILA_VACIA, "series": "Serie", "text": "Uno"})
+        entradas.append({**FILA_VACIA, "series": "Serie", "text": "Dos"})
+        self._escribir_json(entradas)
+
+        self.assertEqual(self.almacen.importar_json(self.ruta_json), (5, 0))
+        self.assertEqual(self.almacen.contar(), 5)
+
+    def test_reimportar_actualiza_las_filas_editadas(self):
+        entradas = [dict(FILA_VACIA), dict(FILA_VACIA), {**FILA_VACIA, "series": "Serie", "text": "Original"}]
+        self._escribir_json(entradas)
+        self.almacen.importar_json(self.ruta_json)
+
+        entradas[2]["text"] = "Editado"
+        entradas[1]["series"] = "Nueva"
+        self._escribir_json(entradas)
+
+        self.assertEqual(self.almacen.importar_json(self.ruta_json), (0, 3))
+        self.assertEqual(self.almacen.contar(), 3)
+        importadas = self.almacen.pagina(1, 10)
+        self.assertEqual([e["series"] for e in importadas], ["", "Nueva", "Serie"])
+        self.assertEqual(importadas[2]["text"], "Editado")
+
+    def test_reimportar_con_filas_nuevas_solo_agrega_las_nuevas(self):
+        entradas = [dict(FILA_VACIA)]
+        self._escribir_json(entradas)
+        self.almacen.importar_json(self.ruta_json)
+
+        entradas.append(dict(FILA_VACIA))
+        self._escribir_json(entradas)
+
+        self.assertEqual(self.almacen.importar_json(self.ruta_json), (1, 1))
+        self.assertEqual(self.almacen.contar(), 2)
+
+if __name__ == "__main__":
+    unittest.main()
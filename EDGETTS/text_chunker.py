@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""División de texto en fragmentos por oraciones o párrafos para sintetizarlos por separado."""
+import re
+
+# Fin de oración (con comillas/paréntesis de cierre opcionales) seguido de espacio, o salto de párrafo
+PATRON_CORTE = re.compile(r'(?<=[.!?…])["»”\')\]]*\s+|\n\s*\n')
+
+MIN_CARACTERES_FRAGMENTO = 200
+MAX_CARACTERES_FRAGMENTO = 1500
+
+class SeparadorOraciones:
+    """Acumula texto que llega por partes (stream de un LLM) y devuelve fragmentos completos
+    en cuanto terminan en un límite de oración o párrafo"""
+
+    def __init__(self, min_caracteres=MIN_CARACTERES_FRAGMENTO, max_caracteres=MAX_CARACTERES_FRAGMENTO):
+        self.min_caracteres = min_caracteres
+        self.max_caracteres = max_caracteres
+        self._buffer = ""
+
+    def _buscar_corte(self):
+        for coincidencia in PATRON_CORTE.finditer(self._buffer):
+            if coincidencia.end() >= self.min_caracteres:
+                return coincidencia.end()
+        if len(self._buffer) > self.max_caracteres:
+            # Sin límite de oración: cortar en el último espacio para no partir palabras
+            espacio = self._buffer.rfind(" ", 0, self.max_caracteres)
+            return espacio if espacio > 0 else self.max_caracteres
+        return None
+
+    def agregar(self, texto):
+        """Agrega texto y devuelve la lista de fragmentos que ya están completos"""
+        self._buffer += texto
+        fragmentos = []
+        while True:
+            corte = self._buscar_corte()
+            if corte is None:
+                break
+            fragmento = self._buffer[:corte].strip()
+            self._buffer = self._buffer[corte:]
+            if fragmento:
+                fragmentos.append(fragmento)
+        return fragmentos
+
+    def finalizar(self):
+        """Devuelve el texto restante (al terminar el stream)"""
+        fragmento = self._buffer.strip()
+        self._buffer = ""
+        return [fragmento] if fragmento else []
+
+def dividir_texto(texto, max_caracteres=MAX_CARACTERES_FRAGMENTO):
+    """Divide un texto completo en fragmentos de como mucho max_caracteres, cortando en límites
+    de oración o párrafo y agrupando oraciones consecutivas mientras quepan en el fragmento"""
+    return [fragmento for _, fragmento in dividir_con_solapamiento(texto, max_caracteres, 0)]
+
+def dividir_con_solapamiento(texto, max_caracteres, oraciones_solapadas=2):
+    """Divide un texto en fragmentos de como mucho max_caracteres por oraciones y devuelve una lista
+    de (contexto, fragmento): el contexto son las últimas oraciones del fragmento anterior, para dar
+    continuidad sin repetirlas en el resultado"""
+    separador = SeparadorOraciones(min_caracteres=1, max_caracteres=max_caracteres)
+    oraciones = separador.agregar(texto) + separador.finalizar()
+    grupos = []
+    for oracion in oraciones:
+        if grupos and sum(len(o) + 1 for o in grupos[-1]) + len(oracion) <= max_caracteres:
+            grupos[-1].append(oracion)
+        else:
+            grupos.append([oracion])
+    resultado = []
+    for i, grupo in enumerate(grupos):
+        contexto = " ".join(grupos[i - 1][-oraciones_solapadas:]) if i > 0 and oraciones_solapadas else ""
+        resultado.append((contexto, " ".join(grupo)))
+    return resultado
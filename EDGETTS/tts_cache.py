@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""Caché en disco de audios Edge TTS compartida por EDGETTS y NewEdgeTTS.
+
+Cada audio se guarda con el hash de (texto, voz, velocidad) como nombre, de forma
+que dos peticiones idénticas solo llaman una vez al servicio de Edge TTS.
+"""
+import os
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Carpeta de la caché (común a ambos proyectos) y tamaño máximo en MB
+CARPETA_CACHE_TTS = os.environ.get(
+    "TTS_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "edge_tts_cache")
+)
+TAMANO_MAXIMO_CACHE_MB = int(os.environ.get("TTS_CACHE_MAX_MB", "500"))
+
+# Velocidad por defecto de Edge TTS (equivale a no pasar rate)
+RATE_POR_DEFECTO = "+0%"
+
+
+class CacheTTS:
+    """Caché LRU en disco indexada por hash de texto, voz y velocidad"""
+
+    def __init__(self, carpeta=CARPETA_CACHE_TTS, tamano_maximo_mb=TAMANO_MAXIMO_CACHE_MB):
+        self.carpeta = carpeta
+        self.tamano_maximo = tamano_maximo_mb * 1024 * 1024
+        self.aciertos = 0
+        self.fallos = 0
+        self._lock = threading.Lock()
+        self._indice = None  # OrderedDict clave -> tamaño, del menos al más usado
+        self._tamano_total = 0
+
+    @staticmethod
+    def clave(texto, voz, rate=RATE_POR_DEFECTO):
+        """Calcula la clave de contenido para una petición TTS"""
+        contenido = "\x1f".join([texto, voz, rate or RATE_POR_DEFECTO])
+        return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+    def _ruta(self, clave):
+        return os.path.join(self.carpeta, f"{clave}.mp3")
+
+    def _cargar_indice(self):
+        """Construye el índice LRU a partir de los archivos existentes (ordenados por mtime)"""
+        if self._indice is not None:
+            return
+        os.makedirs(self.carpeta, exist_ok=True)
+        entradas = []
+        with os.scandir(self.carpeta) as it:
+            for entrada in it:
+                if entrada.is_file() and entrada.name.endswith(".mp3"):
+                    info = entrada.stat()
+                    entradas.append((info.st_mtime, entrada.name[:-4], info.st_size))
+        entradas.sort()
+        self._indice = OrderedDict((clave, tamano) for _, clave, tamano in entradas)
+        self._tamano_total = sum(self._indice.values())
+
+    def _ruta_si_existe(self, texto, voz, rate):
+        """Devuelve la ruta en caché marcándola como usada recientemente, o None (cuenta acierto/fallo)"""
+        clave = self.clave(texto, voz, rate)
+        ruta = self._ruta(clave)
+        with self._lock:
+            self._cargar_indice()
+            if clave not in self._indice or not os.path.exists(ruta):
+                # Puede que otro proceso lo haya expulsado
+                if clave in self._indice:
+                    self._tamano_total -= self._indice.pop(clave)
+                self.fallos += 1
+                return None
+            self._indice.move_to_end(clave)
+            self.aciertos += 1
+        try:
+            os.utime(ruta, None)  # Conservar el orden LRU entre reinicios
+        except OSError:
+            pass
+        return ruta
+
+    def obtener_bytes(self, texto, voz, rate=RATE_POR_DEFECTO):
+        """Devuelve el MP3 en caché como bytes o None si no existe"""
+        ruta = self._ruta_si_existe(texto, voz, rate)
+        if not ruta:
+            return None
+        try:
+            with open(ruta, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def guardar_bytes(self, texto, voz, rate, datos):
+        """Guarda un MP3 en memoria en la caché y aplica la expulsión LRU"""
+        if not datos:
+            return None
+        clave = self.clave(texto, voz, rate)
+        ruta = self._ruta(clave)
+        ruta_temp = None
+        try:
+            os.makedirs(self.carpeta, exist_ok=True)
+            # Escribir en temporal y renombrar para no dejar MP3 a medias en la caché
+            fd, ruta_temp = tempfile.mkstemp(suffix=".tmp", dir=self.carpeta)
+            with os.fdopen(fd, "wb") as f:
+                f.write(datos)
+            os.replace(ruta_temp, ruta)
+        except OSError as e:
+            print(f"Advertencia: No se pudo guardar en caché TTS: {e}")
+            if ruta_temp and os.path.exists(ruta_temp):
+                os.remove(ruta_temp)
+            return None
+
+        with self._lock:
+            self._cargar_indice()
+            if clave in self._indice:
+                self._tamano_total -= self._indice.pop(clave)
+            self._indice[clave] = len(datos)
+            self._tamano_total += len(datos)
+            self._expulsar()
+        return ruta
+
+    def _expulsar(self):
+        """Elimina los audios menos usados hasta quedar bajo el tamaño máximo (requiere el lock)"""
+        while self._tamano_total > self.tamano_maximo and len(self._indice) > 1:
+            clave, tamano = self._indice.popitem(last=False)
+            self._tamano_total -= tamano
+            try:
+                os.remove(self._ruta(clave))
+            except OSError:
+                pass
+
+    def estadisticas(self):
+        """Devuelve contadores de aciertos/fallos y ocupación de la caché"""
+        with self._lock:
+            self._cargar_indice()
+            total = self.aciertos + self.fallos
+            return {
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": self.aciertos / total if total else 0.0,
+                "entradas": len(self._indice),
+                "tamano_mb": round(self._tamano_total / (1024 * 1024), 2),
+                "tamano_maximo_mb": round(self.tamano_maximo / (1024 * 1024), 2),
+            }
+
+
+# Instancia compartida por los motores TTS
+cache_tts = CacheTTS()
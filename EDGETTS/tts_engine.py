@@ -1,10 +1,16 @@
 # -*- coding: utf-8 -*-
 import os
 import time
+import atexit
 import asyncio
+import threading
 import edge_tts
-from pydub import AudioSegment
 import re
+from tts_cache import cache_tts, RATE_POR_DEFECTO
+from voice_catalog import obtener_catalogo, formatear_nombre_voz, idiomas
+from output_allocator import reservar_numero, escribir_atomico
+from text_chunker import dividir_texto
+from pcm_audio import AudioPCM, unir
 
 # Carpeta de salida para los audios generados
 carpeta_salida = "audios_generados"
@@ -15,113 +21,67 @@ if not os.path.exists(carpeta_salida):
 voz_defecto_corta = "es-BO-MarceloNeural"
 voz_defecto_completa = "es-BO-MarceloNeural - Microsoft Server Speech Text to Speech Voice (es-BO, MarceloNeural) (Male)"
 
-# Diccionario de idiomas para mostrar en formato amigable
-idiomas = {
-    'es-AR': 'Español Argentina',
-    'es-BO': 'Español Bolivia',
-    'es-CL': 'Español Chile',
-    'es-CO': 'Español Colombia',
-    'es-CR': 'Español Costa Rica',
-    'es-CU': 'Español Cuba',
-    'es-DO': 'Español República Dominicana',
-    'es-EC': 'Español Ecuador',
-    'es-ES': 'Español España',
-    'es-GQ': 'Español Guinea Ecuatorial',
-    'es-GT': 'Español Guatemala',
-    'es-HN': 'Español Honduras',
-    'es-MX': 'Español México',
-    'es-NI': 'Español Nicaragua',
-    'es-PA': 'Español Panamá',
-    'es-PE': 'Español Perú',
-    'es-PR': 'Español Puerto Rico',
-    'es-PY': 'Español Paraguay',
-    'es-SV': 'Español El Salvador',
-    'es-US': 'Español Estados Unidos',
-    'es-UY': 'Español Uruguay',
-    'es-VE': 'Español Venezuela'
-}
-
-# Contador global para numerar los audios
-contador_audios = 1
+# Textos largos: se dividen por oraciones/párrafos y los fragmentos se sintetizan en paralelo
+TTS_MAX_CARACTERES_FRAGMENTO = int(os.environ.get("TTS_MAX_CARACTERES_FRAGMENTO", "800"))
+TTS_FRAGMENTOS_SIMULTANEOS = int(os.environ.get("TTS_FRAGMENTOS_SIMULTANEOS", "4"))
+TTS_REINTENTOS = int(os.environ.get("TTS_REINTENTOS", "3"))
 
-def run_async(func, *args, **kwargs):
-    """Ejecuta una función asíncrona de manera segura"""
-    loop = asyncio.new_event_loop()
+# Event loop persistente en un hilo de fondo, compartido por todos los callbacks de Gradio
+_loop_fondo = None
+_hilo_loop = None
+_lock_loop = threading.Lock()
+
+def _ejecutar_loop(loop):
+    asyncio.set_event_loop(loop)
     try:
-        result = loop.run_until_complete(func(*args, **kwargs))
-        return result
+        loop.run_forever()
     finally:
         loop.close()
 
-async def obtener_voces_edge_tts():
-    try:
-        voces = await edge_tts.list_voices()
-        print(f"Voces Edge TTS disponibles: {len(voces)}")
-        return voces
-    except Exception as e:
-        print(f"Error al obtener voces de Edge TTS: {e}")
-        return []
+def obtener_loop():
+    """Devuelve el event loop de fondo, arrancándolo la primera vez"""
+    global _loop_fondo, _hilo_loop
+    with _lock_loop:
+        if _loop_fondo is None or not _hilo_loop.is_alive():
+            _loop_fondo = asyncio.new_event_loop()
+            _hilo_loop = threading.Thread(target=_ejecutar_loop, args=(_loop_fondo,), name="edge-tts-loop", daemon=True)
+            _hilo_loop.start()
+        return _loop_fondo
 
-def formatear_nombre_voz(nombre_corto, nombre_completo):
-    """Formatea el nombre de voz en un formato amigable"""
-    try:
-        # Extraer el nombre simple
-        nombre_simple = nombre_corto.split("-")[-1].replace("Neural", " Neural")
-        
-        # Extraer el código de idioma (es-XX)
-        codigo_idioma = "-".join(nombre_corto.split("-")[0:2])
-        
-        # Determinar el idioma basado en el código
-        idioma = idiomas.get(codigo_idioma, codigo_idioma)
-        
-        # Determinar el género
-        genero = "Masculino" if "(Male)" in nombre_completo else "Femenino"
-        
-        return f"{nombre_simple} - {idioma}, ({genero})"
-    except:
-        return nombre_corto
+def enviar_async(func, *args, **kwargs):
+    """Programa una función asíncrona en el loop de fondo (thread-safe) y devuelve un concurrent.futures.Future"""
+    if threading.current_thread() is _hilo_loop:
+        raise RuntimeError("enviar_async no puede llamarse desde el propio loop de fondo; usa await")
+    return asyncio.run_coroutine_threadsafe(func(*args, **kwargs), obtener_loop())
+
+def run_async(func, *args, **kwargs):
+    """Ejecuta una función asíncrona en el loop persistente y espera su resultado"""
+    return enviar_async(func, *args, **kwargs).result()
+
+def detener_loop():
+    """Detiene el loop de fondo (se llama automáticamente al salir)"""
+    global _loop_fondo
+    with _lock_loop:
+        if _loop_fondo is not None and _loop_fondo.is_running():
+            _loop_fondo.call_soon_threadsafe(_loop_fondo.stop)
+            _hilo_loop.join(timeout=5)
+        _loop_fondo = None
+
+atexit.register(detener_loop)
 
 def inicializar_voces():
-    """Inicializa y devuelve las listas de voces disponibles"""
+    """Inicializa y devuelve las listas de voces disponibles (desde el catálogo en disco)"""
     try:
-        voces_edge_tts = run_async(obtener_voces_edge_tts)
+        catalogo = obtener_catalogo()
+        nombres_voces_edge = catalogo["nombres_voces_edge"]
+        voces_espanol_numeradas = catalogo["voces_espanol_numeradas"]
         
-        if voces_edge_tts:
-            nombres_voces_edge = []
-            voces_espanol_formateadas = []
-            
-            for voz in voces_edge_tts:
-                nombre_corto = voz.get('ShortName', '')
-                nombre = voz.get('Name', nombre_corto)
-                genero = f" ({voz.get('Gender', 'Unknown')})" if 'Gender' in voz else ''
-                
-                nombre_completo = f"{nombre_corto} - {nombre}{genero}"
-                nombres_voces_edge.append(nombre_completo)
-                
-                # Separar y formatear las voces en español
-                if nombre_corto.startswith('es-'):
-                    nombre_formateado = formatear_nombre_voz(nombre_corto, nombre_completo)
-                    voces_espanol_formateadas.append((nombre_completo, nombre_formateado, nombre_corto))
-            
+        if nombres_voces_edge:
             print(f"Total voces Edge TTS disponibles: {len(nombres_voces_edge)}")
-            
-            # Ordenar las voces en español alfabéticamente
-            voces_espanol_formateadas.sort(key=lambda x: x[1])
-            
-            # Crear la lista numerada de voces en español
-            voces_espanol_numeradas = []
-            for i, (nombre_completo, nombre_formateado, nombre_corto) in enumerate(voces_espanol_formateadas, 1):
-                texto_numerado = f"{i}. {nombre_formateado}"
-                voces_espanol_numeradas.append((nombre_completo, texto_numerado, nombre_corto))
-            
             print(f"Voces en español disponibles: {len(voces_espanol_numeradas)}")
-            print("\nVOCES EN ESPAÑOL DISPONIBLES:")
-            for _, texto_numerado, _ in voces_espanol_numeradas:
-                print(texto_numerado)
-            print("\nVoz predeterminada:")
             for _, texto_numerado, nombre_corto in voces_espanol_numeradas:
                 if nombre_corto == voz_defecto_corta:
-                    print(f"→ {texto_numerado}")
+                    print(f"Voz predeterminada: {texto_numerado}")
                     break
         else:
             nombres_voces_edge = ["No se pudieron cargar las voces"]
@@ -147,33 +107,99 @@ def obtener_voz_por_numero(numero, voces_espanol_numeradas):
         return voces_espanol_numeradas[numero-1][0]  # Devuelve el nombre completo
     return voz_defecto_completa
 
-async def edge_tts_sintetizar(texto, voz=voz_defecto_corta, velocidad=1.0):
-    """Sintetiza texto a voz usando Edge TTS"""
-    global contador_audios
+def extraer_nombre_voz(voz):
+    """Si recibimos el nombre completo de la voz, extrae la parte corta"""
+    return voz.split(" - ")[0] if " - " in voz else voz
+
+def calcular_rate(velocidad):
+    """Convierte la velocidad (1.0 = normal) al formato de rate de Edge TTS"""
+    if abs(velocidad - 1.0) < 0.01:  # Si la velocidad es aproximadamente 1.0
+        return RATE_POR_DEFECTO
+    return f"+{int((velocidad-1)*100)}%" if velocidad > 1 else f"{int((velocidad-1)*100)}%"
+
+async def edge_tts_sintetizar_memoria(texto, voz=voz_defecto_corta, velocidad=1.0):
+    """Sintetiza texto a voz y devuelve el MP3 como bytes, sin pasar por disco"""
+    nombre_voz = extraer_nombre_voz(voz)
+    rate_string = calcular_rate(velocidad)
+    
+    # Reutilizar el audio si ya se sintetizó antes el mismo (texto, voz, velocidad)
+    datos = cache_tts.obtener_bytes(texto, nombre_voz, rate_string)
+    if datos:
+        return datos
     
+    communicate = edge_tts.Communicate(texto, nombre_voz, rate=rate_string)
+    buffer = bytearray()
+    async for chunk in communicate.stream():
+        if chunk["type"] == "audio":
+            buffer.extend(chunk["data"])
+    if not buffer:
+        raise RuntimeError(f"Edge TTS no devolvió audio para la voz {nombre_voz}")
+    
+    datos = bytes(buffer)
+    cache_tts.guardar_bytes(texto, nombre_voz, rate_string, datos)
+    return datos
+
+async def sintetizar_con_reintentos(texto, voz=voz_defecto_corta, velocidad=1.0, reintentos=TTS_REINTENTOS, semaforo=None):
+    """Sintetiza un fragmento reintentando con espera exponencial (1s, 2s, 4s...).
+    Si se pasa un semáforo, se toma por petición y se libera antes de la espera."""
+    for intento in range(1, reintentos + 1):
+        try:
+            if semaforo is None:
+                return await edge_tts_sintetizar_memoria(texto, voz, velocidad)
+            async with semaforo:
+                return await edge_tts_sintetizar_memoria(texto, voz, velocidad)
+        except Exception as e:
+            if intento == reintentos:
+                raise
+            espera = 2 ** (intento - 1)
+            print(f"Fallo sintetizando fragmento (intento {intento}/{reintentos}): {e}. Reintentando en {espera}s")
+            await asyncio.sleep(espera)
+
+async def sintetizar_fragmentado(texto, voz=voz_defecto_corta, velocidad=1.0,
+                                 max_caracteres=TTS_MAX_CARACTERES_FRAGMENTO, simultaneos=TTS_FRAGMENTOS_SIMULTANEOS,
+                                 semaforo=None):
+    """Divide el texto en fragmentos por oraciones/párrafos y los sintetiza en paralelo, cada uno
+    con sus propios reintentos. Devuelve los MP3 de los fragmentos en orden.
+    semaforo permite compartir el límite de peticiones con otras síntesis (p.ej. intro y outro)."""
+    if semaforo is None:
+        semaforo = asyncio.Semaphore(simultaneos)
+    fragmentos = dividir_texto(texto, max_caracteres)
+    if len(fragmentos) <= 1:
+        return [await sintetizar_con_reintentos(texto, voz, velocidad, semaforo=semaforo)]
+    
+    tareas = [asyncio.create_task(sintetizar_con_reintentos(f, voz, velocidad, semaforo=semaforo)) for f in fragmentos]
     try:
-        # Si recibimos el nombre completo, extraemos la parte corta
-        if " - " in voz:
-            nombre_voz = voz.split(" - ")[0]
-        else:
-            nombre_voz = voz
-            
+        return await asyncio.gather(*tareas)
+    finally:
+        # Si un fragmento agota sus reintentos, no dejar el resto sintetizando en vano
+        for tarea in tareas:
+            if not tarea.done():
+                tarea.cancel()
+
+def unir_fragmentos(lista_datos):
+    """Une MP3 de fragmentos decodificando cada uno una vez a PCM: la unión es exacta a nivel
+    de muestra (concatenar los MP3 tal cual dejaría el relleno del codificador entre fragmentos)"""
+    return unir([AudioPCM.desde_bytes(datos) for datos in lista_datos])
+
+async def edge_tts_sintetizar(texto, voz=voz_defecto_corta, velocidad=1.0):
+    """Sintetiza texto a voz usando Edge TTS y guarda el resultado en un archivo"""
+    try:
+        nombre_voz = extraer_nombre_voz(voz)
         texto_limpio = limpiar_texto_para_nombre_archivo(texto)
         
-        # Crear nombre de archivo con formato: NUM_voz_texto.mp3
+        lista_datos = await sintetizar_fragmentado(texto, nombre_voz, velocidad)
+        if len(lista_datos) == 1:
+            datos = lista_datos[0]
+        else:
+            datos = unir_fragmentos(lista_datos).a_bytes("mp3")
+        
+        # Crear nombre de archivo con formato: NUM_voz_texto.mp3 (número reservado de forma atómica)
+        numero = reservar_numero(carpeta_salida)
         nombre_archivo = os.path.join(
             carpeta_salida, 
-            f"{contador_audios:03d}_{nombre_voz}_{texto_limpio}.mp3"
+            f"{numero:03d}_{nombre_voz}_{texto_limpio}.mp3"
         )
-        
-        if abs(velocidad - 1.0) < 0.01:  # Si la velocidad es aproximadamente 1.0
-            communicate = edge_tts.Communicate(texto, nombre_voz)
-        else:
-            rate_string = f"+{int((velocidad-1)*100)}%" if velocidad > 1 else f"{int((velocidad-1)*100)}%"
-            communicate = edge_tts.Communicate(texto, nombre_voz, rate=rate_string)
-        
-        await communicate.save(nombre_archivo)
-        contador_audios += 1
+        escribir_atomico(nombre_archivo, datos)
         
         return nombre_archivo
     except Exception as e:
@@ -187,15 +213,12 @@ def sintetizar_voz(texto, voz=voz_defecto_corta, velocidad=1.0):
     
     try:
         nombre_archivo = run_async(edge_tts_sintetizar, texto, voz, velocidad)
-        return nombre_archivo, f"¡Audio #{contador_audios-1} generado con éxito!"
+        num_audio = os.path.basename(nombre_archivo).split('_')[0]
+        return nombre_archivo, f"¡Audio #{num_audio} generado con éxito!"
     except Exception as e:
         print(f"Error en síntesis: {e}")
         return None, f"Error al generar audio: {str(e)}"
 
-def add_silence(duration_ms=500):
-    """Crear un segmento de silencio"""
-    return AudioSegment.silent(duration=duration_ms)
-
 def mostrar_info_audio(nombre_archivo):
     """Muestra información formateada sobre el audio generado"""
     if nombre_archivo:
@@ -7,7 +7,11 @@ from data_manager import (
     crear_archivo_json, on_table_change, agregar_fila,
     guardar_json_auto, TIPOS_CONTENIDO
 )
-from audio_processor import generar_audio_desde_json
+from audio_processor import generar_audio_desde_json, generar_audio_desde_almacen
+from entry_store import (
+    COLUMNAS, TAMANO_PAGINA, cargar_pagina, guardar_pagina,
+    agregar_fila_bd, importar_json_bd
+)
 
 def actualizar_voces_por_filtro(mostrar_solo_espanol, voces_edge_tts, voces_espanol):
     """Actualiza el selector de voces según el filtro seleccionado"""
@@ -20,6 +24,12 @@ def actualizar_voces_por_filtro(mostrar_solo_espanol, voces_edge_tts, voces_espa
         voz_default = "es-BO-MarceloNeural"
         return gr.update(choices=opciones_todas, value=voz_default)
 
+def generar_audio(indice, df, voz_edge, velocidad, api_key, usar_base_datos):
+    """Genera el audio leyendo la fila de la tabla JSON o de la base de datos SQLite"""
+    if usar_base_datos:
+        return generar_audio_desde_almacen(indice, voz_edge, velocidad, api_key)
+    return generar_audio_desde_json(indice, df, voz_edge, velocidad, api_key)
+
 def crear_interfaz(voces_edge_tts, voces_espanol):
     """Crea la interfaz de Gradio"""
     opciones_espanol = [(voz[1], voz[2]) for voz in voces_espanol]  # (texto_numerado, nombre_corto)
@@ -70,11 +80,34 @@ def crear_interfaz(voces_edge_tts, voces_espanol):
             texto_json = gr.Textbox(label="JSON como texto", visible=False)
             json_para_descargar = gr.File(label="Descargar JSON", visible=False)
         
+        with gr.Tab("Base de datos"):
+            gr.Markdown("### Entradas en SQLite (se cargan y guardan por páginas)")
+            
+            with gr.Row():
+                pagina_bd = gr.Number(label="Página", value=1, precision=0, minimum=1)
+                cargar_pagina_btn = gr.Button("Cargar página", variant="secondary")
+                agregar_fila_bd_btn = gr.Button("Agregar Fila", variant="primary")
+                importar_json_btn = gr.Button("Importar audio.json", variant="secondary")
+            
+            tabla_bd = gr.Dataframe(
+                headers=["id"] + COLUMNAS,
+                col_count=len(COLUMNAS) + 1,
+                interactive=True,
+                label=f"Entradas (páginas de {TAMANO_PAGINA} filas)"
+            )
+            estado_bd = gr.Textbox(label="Estado", interactive=False)
+        
         with gr.Tab("Generar Audio"):
             with gr.Row():
                 with gr.Column():
                     indice_entrada = gr.Textbox(label="Número de fila a procesar (1-n)", value="1")
                     
+                    usar_base_datos = gr.Checkbox(
+                        label="Leer la fila desde la base de datos",
+                        value=False,
+                        info="Usa el id de la pestaña 'Base de datos' en lugar de la tabla JSON"
+                    )
+                    
                     filtro_espanol = gr.Checkbox(
                         label="Mostrar solo voces en español",
                         value=True,
@@ -160,15 +193,46 @@ def crear_interfaz(voces_edge_tts, voces_espanol):
             outputs=[selector_voz_edge]
         )
         
-        # Generar audio desde JSON
+        # Pestaña de base de datos: cargar/guardar solo la página visible
+        cargar_pagina_btn.click(
+            fn=cargar_pagina,
+            inputs=[pagina_bd],
+            outputs=[tabla_bd, pagina_bd, estado_bd]
+        )
+        pagina_bd.submit(
+            fn=cargar_pagina,
+            inputs=[pagina_bd],
+            outputs=[tabla_bd, pagina_bd, estado_bd]
+        )
+        interfaz.load(
+            fn=cargar_pagina,
+            inputs=[pagina_bd],
+            outputs=[tabla_bd, pagina_bd, estado_bd]
+        )
+        tabla_bd.input(
+            fn=guardar_pagina,
+            inputs=[tabla_bd],
+            outputs=[estado_bd]
+        )
+        agregar_fila_bd_btn.click(
+            fn=agregar_fila_bd,
+            outputs=[tabla_bd, pagina_bd, estado_bd]
+        )
+        importar_json_btn.click(
+            fn=importar_json_bd,
+            outputs=[tabla_bd, pagina_bd, estado_bd]
+        )
+        
+        # Generar audio desde JSON o desde la base de datos
         boton_generar.click(
-            fn=generar_audio_desde_json,
+            fn=generar_audio,
             inputs=[
                 indice_entrada,
                 tabla,
                 selector_voz_edge,
                 selector_velocidad,
-                api_key_input
+                api_key_input,
+                usar_base_datos
             ],
             outputs=[audio_salida, mensaje_estado]
         )
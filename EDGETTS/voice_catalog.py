@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""Catálogo de voces de Edge TTS cacheado en disco, compartido por EDGETTS y NewEdgeTTS.
+
+El catálogo guarda la lista cruda de voces junto con los nombres ya formateados y la
+lista numerada de voces en español, de forma que el arranque no espera a la red:
+si el catálogo está caducado se usa igualmente y se refresca en segundo plano.
+"""
+import os
+import json
+import time
+import asyncio
+import threading
+import edge_tts
+from output_allocator import escritura_atomica
+
+# Archivo del catálogo y tiempo de vida antes de refrescarlo
+ARCHIVO_CATALOGO_VOCES = os.environ.get(
+    "VOICE_CATALOG_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "edge_tts_voces.json")
+)
+TTL_CATALOGO_HORAS = float(os.environ.get("VOICE_CATALOG_TTL_HOURS", "24"))
+
+# Diccionario de idiomas para mostrar en formato amigable
+idiomas = {
+    'es-AR': 'Español Argentina',
+    'es-BO': 'Español Bolivia',
+    'es-CL': 'Español Chile',
+    'es-CO': 'Español Colombia',
+    'es-CR': 'Español Costa Rica',
+    'es-CU': 'Español Cuba',
+    'es-DO': 'Español República Dominicana',
+    'es-EC': 'Español Ecuador',
+    'es-ES': 'Español España',
+    'es-GQ': 'Español Guinea Ecuatorial',
+    'es-GT': 'Español Guatemala',
+    'es-HN': 'Español Honduras',
+    'es-MX': 'Español México',
+    'es-NI': 'Español Nicaragua',
+    'es-PA': 'Español Panamá',
+    'es-PE': 'Español Perú',
+    'es-PR': 'Español Puerto Rico',
+    'es-PY': 'Español Paraguay',
+    'es-SV': 'Español El Salvador',
+    'es-US': 'Español Estados Unidos',
+    'es-UY': 'Español Uruguay',
+    'es-VE': 'Español Venezuela'
+}
+
+_lock_refresco = threading.Lock()
+_refresco_en_curso = False
+
+def formatear_nombre_voz(nombre_corto, nombre_completo):
+    """Formatea el nombre de voz en un formato amigable"""
+    try:
+        # Extraer el nombre simple
+        nombre_simple = nombre_corto.split("-")[-1].replace("Neural", " Neural")
+
+        # Extraer el código de idioma (es-XX)
+        codigo_idioma = "-".join(nombre_corto.split("-")[0:2])
+
+        # Determinar el idioma basado en el código
+        idioma = idiomas.get(codigo_idioma, codigo_idioma)
+
+        # Determinar el género
+        genero = "Masculino" if "(Male)" in nombre_completo else "Femenino"
+
+        return f"{nombre_simple} - {idioma}, ({genero})"
+    except:
+        return nombre_corto
+
+def procesar_voces(voces_edge_tts):
+    """Devuelve (nombres_voces_edge, voces_espanol_numeradas) a partir de la lista cruda de voces"""
+    nombres_voces_edge = []
+    voces_espanol_formateadas = []
+
+    for voz in voces_edge_tts:
+        nombre_corto = voz.get('ShortName', '')
+        nombre = voz.get('Name', nombre_corto)
+        genero = f" ({voz.get('Gender', 'Unknown')})" if 'Gender' in voz else ''
+
+        nombre_completo = f"{nombre_corto} - {nombre}{genero}"
+        nombres_voces_edge.append(nombre_completo)
+
+        # Separar y formatear las voces en español
+        if nombre_corto.startswith('es-'):
+            nombre_formateado = formatear_nombre_voz(nombre_corto, nombre_completo)
+            voces_espanol_formateadas.append((nombre_completo, nombre_formateado, nombre_corto))
+
+    # Ordenar las voces en español alfabéticamente y numerarlas
+    voces_espanol_formateadas.sort(key=lambda x: x[1])
+    voces_espanol_numeradas = [
+        (nombre_completo, f"{i}. {nombre_formateado}", nombre_corto)
+        for i, (nombre_completo, nombre_formateado, nombre_corto) in enumerate(voces_espanol_formateadas, 1)
+    ]
+    return nombres_voces_edge, voces_espanol_numeradas
+
+async def descargar_voces():
+    """Obtiene la lista de voces directamente del servicio de Edge TTS"""
+    voces = await edge_tts.list_voices()
+    print(f"Voces Edge TTS disponibles: {len(voces)}")
+    return voces
+
+def cargar_catalogo(ruta=ARCHIVO_CATALOGO_VOCES):
+    """Lee el catálogo de disco (o None si no existe o está dañado)"""
+    if not os.path.exists(ruta):
+        return None
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            catalogo = json.load(f)
+        # JSON no conserva tuplas: restaurarlas para el resto del código
+        catalogo["voces_espanol_numeradas"] = [tuple(v) for v in catalogo["voces_espanol_numeradas"]]
+        return catalogo
+    except Exception as e:
+        print(f"Advertencia: Catálogo de voces dañado ({e}). Se volverá a descargar.")
+        return None
+
+def guardar_catalogo(voces, ruta=ARCHIVO_CATALOGO_VOCES):
+    """Precalcula los nombres formateados y guarda el catálogo de forma atómica"""
+    nombres_voces_edge, voces_espanol_numeradas = procesar_voces(voces)
+    catalogo = {
+        "actualizado": time.time(),
+        "voces": voces,
+        "nombres_voces_edge": nombres_voces_edge,
+        "voces_espanol_numeradas": voces_espanol_numeradas,
+    }
+    # Temporal único por escritura: el refresco en segundo plano y otro proceso pueden guardar a la vez
+    with escritura_atomica(ruta) as ruta_temp:
+        with open(ruta_temp, 'w', encoding='utf-8') as f:
+            json.dump(catalogo, f, ensure_ascii=False)
+    catalogo["voces_espanol_numeradas"] = [tuple(v) for v in voces_espanol_numeradas]
+    return catalogo
+
+def actualizar_catalogo(ruta=ARCHIVO_CATALOGO_VOCES):
+    """Descarga las voces y actualiza el catálogo en disco (bloqueante)"""
+    voces = asyncio.run(descargar_voces())
+    if not voces:
+        raise RuntimeError("Edge TTS devolvió una lista de voces vacía")
+    return guardar_catalogo(voces, ruta)
+
+def _refrescar_en_segundo_plano(ruta):
+    global _refresco_en_curso
+    try:
+        actualizar_catalogo(ruta)
+        print("Catálogo de voces actualizado en segundo plano.")
+    except Exception as e:
+        print(f"Advertencia: No se pudo refrescar el catálogo de voces: {e}")
+    finally:
+        with _lock_refresco:
+            _refresco_en_curso = False
+
+def refrescar_catalogo_async(ruta=ARCHIVO_CATALOGO_VOCES):
+    """Lanza un refresco del catálogo en un hilo de fondo (si no hay uno en curso)"""
+    global _refresco_en_curso
+    with _lock_refresco:
+        if _refresco_en_curso:
+            return
+        _refresco_en_curso = True
+    threading.Thread(target=_refrescar_en_segundo_plano, args=(ruta,), name="catalogo-voces", daemon=True).start()
+
+def catalogo_caducado(catalogo, ttl_horas=TTL_CATALOGO_HORAS):
+    return time.time() - catalogo.get("actualizado", 0) > ttl_horas * 3600
+
+def obtener_catalogo(ruta=ARCHIVO_CATALOGO_VOCES, ttl_horas=TTL_CATALOGO_HORAS):
+    """Devuelve el catálogo de voces sin esperar a la red salvo que no exista ninguno en disco.
+    Si está caducado se devuelve igualmente y se refresca en segundo plano."""
+    catalogo = cargar_catalogo(ruta)
+    if catalogo is None:
+        # Primer arranque: no hay nada que servir, hay que descargarlo
+        return actualizar_catalogo(ruta)
+    if catalogo_caducado(catalogo, ttl_horas):
+        refrescar_catalogo_async(ruta)
+    return catalogo
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""Artefactos persistentes de la ingesta de YouTube, por ID de video y etapa.
+
+Cada video tiene su carpeta (ID normalizado de 11 caracteres) con un archivo por etapa:
+audio extraído, transcripción y guión de Gemini. Si una etapa ya tiene su artefacto
+se salta, así que un fallo a mitad o un rerun de Streamlit continúa desde la última
+etapa completada sin volver a descargar ni pagar llamadas a la API.
+"""
+import os
+import re
+import sys
+import shutil
+import hashlib
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+# Escritura atómica compartida con EDGETTS
+_EDGETTS_DIR = str(Path(__file__).resolve().parent.parent / "EDGETTS")
+if _EDGETTS_DIR not in sys.path:
+    sys.path.append(_EDGETTS_DIR)
+from output_allocator import escritura_atomica
+
+ARTIFACTS_DIR = Path(os.environ.get(
+    "NARRATOR_ARTIFACTS_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "narrator_youtube")
+))
+
+STAGE_AUDIO = "audio"
+STAGE_TRANSCRIPT = "transcript"
+STAGE_GEMINI = "gemini"
+
+_VIDEO_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+
+def normalize_youtube_id(url):
+    """ID de 11 caracteres de una URL de YouTube (watch, youtu.be, shorts, embed, live) o None."""
+    url = (url or "").strip()
+    if _VIDEO_ID_RE.match(url):
+        return url
+    parsed = urlparse(url if "://" in url else f"https://{url}")
+    host = (parsed.hostname or "").lower()
+    candidate = None
+    if host.endswith("youtu.be"):
+        candidate = parsed.path.lstrip("/").split("/")[0]
+    elif "youtube" in host:
+        candidate = parse_qs(parsed.query).get("v", [None])[0]
+        if not candidate:
+            parts = [p for p in parsed.path.split("/") if p]
+            if len(parts) >= 2 and parts[0] in ("shorts", "embed", "live", "v"):
+                candidate = parts[1]
+    return candidate if candidate and _VIDEO_ID_RE.match(candidate) else None
+
+def stage_variant(stage, *params):
+    """Nombre de etapa que depende de parámetros (p.ej. modelo y prompt de Gemini):
+    si cambian, el artefacto anterior no se reutiliza."""
+    digest = hashlib.sha256("\x00".join(str(p) for p in params).encode("utf-8")).hexdigest()[:12]
+    return f"{stage}_{digest}"
+
+class ArtifactStore:
+    """Artefactos por (video_id, etapa) guardados en disco con escritura atómica"""
+
+    def __init__(self, root=ARTIFACTS_DIR):
+        self.root = Path(root)
+
+    def _path(self, video_id, stage, suffix):
+        return self.root / video_id / f"{stage}{suffix}"
+
+    def get_text(self, video_id, stage):
+        """Texto de la etapa o None si todavía no se ha completado."""
+        path = self._path(video_id, stage, ".txt")
+        try:
+            return path.read_text(encoding="utf-8")
+        except OSError:
+            return None
+
+    def put_text(self, video_id, stage, text):
+        path = self._path(video_id, stage, ".txt")
+        with escritura_atomica(str(path)) as temp_path:
+            Path(temp_path).write_text(text, encoding="utf-8")
+        return path
+
+    def get_file(self, video_id, stage, suffix):
+        """Ruta del archivo de la etapa o None si no existe (o está vacío)."""
+        path = self._path(video_id, stage, suffix)
+        return path if path.is_file() and path.stat().st_size > 0 else None
+
+    def put_file(self, video_id, stage, source_path, suffix):
+        """Copia un archivo como artefacto de la etapa y devuelve su ruta."""
+        path = self._path(video_id, stage, suffix)
+        with escritura_atomica(str(path)) as temp_path:
+            shutil.copyfile(source_path, temp_path)
+        return path
+
+
+# Instancia compartida
+artifact_store = ArtifactStore()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Ensamblado lineal de los segmentos de audio de los narradores.
+
+Encadenar AudioSegment con += o .append(crossfade=...) copia todo el audio acumulado
+en cada paso (coste cuadrático en el número de partes). Aquí cada parte se decodifica
+una sola vez y la unión (buffer preasignado, pausas y crossfades en su sitio) la hace
+pcm_audio.unir, la misma que usa EDGETTS. El resultado se codifica una vez.
+
+Los segmentos tienen el mismo formato que construye generate_full_audio:
+    {"type": "audio", "name": ..., "data": AudioPCM | bytes[, "format": "mp3"]}
+    {"type": "pause", "duration": ms}
+    {"type": "crossfade", "duration": ms}
+"""
+import sys
+from pathlib import Path
+
+# Formato PCM compartido con EDGETTS
+_EDGETTS_DIR = str(Path(__file__).resolve().parent.parent / "EDGETTS")
+if _EDGETTS_DIR not in sys.path:
+    sys.path.append(_EDGETTS_DIR)
+from pcm_audio import AudioPCM, unir
+
+MIN_CROSSFADE_MS = 10 # Crossfades más cortos se sustituyen por una unión directa
+
+def decode_audio(data, audio_format="mp3"):
+    """Decodifica un segmento a PCM (si ya es AudioPCM se usa tal cual, sin copiar)."""
+    if isinstance(data, AudioPCM):
+        return data
+    return AudioPCM.desde_bytes(data, audio_format)
+
+def assemble_segments(segments, on_decode_error=None):
+    """Une los segmentos en un solo AudioPCM en tiempo lineal.
+
+    Mantiene la semántica del ensamblado anterior: una pausa solo se añade si ya hay audio
+    y corta el crossfade siguiente; el crossfade se limita a la mitad de cada parte y si
+    queda en MIN_CROSSFADE_MS o menos se hace una unión directa. Los segmentos que no se
+    pueden decodificar se saltan (se notifica con on_decode_error(nombre, excepción)).
+    Devuelve None si no hay audio.
+    """
+    # 1) Decodificar cada parte una sola vez
+    decoded = {}
+    for idx, segment_info in enumerate(segments):
+        if segment_info["type"] != "audio":
+            continue
+        try:
+            decoded[idx] = decode_audio(segment_info["data"], segment_info.get("format", "mp3"))
+        except Exception as e:
+            if on_decode_error:
+                on_decode_error(segment_info.get("name", f"segmento {idx}"), e)
+    if not decoded:
+        return None
+
+    # 2) Traducir los segmentos a partes de unir: las pausas iniciales se descartan y cada
+    #    crossfade se aplica a la parte de audio que lo sigue
+    parts = []
+    crossfades_ms = []
+    last_duration_ms = None
+    for idx, segment_info in enumerate(segments):
+        segment_type = segment_info["type"]
+        if segment_type == "audio":
+            if idx not in decoded:
+                continue
+            audio = decoded.pop(idx)
+            crossfade_ms = 0
+            if last_duration_ms is not None and idx > 0 and segments[idx - 1]["type"] == "crossfade":
+                safe_cf = min(segments[idx - 1]["duration"], last_duration_ms // 2, len(audio) // 2)
+                if safe_cf > MIN_CROSSFADE_MS:
+                    crossfade_ms = safe_cf
+            parts.append(audio)
+            crossfades_ms.append(crossfade_ms)
+            last_duration_ms = len(audio)
+        elif segment_type == "pause":
+            if parts:
+                parts.append(int(segment_info["duration"]))
+            last_duration_ms = None
+
+    # 3) Unión en un buffer preasignado (formato común: el de mayor calidad, como pydub)
+    return unir(parts, crossfades_ms)
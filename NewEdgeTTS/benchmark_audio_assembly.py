@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Benchmark del ensamblado de audio: append de pydub (anterior) frente a audio_assembly (NumPy).
+
+Genera partes sintéticas en WAV (no necesita FFmpeg ni red) con la misma estructura de
+segmentos que generate_full_audio: título, pausa, partes con crossfade, pausa y outro.
+
+Uso:
+    python benchmark_audio_assembly.py                 # 10, 100 y 500 partes
+    python benchmark_audio_assembly.py --parts 10 50   # tamaños concretos
+"""
+import io
+import time
+import wave
+import argparse
+import tracemalloc
+import numpy as np
+from pydub import AudioSegment
+
+from audio_assembly import assemble_segments
+
+CROSSFADE_DURATION_MS = 450
+PAUSE_BETWEEN_SECTIONS_MS = 800
+FRAME_RATE = 24000 # Formato de salida de Edge TTS (mono, 16 bits)
+
+def make_part(duration_s, rng):
+    """Tono con ruido de la duración indicada, como WAV en bytes."""
+    frames = int(duration_s * FRAME_RATE)
+    t = np.arange(frames) / FRAME_RATE
+    signal = 0.3 * np.sin(2 * np.pi * rng.uniform(100, 400) * t) + 0.05 * rng.standard_normal(frames)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(FRAME_RATE)
+        wav.writeframes((signal * 32767).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+def make_segments(num_parts, seed=0):
+    """Título + (num_parts - 2) partes con crossfade + outro."""
+    rng = np.random.default_rng(seed)
+
+    def audio(i):
+        return {"type": "audio", "name": f"part_{i:03d}.wav", "format": "wav", "data": make_part(rng.uniform(2, 6), rng)}
+
+    segments = [audio(0), {"type": "pause", "duration": PAUSE_BETWEEN_SECTIONS_MS}]
+    for i in range(1, num_parts - 1):
+        if i > 1:
+            segments.append({"type": "crossfade", "duration": CROSSFADE_DURATION_MS})
+        segments.append(audio(i))
+    segments.append({"type": "pause", "duration": PAUSE_BETWEEN_SECTIONS_MS})
+    segments.append({"type": "crossfade", "duration": CROSSFADE_DURATION_MS})
+    segments.append(audio(num_parts - 1))
+    return segments
+
+def assemble_segments_pydub(segments):
+    """Ensamblado anterior de generate_full_audio (+= y append con crossfade)."""
+    combined_audio = AudioSegment.empty()
+    last_audio_segment = None
+    for idx, segment_info in enumerate(segments):
+        if segment_info["type"] == "audio":
+            current_segment = AudioSegment.from_file(io.BytesIO(segment_info["data"]), format=segment_info.get("format", "mp3"))
+            if last_audio_segment is not None and idx > 0 and segments[idx-1]["type"] == "crossfade":
+                safe_cf = min(segments[idx-1]["duration"], len(last_audio_segment) // 2, len(current_segment) // 2)
+                if safe_cf > 10:
+                    combined_audio = combined_audio.append(current_segment, crossfade=safe_cf)
+                else:
+                    combined_audio += current_segment
+            else:
+                combined_audio += current_segment
+            last_audio_segment = current_segment
+        elif segment_info["type"] == "pause":
+            if len(combined_audio) > 0:
+                combined_audio += AudioSegment.silent(duration=segment_info["duration"], frame_rate=FRAME_RATE)
+            last_audio_segment = None
+    return combined_audio
+
+def measure(func, segments):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(segments)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 2**20
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parts", type=int, nargs="+", default=[10, 100, 500], help="Número de partes a ensamblar")
+    args = parser.parse_args()
+
+    print(f"{'partes':>6} {'audio':>9} | {'pydub':>9} {'pico':>9} | {'numpy':>9} {'pico':>9} | {'mejora':>7} {'dif. ms':>7}")
+    for num_parts in args.parts:
+        segments = make_segments(max(3, num_parts))
+        old_audio, old_s, old_mb = measure(assemble_segments_pydub, segments)
+        new_audio, new_s, new_mb = measure(assemble_segments, segments)
+        print(f"{num_parts:>6} {len(new_audio) / 1000:>8.0f}s | {old_s:>8.2f}s {old_mb:>7.0f}MB | "
+              f"{new_s:>8.2f}s {new_mb:>7.0f}MB | {old_s / new_s:>6.1f}x {abs(len(old_audio) - len(new_audio)):>7}")
+
+if __name__ == "__main__":
+    main()
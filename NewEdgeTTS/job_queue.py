@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""Cola local de trabajos en segundo plano (SQLite + pool de procesos).
+
+La interfaz de Streamlit vuelve a ejecutar el script en cada interacción, así que el
+trabajo pesado (ingesta de YouTube, síntesis de la narración, render del video) no
+puede ir en línea: bloquearía la página y solo permitiría un render a la vez. Aquí
+cada trabajo se guarda en SQLite y se ejecuta en un ProcessPoolExecutor; el worker
+escribe en la misma base su estado, progreso, avisos y resultado (rutas de archivos
+en disco), y la interfaz solo consulta la base para mostrarlos.
+
+El pool vive en el módulo (Streamlit no reimporta módulos en cada rerun), así que lo
+comparten todas las sesiones del servidor. Los workers solo importan narrator_core,
+nunca narrator_tts (que arranca la interfaz al importarse).
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import importlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from narrator_core import Reporter, OUTPUT_SUBDIR
+
+JOBS_DB_PATH = os.environ.get("NARRATOR_JOBS_DB", os.path.join(OUTPUT_SUBDIR, "jobs.db"))
+JOB_WORKERS = int(os.environ.get("NARRATOR_JOB_WORKERS", "2")) # Trabajos ejecutándose a la vez
+PROGRESS_WRITE_INTERVAL_S = 0.5 # Mensajes intermedios de progreso: como mucho uno cada medio segundo
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+FINISHED_STATUSES = (STATUS_DONE, STATUS_FAILED, STATUS_CANCELLED)
+
+# Tipo de trabajo -> "módulo:función". La función recibe (params, reporter) y devuelve un dict JSON.
+# Se resuelve por nombre dentro del worker (con spawn el proceso hijo no hereda registros hechos en runtime).
+JOB_HANDLERS = {
+    "youtube": "narrator_core:run_youtube_job",
+    "render": "narrator_core:run_render_job",
+}
+
+def _connect(db_path):
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    connection = sqlite3.connect(db_path, timeout=30)
+    connection.row_factory = sqlite3.Row
+    # WAL: la interfaz puede leer mientras los workers escriben progreso
+    connection.execute("PRAGMA journal_mode=WAL")
+    return connection
+
+def _init_db(db_path):
+    with _connect(db_path) as connection:
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, params TEXT NOT NULL, status TEXT NOT NULL, "
+            "progress REAL NOT NULL DEFAULT 0, message TEXT NOT NULL DEFAULT '', log TEXT NOT NULL DEFAULT '[]', "
+            "result TEXT, error TEXT, created REAL NOT NULL, started REAL, finished REAL)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)")
+
+def _row_to_job(row):
+    job = dict(row)
+    job["params"] = json.loads(job["params"])
+    job["log"] = json.loads(job["log"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+def _update_job(db_path, job_id, **fields):
+    columns = ", ".join(f"{name} = ?" for name in fields)
+    with _connect(db_path) as connection:
+        connection.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+class JobReporter(Reporter):
+    """Reporter del worker: guarda progreso, mensaje y avisos del trabajo en SQLite"""
+
+    def __init__(self, db_path, job_id):
+        self.db_path = db_path
+        self.job_id = job_id
+        self._progress = 0.0
+        self._last_write = 0.0
+
+    def _write(self, message, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_write < PROGRESS_WRITE_INTERVAL_S:
+            return
+        self._last_write = now
+        _update_job(self.db_path, self.job_id, progress=self._progress, message=message)
+
+    def text(self, message):
+        self._write(message)
+
+    def progress(self, fraction, message):
+        self._progress = max(self._progress, float(fraction))
+        self._write(message, force=fraction >= 1.0)
+
+    def _log(self, level, message):
+        print(f"[{self.job_id[:8]}] {level}: {message}")
+        with _connect(self.db_path) as connection:
+            row = connection.execute("SELECT log FROM jobs WHERE id = ?", (self.job_id,)).fetchone()
+            log = json.loads(row["log"]) if row else []
+            log.append({"level": level, "message": message})
+            connection.execute("UPDATE jobs SET log = ? WHERE id = ?", (json.dumps(log, ensure_ascii=False), self.job_id))
+
+    def info(self, message):
+        self._log("info", message)
+
+    def warning(self, message):
+        self._log("warning", message)
+
+    def error(self, message):
+        self._log("error", message)
+
+
+def run_job(db_path, job_id):
+    """Punto de entrada en el proceso worker: ejecuta el trabajo y guarda su resultado o error."""
+    with _connect(db_path) as connection:
+        # Marcar como en ejecución solo si sigue en cola (pudo cancelarse mientras esperaba)
+        claimed = connection.execute(
+            "UPDATE jobs SET status = ?, started = ? WHERE id = ? AND status = ?",
+            (STATUS_RUNNING, time.time(), job_id, STATUS_QUEUED)
+        ).rowcount
+        row = connection.execute("SELECT kind, params FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if not claimed or row is None:
+        return
+    reporter = JobReporter(db_path, job_id)
+    try:
+        module_name, function_name = JOB_HANDLERS[row["kind"]].split(":")
+        handler = getattr(importlib.import_module(module_name), function_name)
+        result = handler(json.loads(row["params"]), reporter)
+        _update_job(db_path, job_id, status=STATUS_DONE, progress=1.0, message="Completado",
+                    result=json.dumps(result, ensure_ascii=False), finished=time.time())
+    except Exception as e:
+        _update_job(db_path, job_id, status=STATUS_FAILED, message=f"Error: {e}", error=str(e), finished=time.time())
+
+class JobQueue:
+    """Trabajos persistidos en SQLite y ejecutados en un pool de procesos"""
+
+    def __init__(self, db_path=JOBS_DB_PATH, max_workers=JOB_WORKERS):
+        self.db_path = os.path.abspath(db_path)
+        self.max_workers = max(1, int(max_workers))
+        # spawn: el servidor de Streamlit tiene hilos y un fork copiaría locks tomados por ellos
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        self._lock = threading.Lock()
+        _init_db(self.db_path)
+        self._recover()
+
+    def _recover(self):
+        """Trabajos de un servidor anterior: los que estaban en cola se relanzan y los que
+        estaban a medias se marcan como fallidos (su proceso ya no existe)."""
+        with _connect(self.db_path) as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, error = ?, message = ?, finished = ? WHERE status = ?",
+                (STATUS_FAILED, "Interrumpido por un reinicio del servidor", "Interrumpido", time.time(), STATUS_RUNNING)
+            )
+            queued = [row["id"] for row in connection.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created", (STATUS_QUEUED,))]
+        for job_id in queued:
+            self._executor.submit(run_job, self.db_path, job_id)
+
+    def submit(self, kind, params):
+        """Encola un trabajo y devuelve su ID. params debe ser serializable a JSON."""
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"Tipo de trabajo desconocido: {kind}")
+        job_id = uuid.uuid4().hex
+        with _connect(self.db_path) as connection:
+            connection.execute(
+                "INSERT INTO jobs (id, kind, params, status, message, created) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(params, ensure_ascii=False), STATUS_QUEUED, "En cola", time.time())
+            )
+        with self._lock:
+            self._executor.submit(run_job, self.db_path, job_id)
+        return job_id
+
+    def get(self, job_id):
+        """Estado actual del trabajo (dict) o None si no existe."""
+        with _connect(self.db_path) as connection:
+            row = connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def get_many(self, job_ids):
+        """Estados de varios trabajos en el orden pedido (omite los que no existen)."""
+        if not job_ids:
+            return []
+        placeholders = ", ".join("?" for _ in job_ids)
+        with _connect(self.db_path) as connection:
+            rows = connection.execute(f"SELECT * FROM jobs WHERE id IN ({placeholders})", list(job_ids)).fetchall()
+        jobs = {row["id"]: _row_to_job(row) for row in rows}
+        return [jobs[job_id] for job_id in job_ids if job_id in jobs]
+
+    def cancel(self, job_id):
+        """Cancela un trabajo que aún no ha empezado. Devuelve False si ya está en marcha o terminado."""
+        with _connect(self.db_path) as connection:
+            return connection.execute(
+                "UPDATE jobs SET status = ?, message = ?, finished = ? WHERE id = ? AND status = ?",
+                (STATUS_CANCELLED, "Cancelado", time.time(), job_id, STATUS_QUEUED)
+            ).rowcount > 0
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+def get_job_queue():
+    """Cola compartida del proceso (se crea al primer uso y sobrevive a los reruns de Streamlit)."""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue()
+        return _job_queue
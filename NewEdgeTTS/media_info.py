@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Metadatos de audio/video leídos con ffprobe (sin decodificar el archivo).
+
+Saber la duración de una narración de 30 minutos con AudioSegment.from_file obliga a
+decodificarla entera en RAM; ffprobe la lee de los metadatos del contenedor en
+milisegundos. Los resultados se cachean por ruta + mtime + tamaño, así que un archivo
+que se reescribe se vuelve a consultar automáticamente.
+"""
+import os
+import json
+import threading
+import subprocess
+
+_cache = {} # ruta -> ((mtime_ns, tamaño), info)
+_cache_lock = threading.Lock()
+
+def _run_ffprobe(path):
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-print_format", "json", "-show_format", "-show_streams", path],
+        capture_output=True, text=True, check=True, encoding='utf-8', errors='ignore'
+    )
+    data = json.loads(result.stdout or "{}")
+    streams = data.get("streams", [])
+    fmt = data.get("format", {})
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    main_stream = audio or video or {}
+
+    duration = fmt.get("duration") or main_stream.get("duration")
+    if duration is None:
+        raise ValueError(f"ffprobe no devolvió la duración de {path}")
+    return {
+        "duration_s": float(duration),
+        "format": fmt.get("format_name"),
+        "codec": main_stream.get("codec_name"),
+        "sample_rate": int(audio["sample_rate"]) if audio and audio.get("sample_rate") else None,
+        "channels": audio.get("channels") if audio else None,
+        "video_codec": video.get("codec_name") if video else None,
+        "width": video.get("width") if video else None,
+        "height": video.get("height") if video else None,
+    }
+
+def probe_media(path):
+    """Devuelve un diccionario con duración (s), formato, códec, frecuencia y canales del archivo.
+    Lanza FileNotFoundError si el archivo (o ffprobe) no existe y CalledProcessError si ffprobe falla."""
+    path = os.path.abspath(str(path))
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached and cached[0] == version:
+            return cached[1]
+    info = _run_ffprobe(path)
+    with _cache_lock:
+        _cache[path] = (version, info)
+    return info
+
+def get_duration_s(path):
+    """Duración en segundos leída de los metadatos del contenedor."""
+    return probe_media(path)["duration_s"]
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""Render por lotes (sin Streamlit) de una carpeta de guiones a audio y video.
+
+Uso:
+    python narrator_cli.py guiones/ --voices voces.json --workers 3 --output generated_files
+
+Cada guión es un archivo de texto con el formato de la interfaz ([Narrador] texto...).
+Las voces se asignan con un JSON {narrador: voz}, donde la voz es un ID de Edge TTS
+(p.ej. "es-CL-LorenzoNeural") o {"voice": ID, "speed": 1.2}. El JSON de --voices vale
+para todos los guiones; un <guion>.json junto al guión lo completa o sobrescribe y
+además puede indicar título y outro:
+
+    {"title": "...", "outro": "...", "voices": {"Narrador1": "es-AR-TomasNeural"},
+     "genders": {"Narrador2": "male"}}
+
+Los narradores sin voz usan la voz por defecto de su género (femenina si no se indica).
+Cada guión se renderiza en su propio proceso. El estado del lote se guarda en
+<output>/batch_state.json: al relanzar solo se procesan los guiones nuevos, editados
+o que fallaron.
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from narrator_core import (
+    Reporter, run_render_job, narrator_settings, detect_narrators,
+    MAX_CONCURRENT_TTS_REQUESTS, OUTPUT_SUBDIR, VIDEO_SOURCE_FOLDER,
+)
+
+DEFAULT_WORKERS = 2
+DEFAULT_PATTERN = "*.txt"
+BATCH_STATE_FILENAME = "batch_state.json"
+
+class ConsoleReporter(Reporter):
+    """Reporter con el nombre del guión como prefijo (varios procesos escriben en la misma consola)"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def text(self, message):
+        print(f"[{self.name}] {message}", flush=True)
+
+    def info(self, message):
+        self.text(f"Info: {message}")
+
+    def warning(self, message):
+        self.text(f"Adv: {message}")
+
+    def error(self, message):
+        self.text(f"Error: {message}")
+
+
+def load_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def load_script_job(script_path, default_voices=None, output_dir=OUTPUT_SUBDIR, video_folder=VIDEO_SOURCE_FOLDER,
+                    max_concurrency=MAX_CONCURRENT_TTS_REQUESTS, with_video=True):
+    """Parámetros del trabajo 'render' (narrator_core.run_render_job) de un guión y su JSON opcional."""
+    script_path = Path(script_path)
+    script = script_path.read_text(encoding="utf-8")
+    sidecar_path = script_path.with_suffix(".json")
+    sidecar = load_json(sidecar_path) if sidecar_path.is_file() else {}
+    narrator_voices, narrator_speeds = narrator_settings({**(default_voices or {}), **sidecar.get("voices", {})})
+    return {
+        "script": script,
+        "title_text": sidecar.get("title", ""),
+        "outro_text": sidecar.get("outro", ""),
+        "outro_enabled": bool(sidecar.get("outro")),
+        "narrator_voices": narrator_voices,
+        "narrator_speeds": narrator_speeds,
+        "gender_selection": sidecar.get("genders", {}),
+        "max_concurrency": max_concurrency,
+        # Nombre del guión en vez de marca de tiempo: generated_audio_<guion>.mp3, estable entre ejecuciones
+        "timestamp": script_path.stem,
+        "with_video": with_video,
+        "output_dir": str(output_dir),
+        "video_folder": str(video_folder),
+    }
+
+def job_key(params):
+    """Hash del trabajo: si cambia el guión, las voces o las opciones, se vuelve a renderizar."""
+    content = json.dumps(params, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()[:12]
+
+def render_script(params):
+    """Se ejecuta en un proceso del pool: renderiza un guión y devuelve el resultado (rutas en disco)."""
+    start = time.perf_counter()
+    result = run_render_job(params, ConsoleReporter(params["timestamp"]))
+    result["duration_s"] = round(time.perf_counter() - start, 2)
+    return result
+
+def load_state(path):
+    try:
+        return load_json(path).get("scripts", {})
+    except (OSError, ValueError):
+        return {}
+
+def save_state(path, state, summary=None):
+    """Guarda el estado del lote de forma atómica (temporal + os.replace)"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump({"scripts": state, "summary": summary}, f, indent=4, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+def is_complete(info, key, with_video):
+    """Completo si terminó bien con el mismo contenido y sus archivos siguen en disco"""
+    if not info or info.get("status") != "ok" or info.get("key") != key:
+        return False
+    paths = [info.get("audio_path")] + ([info.get("video_path")] if with_video else [])
+    return all(path and os.path.exists(path) for path in paths)
+
+def run_batch(jobs, workers=DEFAULT_WORKERS, state_path=None, restart=False, with_video=True):
+    """Renderiza {nombre: params} en un pool de procesos y devuelve el resumen del lote."""
+    state = {} if restart or not state_path else load_state(state_path)
+    pending = {}
+    skipped = 0
+    for name, params in jobs.items():
+        key = job_key(params)
+        if is_complete(state.get(name), key, with_video):
+            skipped += 1
+            continue
+        state[name] = {"key": key, "status": "pending", "audio_path": None, "video_path": None, "message": "", "duration_s": None}
+        pending[name] = params
+
+    print(f"Guiones: {len(jobs)} | ya completados: {skipped} | pendientes: {len(pending)} | workers: {workers}")
+    if state_path:
+        save_state(state_path, state)
+
+    start = time.perf_counter()
+    # spawn como en job_queue: mismo arranque de los workers en Linux, macOS y Windows
+    with ProcessPoolExecutor(max_workers=max(1, workers), mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = {executor.submit(render_script, params): name for name, params in pending.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            info = state[name]
+            try:
+                result = future.result()
+                video_missing = with_video and not result["video_path"]
+                info.update({
+                    "status": "error" if video_missing else "ok",
+                    "audio_path": result["audio_path"],
+                    "video_path": result["video_path"],
+                    "message": "Audio generado, pero la creación del video falló." if video_missing else "",
+                    "duration_s": result["duration_s"],
+                })
+            except Exception as e:
+                info.update({"status": "error", "message": f"Error: {e}"})
+            duration_s = f" ({info['duration_s']}s)" if info["duration_s"] is not None else ""
+            print(f"[{name}] {info['status']}{duration_s} {info['message']}", flush=True)
+            if state_path:
+                save_state(state_path, state)
+
+    duration = time.perf_counter() - start
+    processed = [state[name] for name in pending]
+    failed = {name: state[name]["message"] for name in pending if state[name]["status"] != "ok"}
+    summary = {
+        "selected": len(jobs),
+        "skipped": skipped,
+        "processed": len(processed),
+        "ok": len(processed) - len(failed),
+        "failed": len(failed),
+        "duration_s": round(duration, 2),
+        "workers": workers,
+        "errors": failed,
+    }
+    if state_path:
+        save_state(state_path, state, summary)
+    return summary
+
+def print_summary(summary):
+    print("=" * 60)
+    print("RESUMEN DEL LOTE")
+    print("-" * 60)
+    print(f"Guiones: {summary['selected']} (omitidos por estar completos: {summary['skipped']})")
+    print(f"Procesados: {summary['processed']} | Correctos: {summary['ok']} | Fallidos: {summary['failed']}")
+    print(f"Duración: {summary['duration_s']}s con {summary['workers']} workers")
+    for name, message in summary["errors"].items():
+        print(f"  {name}: {message}")
+    print("=" * 60)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Renderiza a audio y video todos los guiones de una carpeta")
+    parser.add_argument("scripts_dir", help="Carpeta con los guiones ([Narrador] texto...)")
+    parser.add_argument("--pattern", default=DEFAULT_PATTERN, help="Patrón de los archivos de guión")
+    parser.add_argument("--voices", default=None, help="JSON {narrador: voz} común a todos los guiones")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Guiones renderizados en paralelo (procesos)")
+    parser.add_argument("--tts-concurrency", type=int, default=MAX_CONCURRENT_TTS_REQUESTS, help="Peticiones TTS simultáneas por guión")
+    parser.add_argument("--output", default=OUTPUT_SUBDIR, help="Carpeta de salida")
+    parser.add_argument("--video-folder", default=str(VIDEO_SOURCE_FOLDER), help="Carpeta de videos base")
+    parser.add_argument("--no-video", action="store_true", help="Generar solo el audio")
+    parser.add_argument("--restart", action="store_true", help="Ignorar el estado previo y renderizar todo")
+    args = parser.parse_args(argv)
+
+    script_paths = sorted(Path(args.scripts_dir).glob(args.pattern))
+    if not script_paths:
+        print(f"No hay guiones '{args.pattern}' en {args.scripts_dir}.")
+        return 0
+
+    try:
+        default_voices = load_json(args.voices) if args.voices else {}
+    except (OSError, ValueError) as e:
+        print(f"Error al cargar {args.voices}: {e}")
+        return 1
+
+    with_video = not args.no_video
+    jobs = {}
+    for script_path in script_paths:
+        try:
+            params = load_script_job(script_path, default_voices, args.output, args.video_folder,
+                                     args.tts_concurrency, with_video)
+        except (OSError, ValueError) as e:
+            print(f"Error al cargar {script_path.name}: {e}. Saltando.")
+            continue
+        unassigned = [n for n in detect_narrators(params["script"]) if n not in params["narrator_voices"]]
+        if unassigned:
+            print(f"[{script_path.stem}] Narradores sin voz asignada (voz por defecto): {', '.join(unassigned)}")
+        jobs[script_path.stem] = params
+
+    summary = run_batch(jobs, args.workers, os.path.join(args.output, BATCH_STATE_FILENAME), args.restart, with_video)
+    print_summary(summary)
+    return 1 if summary["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
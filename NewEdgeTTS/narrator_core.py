@@ -0,0 +1,1099 @@
+# -*- coding: utf-8 -*-
+"""Lógica del narrador sin Streamlit: ingesta de YouTube, guión con Gemini, TTS y video.
+
+La interfaz (narrator_tts.py), la cola de trabajos en segundo plano (job_queue.py) y
+cualquier script pueden usar estas funciones. En vez de llamar a st.*, el progreso y
+los avisos se notifican a un Reporter: la interfaz lo envía a sus placeholders, la
+cola lo guarda en SQLite y por defecto se imprime por consola. La configuración de
+narradores (voces y velocidades) se pasa como diccionarios, no se lee de session_state.
+"""
+import os
+import re
+import sys
+import math
+import time
+import shutil
+import asyncio
+import hashlib
+import datetime
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import edge_tts
+from pydub import AudioSegment
+from dotenv import load_dotenv
+
+# Módulos compartidos con EDGETTS (cachés TTS/LLM, nombres de salida, PCM)
+sys.path.append(str(Path(__file__).resolve().parent.parent / "EDGETTS"))
+from pcm_audio import AudioPCM, unir as join_pcm
+from tts_cache import cache_tts
+from llm_cache import cache_llm
+from output_allocator import reservar_numero, escritura_atomica
+from text_chunker import dividir_texto, dividir_con_solapamiento
+from audio_assembly import assemble_segments
+from media_info import get_duration_s
+from video_library import get_video_library
+from artifact_store import artifact_store, normalize_youtube_id, stage_variant, STAGE_AUDIO, STAGE_TRANSCRIPT, STAGE_GEMINI
+
+load_dotenv()
+
+# Modelo Gemini
+GEMINI_MODEL_NAME = "gemini-2.5-pro-preview-05-06" # Modelo recomendado y potente
+# Transcripciones largas: map-reduce por fragmentos de oraciones
+GEMINI_CHUNK_TOKEN_BUDGET = 8000 # Tokens de transcripción por petición
+GEMINI_CHARS_PER_TOKEN = 4 # Estimación para no gastar una llamada a count_tokens por fragmento
+GEMINI_CHUNK_OVERLAP_SENTENCES = 2 # Oraciones del fragmento anterior enviadas como contexto
+GEMINI_MAX_CONCURRENT_CHUNKS = 4
+GEMINI_CHUNK_MAX_RETRIES = 3
+GEMINI_RETRY_BASE_DELAY_S = 2.0
+
+# --- Constantes del Pipeline ---
+CROSSFADE_DURATION_MS = 450
+PAUSE_BETWEEN_SECTIONS_MS = 800
+MAX_CONCURRENT_TTS_REQUESTS = 6 # Peticiones simultáneas a Edge TTS en generate_full_audio
+TTS_MAX_RETRIES = 3 # Intentos por fragmento antes de dar la parte por fallida
+TTS_RETRY_BASE_DELAY_S = 1.0 # Backoff exponencial: 1s, 2s, 4s...
+TTS_CHUNK_MAX_CHARS = 800 # Partes más largas se dividen por oraciones/párrafos
+TTS_CHUNK_CONCURRENCY = 3 # Fragmentos a la vez cuando synthesize_long_text se usa sin semáforo compartido
+DEFAULT_VOICE_SPEED = 1.0
+DEFAULT_SPEED_SLIDER_VALUE = 1.0
+PART_AUDIO_FILE_PATTERN = "part_{:03d}.pcm"
+GENERATED_AUDIO_FILENAME = "generated_audio_{}.mp3"
+GENERATED_VIDEO_FILENAME = "generated_video_{}.mp4"
+OUTPUT_SUBDIR = "generated_files"
+# !!! IMPORTANTE: AJUSTA ESTA RUTA A TU CARPETA REAL DE VIDEOS BASE !!!
+VIDEO_SOURCE_FOLDER = Path("C:/Users/crist/OneDrive/Documents/Progra/Python/NewEdgeTTS/VIDEOS")
+VIDEO_FILENAME_PATTERN = r"(\d{2})_(\d{2})_(\d{2})_.*\.mp4"
+TITLE_NARRATOR_NAME = "Título"
+OUTRO_NARRATOR_NAME = "Outro"
+SCRIPT_PART_PATTERN = r'\[([^\]]+)\](.*?)(?=\n\[|\Z)'
+
+# Duración máxima de cada fragmento de audio para Whisper (en milisegundos)
+# 15 minutos (900,000 ms) es un límite seguro para 192kbps MP3 vs 25MB API limit.
+WHISPER_CHUNK_DURATION_MS = 15 * 60 * 1000
+WHISPER_MAX_WORKERS = 4 # Fragmentos exportados y transcritos a la vez
+WHISPER_MAX_RETRIES = 3
+WHISPER_RETRY_BASE_DELAY_S = 2.0
+# Los cortes se mueven al silencio más cercano dentro de +-20 s del corte nominal
+WHISPER_SILENCE_SEARCH_MS = 20 * 1000
+WHISPER_SILENCE_NOISE_DB = -35
+WHISPER_SILENCE_MIN_S = 0.3
+# Ingesta de YouTube solo audio: fragmentos mono 16 kHz de bajo bitrate (suficiente para Whisper)
+STREAM_AUDIO_SAMPLE_RATE = 16000
+STREAM_AUDIO_BITRATE = "32k"
+STREAM_POLL_INTERVAL_S = 0.5
+
+FILTERED_VOICES = {
+    "female": {
+        "es-CL-CatalinaNeural (Female - es-CL)": {"id": "es-CL-CatalinaNeural", "display": "CatalinaNeural (Chile)", "speed": 1.1},
+        "es-BO-SofiaNeural (Female - es-BO)": {"id": "es-BO-SofiaNeural", "display": "SofiaNeural (Bolivia)", "speed": 1.1},
+        "es-AR-ElenaNeural (Female - es-AR)": {"id": "es-AR-ElenaNeural", "display": "ElenaNeural (Argentina)", "speed": 1.1},
+        "es-CO-SalomeNeural (Female - es-CO)": {"id": "es-CO-SalomeNeural", "display": "SalomeNeural (Colombia)", "speed": 1.2},
+        "es-ES-XimenaNeural (Female - es-ES)": {"id": "es-ES-XimenaNeural", "display": "XimenaNeural (España)", "speed": 1.1},
+        "es-CU-BelkysNeural (Female - es-CU)": {"id": "es-CU-BelkysNeural", "display": "BelkysNeural (Cuba)", "speed": 1.2},
+        "es-PY-TaniaNeural (Female - es-PY)": {"id": "es-PY-TaniaNeural", "display": "TaniaNeural (Paraguay)", "speed": 1.1},
+        "es-UY-ValentinaNeural (Female - es-UY)": {"id": "es-UY-ValentinaNeural", "display": "ValentinaNeural (Uruguay)", "speed": 1.1}
+    },
+    "male": {
+        "es-CL-LorenzoNeural (Male - es-CL)": {"id": "es-CL-LorenzoNeural", "display": "LorenzoNeural (Chile)", "speed": 1.1},
+        "es-BO-MarceloNeural (Male - es-BO)": {"id": "es-BO-MarceloNeural", "display": "MarceloNeural (Bolivia)", "speed": 1.1},
+        "es-AR-TomasNeural (Male - es-AR)": {"id": "es-AR-TomasNeural", "display": "TomasNeural (Argentina)", "speed": 1.1},
+        "es-CO-GonzaloNeural (Male - es-CO)": {"id": "es-CO-GonzaloNeural", "display": "GonzaloNeural (Colombia)", "speed": 1.1},
+        "es-ES-AlvaroNeural (Male - es-ES)": {"id": "es-ES-AlvaroNeural", "display": "AlvaroNeural (España)", "speed": 1.1},
+        "es-CU-ManuelNeural (Male - es-CU)": {"id": "es-CU-ManuelNeural", "display": "ManuelNeural (Cuba)", "speed": 1.2},
+        "es-PY-MarioNeural (Male - es-PY)": {"id": "es-PY-MarioNeural", "display": "MarioNeural (Paraguay)", "speed": 1.1},
+        "es-UY-MateoNeural (Male - es-UY)": {"id": "es-UY-MateoNeural", "display": "MateoNeural (Uruguay)", "speed": 1.1}
+    }
+}
+
+# --- Notificación de Progreso ---
+class Reporter:
+    """Destino del progreso y los avisos del pipeline. Por defecto imprime por consola;
+    la interfaz y la cola de trabajos lo sustituyen por sus propias versiones."""
+
+    def text(self, message):
+        print(message)
+
+    def progress(self, fraction, message):
+        self.text(message)
+
+    def info(self, message):
+        print(f"Info: {message}")
+
+    def warning(self, message):
+        print(f"Adv: {message}")
+
+    def error(self, message):
+        print(f"Error: {message}")
+
+
+def _reporter(reporter):
+    return reporter if reporter is not None else Reporter()
+
+# --- Clientes API (se crean al primer uso, una vez por proceso) ---
+# openai, google.generativeai y yt_dlp se importan al usarlos: renderizar un guión ya
+# escrito (CLI, trabajos de render) no necesita cargarlos.
+_openai_client = None
+_gemini_configured = False
+_clients_lock = threading.Lock()
+
+def get_openai_client():
+    """Cliente de OpenAI con OPENAI_API_KEY. Lanza RuntimeError si falta la variable."""
+    global _openai_client
+    with _clients_lock:
+        if _openai_client is None:
+            api_key = os.getenv("OPENAI_API_KEY")
+            if not api_key:
+                raise RuntimeError("Variable de entorno OPENAI_API_KEY no encontrada.")
+            from openai import OpenAI
+            _openai_client = OpenAI(api_key=api_key)
+        return _openai_client
+
+def get_gemini_model():
+    """Modelo de Gemini configurado con GEMINI_API_KEY. Lanza RuntimeError si falta la variable."""
+    global _gemini_configured
+    import google.generativeai as genai
+    with _clients_lock:
+        if not _gemini_configured:
+            api_key = os.getenv("GEMINI_API_KEY")
+            if not api_key:
+                raise RuntimeError("Variable de entorno GEMINI_API_KEY no encontrada.")
+            genai.configure(api_key=api_key)
+            _gemini_configured = True
+    return genai.GenerativeModel(GEMINI_MODEL_NAME)
+
+# --- Gemini ---
+def _gemini_empty_reason(response):
+    """Motivo legible de una respuesta de Gemini sin texto útil."""
+    try: # Safe access to response attributes
+         if response.prompt_feedback and response.prompt_feedback.block_reason:
+              return f"Bloqueado: {response.prompt_feedback.block_reason}"
+         elif response.candidates and response.candidates[0].finish_reason:
+              return f"Finalizado: {response.candidates[0].finish_reason}"
+         return "Respuesta vacía."
+    except Exception:
+         return "Razón desconocida"
+
+def _gemini_chunk_prompt(prompt_template, context, chunk_text, index, total):
+    """Prompt de un fragmento: el contexto previo solo da continuidad, no se formatea."""
+    note = (f"(Esta es la parte {index + 1} de {total} de una transcripción larga. "
+            "Formatea SOLO el texto de esta parte, manteniendo el formato [Narrador] y los mismos nombres de narradores.)\n")
+    if context:
+        note += f"(Contexto previo, NO lo incluyas en el resultado: ...{context})\n"
+    return prompt_template + note + "\n" + chunk_text
+
+def _process_gemini_chunk(model, prompt, index, max_retries=GEMINI_CHUNK_MAX_RETRIES):
+    """Procesa un fragmento con reintentos (en un hilo de trabajo)."""
+    request = {"model": GEMINI_MODEL_NAME, "prompt": prompt}
+    cached_text = cache_llm.obtener(request)
+    if cached_text is not None:
+        return {"index": index, "text": cached_text, "error": None}
+    error = None
+    for attempt in range(1, max_retries + 1):
+        try:
+            response = model.generate_content(prompt)
+            try:
+                text = response.text.strip()
+            except ValueError:
+                text = ""
+            if text:
+                cache_llm.guardar(request, text)
+                return {"index": index, "text": text, "error": None}
+            error = _gemini_empty_reason(response)
+        except Exception as e:
+            error = str(e)
+        if attempt < max_retries:
+            time.sleep(GEMINI_RETRY_BASE_DELAY_S * (2 ** (attempt - 1)))
+    return {"index": index, "text": None, "error": error}
+
+def merge_gemini_scripts(parts):
+    """Une los guiones de los fragmentos en orden. Si un fragmento empieza sin etiqueta [Narrador]
+    (continúa la intervención anterior), se le antepone la última etiqueta vista."""
+    merged = []
+    last_tag = None
+    for part in parts:
+        part = part.strip()
+        if not part:
+            continue
+        if last_tag and not part.startswith("["):
+            part = f"{last_tag} {part}"
+        tags = re.findall(r"\[[^\]]+\]", part)
+        if tags:
+            last_tag = tags[-1]
+        merged.append(part)
+    return "\n\n".join(merged)
+
+def process_with_gemini_chunked(text, reporter, prompt_template, max_chars, max_workers=GEMINI_MAX_CONCURRENT_CHUNKS):
+    """Map-reduce: divide la transcripción por oraciones (con solapamiento como contexto), procesa
+    los fragmentos con Gemini en paralelo y une los guiones en orden."""
+    chunks = dividir_con_solapamiento(text, max_chars, GEMINI_CHUNK_OVERLAP_SENTENCES)
+    total = len(chunks)
+    model = get_gemini_model()
+    reporter.text(f"✨ Transcripción larga: {total} fragmentos con Gemini ({GEMINI_MODEL_NAME}), {max_workers} en paralelo...")
+
+    results = [None] * total
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, total)), thread_name_prefix="gemini") as executor:
+        futures = [
+            executor.submit(_process_gemini_chunk, model, _gemini_chunk_prompt(prompt_template, context, chunk_text, i, total), i)
+            for i, (context, chunk_text) in enumerate(chunks)
+        ]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results[result["index"]] = result
+            state = "listo" if result["text"] else f"falló ({result['error']})"
+            reporter.text(f"✨ Fragmento {result['index'] + 1}/{total} {state}. {done}/{total} completados.")
+
+    failed = [r for r in results if not r["text"]]
+    if failed:
+        # Un guión con huecos no sirve: se informa y los fragmentos correctos quedan en caché para reintentar
+        reporter.error(f"Gemini ({GEMINI_MODEL_NAME}) falló en {len(failed)} de {total} fragmentos: "
+                       + "; ".join(f"#{r['index'] + 1}: {r['error']}" for r in failed[:5]))
+        return None
+    reporter.text("✅ Procesamiento con Gemini completado.")
+    return merge_gemini_scripts(r["text"] for r in results)
+
+def process_with_gemini(text, reporter=None):
+    """Procesa el texto transcrito con Gemini para formatearlo como guión.
+    Las transcripciones que superan el presupuesto de tokens por petición se procesan por fragmentos."""
+    reporter = _reporter(reporter)
+    prompt_template = os.getenv("PROMPT_GEMINI_HISTORIA", "Formatea la siguiente transcripción como un guión narrado:\n\n") # Fallback
+    if not prompt_template:
+        reporter.error("Error: Variable de entorno PROMPT_GEMINI_HISTORIA no configurada.")
+        return None
+
+    # Presupuesto estimado en caracteres (~4 caracteres por token en español)
+    max_chars = GEMINI_CHUNK_TOKEN_BUDGET * GEMINI_CHARS_PER_TOKEN
+    if len(text) > max_chars:
+        try:
+            return process_with_gemini_chunked(text, reporter, prompt_template, max_chars)
+        except Exception as e:
+            reporter.error(f"Error durante la llamada a Gemini API ({GEMINI_MODEL_NAME}): {e}")
+            return None
+
+    full_prompt = prompt_template + text
+
+    try:
+        reporter.text(f"✨ Procesando transcripción con Gemini ({GEMINI_MODEL_NAME})...")
+        model = get_gemini_model()
+        # Llamada SIN safety_settings, en streaming para ir mostrando el guión mientras se genera
+        response = model.generate_content(full_prompt, stream=True)
+        received = ""
+        for chunk in response:
+            try:
+                received += chunk.text
+            except ValueError:
+                continue # Fragmento sin texto (p.ej. bloqueado); se informa abajo
+            reporter.text(f"✍️ Recibidos {len(received)} caracteres...\n\n{received[-500:]}")
+
+        if response.text:
+            reporter.text("✅ Procesamiento con Gemini completado.")
+            return response.text.strip()
+        else:
+            reason = _gemini_empty_reason(response)
+            reporter.error(f"Gemini ({GEMINI_MODEL_NAME}) no devolvió texto útil. {reason}")
+            print(f"--- Respuesta Gemini (sin texto útil) ---\n{response}\n------------------------------------")
+            return None
+
+    except Exception as e:
+        reporter.error(f"Error durante la llamada a Gemini API ({GEMINI_MODEL_NAME}): {e}")
+        return None
+
+# --- Descarga YouTube ---
+def download_youtube_video_and_extract_audio(url, reporter=None):
+    """
+    Descarga video de YouTube (360p MP4) y extrae audio a MP3 usando FFmpeg.
+    """
+    import yt_dlp
+    reporter = _reporter(reporter)
+    temp_dir = tempfile.mkdtemp()
+    video_filename = "youtube_video.mp4"
+    audio_filename = "extracted_audio.mp3"
+    video_path = Path(temp_dir) / video_filename
+    audio_path = Path(temp_dir) / audio_filename
+
+    ydl_opts = {
+        'format': 'bestvideo[height<=360][ext=mp4]+bestaudio[ext=m4a]/best[height<=360][ext=mp4]/best[height<=360]',
+        'outtmpl': str(video_path),
+        'quiet': True,
+        'no_warnings': True,
+        'noprogress': True,
+        'noplaylist': True,
+    }
+
+    try:
+        reporter.text("📥 Descargando video YouTube (360p MP4)...")
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            ydl.download([url])
+
+        if not video_path.exists() or video_path.stat().st_size == 0:
+            raise yt_dlp.utils.DownloadError("Archivo video vacío/no encontrado tras descarga.")
+
+        reporter.text("🎬 Video descargado. Extrayendo audio (FFmpeg)...")
+        ffmpeg_cmd = [
+            'ffmpeg', '-i', str(video_path), '-vn', '-acodec', 'libmp3lame',
+            '-ab', '192k', '-ar', '44100', '-y', str(audio_path)
+        ]
+
+        try:
+            result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True, check=True, encoding='utf-8', errors='ignore')
+            if result.stderr and any(err in result.stderr.lower() for err in ["error", "fail", "invalid"]):
+                 reporter.warning(f"FFmpeg reportó problemas extracción:\n{result.stderr[:500]}...")
+
+            if not audio_path.exists() or audio_path.stat().st_size == 0:
+                raise Exception("Fallo extracción audio FFmpeg (MP3 vacío/no creado).")
+
+            reporter.text("✅ Audio MP3 extraído.")
+            return str(audio_path), temp_dir
+
+        except FileNotFoundError:
+            reporter.error("Error Crítico: FFmpeg no encontrado. Instálalo en el PATH.")
+            raise
+        except subprocess.CalledProcessError as e:
+            reporter.error(f"FFmpeg falló extracción (código {e.returncode}):\n{e.stderr}")
+            raise
+        except Exception as e_ffmpeg:
+             reporter.error(f"Error extracción FFmpeg: {e_ffmpeg}")
+             raise
+
+    except yt_dlp.utils.DownloadError as e_dl:
+        reporter.error(f"Error yt-dlp descarga video: {e_dl}")
+        if os.path.isdir(temp_dir): shutil.rmtree(temp_dir)
+        return None, None
+    except Exception as e_main:
+        reporter.error(f"Error proceso obtención audio: {e_main}")
+        if os.path.isdir(temp_dir): shutil.rmtree(temp_dir)
+        return None, None
+    finally:
+        if video_path.exists():
+            try:
+                os.remove(video_path)
+            except OSError as e_clean:
+                print(f"Adv: No se pudo limpiar video temp {video_path}: {e_clean}")
+
+# --- Transcripción Whisper con Chunking ---
+def export_audio_chunk(audio_path, start_ms, end_ms, chunk_path):
+    """Extrae un tramo del audio a MP3 copiando el stream con FFmpeg (sin decodificar el archivo).
+    Si la copia falla, decodifica solo ese tramo con pydub."""
+    try:
+        subprocess.run(
+            ["ffmpeg", "-v", "error", "-y", "-ss", f"{start_ms / 1000:.3f}", "-t", f"{(end_ms - start_ms) / 1000:.3f}",
+             "-i", str(audio_path), "-vn", "-c:a", "copy", str(chunk_path)],
+            capture_output=True, check=True
+        )
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        chunk = AudioSegment.from_file(audio_path, start_second=start_ms / 1000, duration=(end_ms - start_ms) / 1000)
+        chunk.export(chunk_path, format="mp3")
+
+def find_silence_near(audio_path, target_ms, window_ms=WHISPER_SILENCE_SEARCH_MS):
+    """Devuelve el punto (ms) en medio del silencio más cercano a target_ms dentro de la ventana.
+    Solo analiza la ventana con silencedetect de FFmpeg; si no hay silencio devuelve target_ms."""
+    window_start_ms = max(0, target_ms - window_ms)
+    try:
+        result = subprocess.run(
+            ["ffmpeg", "-v", "info", "-ss", f"{window_start_ms / 1000:.3f}", "-t", f"{2 * window_ms / 1000:.3f}",
+             "-i", str(audio_path), "-af", f"silencedetect=noise={WHISPER_SILENCE_NOISE_DB}dB:d={WHISPER_SILENCE_MIN_S}",
+             "-f", "null", "-"],
+            capture_output=True, text=True, encoding='utf-8', errors='ignore', check=True
+        )
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return target_ms
+    starts = [float(x) for x in re.findall(r"silence_start: (-?[\d.]+)", result.stderr)]
+    ends = [float(x) for x in re.findall(r"silence_end: ([\d.]+)", result.stderr)]
+    # Los tiempos son relativos al inicio de la ventana
+    midpoints = [window_start_ms + (max(a, 0) + b) * 500 for a, b in zip(starts, ends)]
+    if not midpoints:
+        return target_ms
+    return int(min(midpoints, key=lambda m: abs(m - target_ms)))
+
+def _transcribe_chunk_file(chunk_path, index, max_retries=WHISPER_MAX_RETRIES):
+    """Transcribe un fragmento ya exportado con reintentos; usa la caché si ya se transcribió antes.
+    Se ejecuta en un hilo de trabajo."""
+    try:
+        chunk_bytes = Path(chunk_path).read_bytes()
+        if not chunk_bytes:
+            return {"index": index, "text": None, "cached": False, "error": "fragmento vacío"}
+
+        # Clave por contenido: al reintentar un video ya procesado no se vuelve a pagar Whisper
+        request = {"model": "whisper-1", "response_format": "text",
+                   "audio_sha256": hashlib.sha256(chunk_bytes).hexdigest()}
+        cached_text = cache_llm.obtener(request)
+        if cached_text is not None:
+            return {"index": index, "text": cached_text, "cached": True, "error": None}
+
+        error = None
+        for attempt in range(1, max_retries + 1):
+            try:
+                with open(chunk_path, "rb") as chunk_file:
+                    response = get_openai_client().audio.transcriptions.create(
+                        model="whisper-1",
+                        file=chunk_file,
+                        response_format="text"
+                    )
+                text = (response if isinstance(response, str) else str(response)).strip()
+                cache_llm.guardar(request, text)
+                return {"index": index, "text": text, "cached": False, "error": None}
+            except Exception as e:
+                error = e
+                if attempt < max_retries:
+                    time.sleep(WHISPER_RETRY_BASE_DELAY_S * (2 ** (attempt - 1)))
+        return {"index": index, "text": None, "cached": False, "error": f"{error} (tras {max_retries} intentos)"}
+    except Exception as e:
+        return {"index": index, "text": None, "cached": False, "error": str(e)}
+
+def _transcribe_chunk(audio_path, index, start_ms, end_ms):
+    """Exporta un tramo del audio a un temporal y lo transcribe (en un hilo de trabajo)."""
+    chunk_fd, chunk_path_str = tempfile.mkstemp(suffix=".mp3")
+    os.close(chunk_fd)
+    chunk_path = Path(chunk_path_str)
+    try:
+        export_audio_chunk(audio_path, start_ms, end_ms, chunk_path)
+        return _transcribe_chunk_file(chunk_path, index)
+    except Exception as e:
+        return {"index": index, "text": None, "cached": False, "error": str(e)}
+    finally:
+        try:
+            os.remove(chunk_path)
+        except OSError as e_clean_chunk:
+            print(f"Adv: No se pudo limpiar chunk {chunk_path}: {e_clean_chunk}")
+
+def transcribe_audio_whisper(audio_path_str, reporter=None, max_workers=WHISPER_MAX_WORKERS, report=None):
+    """
+    Transcribe audio MP3 usando Whisper, dividiendo en fragmentos (cortados en silencios)
+    que se exportan y transcriben en paralelo; el texto se reensambla en orden.
+    """
+    reporter = _reporter(reporter)
+    audio_path = Path(audio_path_str)
+    if not audio_path.exists():
+        reporter.error(f"Audio MP3 no existe: {audio_path}")
+        return None
+
+    try:
+        reporter.text("🎙️ Leyendo duración del audio...")
+        # Duración desde los metadatos (ffprobe): no hace falta decodificar todo el audio en RAM
+        duration_ms = int(get_duration_s(audio_path) * 1000)
+        reporter.text(f"Duración total: {duration_ms / 1000:.1f}s. Preparando fragmentos...")
+
+        num_chunks = math.ceil(duration_ms / WHISPER_CHUNK_DURATION_MS)
+        if num_chunks == 0:
+             reporter.warning("Audio vacío o demasiado corto.")
+             return ""
+
+        workers = max(1, min(int(max_workers), num_chunks))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="whisper") as executor:
+            # Ajustar los cortes al silencio más cercano para no partir palabras
+            nominal_cuts = [i * WHISPER_CHUNK_DURATION_MS for i in range(1, num_chunks)]
+            if nominal_cuts:
+                reporter.text(f"Buscando silencios para {len(nominal_cuts)} corte(s)...")
+            cuts = list(executor.map(lambda cut: find_silence_near(audio_path, cut), nominal_cuts))
+            boundaries = [0] + cuts + [duration_ms]
+
+            reporter.text(f"Transcribiendo {num_chunks} fragmento(s) con Whisper ({workers} en paralelo)...")
+            futures = [
+                executor.submit(_transcribe_chunk, audio_path, i, boundaries[i], boundaries[i + 1])
+                for i in range(num_chunks)
+            ]
+            results = [None] * num_chunks
+            for done, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                results[result["index"]] = result
+                origin = " (caché)" if result["cached"] else ""
+                reporter.text(f"Fragmento {result['index'] + 1}/{num_chunks} listo{origin}. {done}/{num_chunks} completados.")
+
+        reporter.text("✅ Transcripción completada (todos los fragmentos).")
+        return _join_transcripts(results, reporter, report)
+
+    except Exception as e:
+        reporter.error(f"Error general durante transcripción con fragmentos: {e}")
+        return None
+
+def _join_transcripts(results, reporter, report=None):
+    """Une en orden los textos de los fragmentos y avisa de los que fallaron.
+    Si se pasa report (dict), se anota cuántos fragmentos fallaron en report["failed_chunks"]."""
+    failed = [r for r in results if r["text"] is None]
+    if report is not None:
+        report["failed_chunks"] = len(failed)
+    for r in failed:
+        reporter.warning(f"Error transcribiendo fragmento {r['index'] + 1}: {r['error']}. Saltando.")
+    if failed:
+        reporter.info("Los fragmentos ya transcritos quedan en caché: repetir la extracción solo reintentará los que fallaron.")
+    return " ".join(r["text"] for r in results if r["text"]).strip()
+
+def _read_finished_segments(segment_list_path):
+    """Nombres de los fragmentos que FFmpeg ya terminó de escribir (los añade a la lista al cerrarlos)."""
+    try:
+        with open(segment_list_path, "r", encoding="utf-8") as f:
+            return [line.split(",")[0] for line in f.read().splitlines() if line.strip()]
+    except OSError:
+        return []
+
+def stream_transcribe_youtube(url, reporter=None, max_workers=WHISPER_MAX_WORKERS, report=None):
+    """
+    Ingesta solo de audio: yt-dlp descarga el mejor stream de audio a stdout, FFmpeg lo
+    convierte al vuelo en fragmentos MP3 mono de 16 kHz y cada fragmento se envía a
+    Whisper en cuanto FFmpeg lo cierra. Descarga, extracción y transcripción se solapan;
+    no se guarda el video ni se vuelve a decodificar el audio.
+    Devuelve el texto o None si falla la descarga o la extracción.
+    """
+    reporter = _reporter(reporter)
+    temp_dir = tempfile.mkdtemp(prefix="yt_stream_")
+    segment_list_path = os.path.join(temp_dir, "segments.csv")
+    download_cmd = [sys.executable, "-m", "yt_dlp", "-f", "bestaudio/best", "-o", "-",
+                    "--quiet", "--no-warnings", "--no-progress", "--no-playlist", url]
+    ffmpeg_cmd = [
+        "ffmpeg", "-v", "error", "-i", "pipe:0", "-vn",
+        "-ac", "1", "-ar", str(STREAM_AUDIO_SAMPLE_RATE), "-c:a", "libmp3lame", "-b:a", STREAM_AUDIO_BITRATE,
+        "-f", "segment", "-segment_time", f"{WHISPER_CHUNK_DURATION_MS / 1000:.0f}", "-reset_timestamps", "1",
+        "-segment_list", segment_list_path, "-segment_list_type", "csv",
+        os.path.join(temp_dir, "chunk_%04d.mp3")
+    ]
+    downloader = extractor = None
+    futures = {}
+    try:
+        reporter.text("📥 Descargando solo el audio de YouTube y troceándolo al vuelo...")
+        downloader = subprocess.Popen(download_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        extractor = subprocess.Popen(ffmpeg_cmd, stdin=downloader.stdout, stderr=subprocess.PIPE)
+        downloader.stdout.close() # Solo FFmpeg lee el pipe (yt-dlp recibe SIGPIPE si FFmpeg termina)
+
+        with ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix="whisper") as executor:
+            while True:
+                running = extractor.poll() is None
+                for index, name in enumerate(_read_finished_segments(segment_list_path)):
+                    if index not in futures:
+                        futures[index] = executor.submit(_transcribe_chunk_file, os.path.join(temp_dir, name), index)
+                done = sum(1 for f in futures.values() if f.done())
+                state = "descargando" if running else "descarga terminada"
+                reporter.text(f"🎙️ {state}: {len(futures)} fragmento(s) listos, {done} transcritos...")
+                if not running:
+                    break
+                time.sleep(STREAM_POLL_INTERVAL_S)
+
+            # stderr se lee al final: con --quiet y -v error solo contiene errores (no llena el pipe)
+            download_error = downloader.stderr.read().decode(errors="ignore") if downloader.wait() != 0 else ""
+            extract_error = extractor.stderr.read().decode(errors="ignore") if extractor.returncode != 0 else ""
+            if download_error or extract_error or not futures:
+                for future in futures.values():
+                    future.cancel()
+                reporter.error(f"Fallo en la ingesta de audio: {(download_error or extract_error or 'sin audio').strip()[:500]}")
+                return None
+
+            results = [None] * len(futures)
+            for future in as_completed(futures.values()):
+                result = future.result()
+                results[result["index"]] = result
+                reporter.text(f"Fragmento {result['index'] + 1}/{len(futures)} transcrito.")
+
+        reporter.text("✅ Transcripción completada (todos los fragmentos).")
+        return _join_transcripts(results, reporter, report)
+
+    except FileNotFoundError:
+        reporter.error("Error Crítico: FFmpeg no encontrado. Instálalo en el PATH.")
+        return None
+    finally:
+        for process in (downloader, extractor):
+            if process and process.poll() is None:
+                process.kill()
+                process.wait()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def extract_youtube_script(url, reporter=None, audio_only=True):
+    """Pipeline completo de YouTube: audio -> transcripción (Whisper) -> guión (Gemini).
+    Cada etapa con artefacto guardado (por ID de video) se salta.
+    Devuelve {"video_id", "transcript", "script"}; lanza RuntimeError si una etapa falla."""
+    reporter = _reporter(reporter)
+    audio_path = None
+    temp_dir_path = None
+    # Artefactos por ID de video: cada etapa ya completada (audio, transcripción, Gemini) se salta
+    video_id = normalize_youtube_id(url)
+    gemini_stage = stage_variant(STAGE_GEMINI, GEMINI_MODEL_NAME, os.getenv("PROMPT_GEMINI_HISTORIA", ""))
+    try:
+        transcript = artifact_store.get_text(video_id, STAGE_TRANSCRIPT) if video_id else None
+        if transcript is not None:
+            reporter.text(f"♻️ Transcripción reutilizada (video {video_id}).")
+        report = {}
+        if transcript is None and audio_only:
+            # Solo audio: descarga, extracción y transcripción solapadas
+            transcript = stream_transcribe_youtube(url, reporter, report=report)
+            if transcript is None:
+                reporter.text("Reintentando con descarga completa del video...")
+        if transcript is None:
+            stored_audio = artifact_store.get_file(video_id, STAGE_AUDIO, ".mp3") if video_id else None
+            if stored_audio:
+                reporter.text(f"♻️ Audio reutilizado (video {video_id}).")
+                audio_path = str(stored_audio)
+            else:
+                audio_path, temp_dir_path = download_youtube_video_and_extract_audio(url, reporter)
+                if not audio_path:
+                    raise RuntimeError("Fallo al obtener audio MP3 de YouTube.")
+                if video_id:
+                    audio_path = str(artifact_store.put_file(video_id, STAGE_AUDIO, audio_path, ".mp3"))
+
+            transcript = transcribe_audio_whisper(audio_path, reporter, report=report)
+        if transcript is None: # Vacío "" es OK, None indica error
+            raise RuntimeError("Fallo en transcripción Whisper.")
+        if video_id and transcript and not report.get("failed_chunks"):
+            artifact_store.put_text(video_id, STAGE_TRANSCRIPT, transcript)
+
+        script = artifact_store.get_text(video_id, gemini_stage) if video_id else None
+        if script is not None:
+            reporter.text(f"♻️ Guión de Gemini reutilizado (video {video_id}).")
+        else:
+            script = process_with_gemini(transcript, reporter)
+            if script is None:
+                raise RuntimeError("Fallo en procesamiento Gemini.")
+            if video_id and not report.get("failed_chunks"):
+                artifact_store.put_text(video_id, gemini_stage, script)
+
+        return {"video_id": video_id, "transcript": transcript, "script": script}
+    finally:
+        # Limpieza del directorio temporal (contiene MP3 si existe)
+        if temp_dir_path and os.path.isdir(temp_dir_path):
+            try:
+                shutil.rmtree(temp_dir_path)
+            except OSError as e_clean:
+                print(f"Adv: No se pudo limpiar dir temp {temp_dir_path}: {e_clean}")
+
+# --- Guión y Narradores ---
+def parse_script(script):
+    """Partes [(narrador, texto)] del guión en orden (el texto puede estar vacío)."""
+    return [(narrator.strip(), text.strip()) for narrator, text in re.findall(SCRIPT_PART_PATTERN, script or "", re.DOTALL)]
+
+def detect_narrators(script_text):
+    """Detecta nombres [Narrador] en el texto."""
+    if not script_text: return []
+    pattern = r'\[([^\]]+)\]'
+    narrators = list(set(
+        n.strip() for n in re.findall(pattern, script_text)
+        if n.strip() and n.strip() not in [TITLE_NARRATOR_NAME, OUTRO_NARRATOR_NAME]
+    ))
+    return sorted(narrators)
+
+def resolve_voice_settings(narrator_name, narrator_voices, narrator_speeds, gender_selection=None, default_gender="female", reporter=None):
+    """Obtiene voz_id y velocidad para narrador, usando defaults.
+    Si se usa la voz por defecto del género, se guarda en narrator_voices/narrator_speeds."""
+    reporter = _reporter(reporter)
+    voice_id = None
+    speed = None
+
+    # Intentar desde la configuración de narradores
+    voice_info = narrator_voices.get(narrator_name)
+    if isinstance(voice_info, dict) and "id" in voice_info:
+        voice_id = voice_info["id"]
+        speed = narrator_speeds.get(narrator_name, voice_info.get("speed"))
+
+    # Si falla, usar defaults
+    if voice_id is None or speed is None:
+        gender = (gender_selection or {}).get(narrator_name, default_gender)
+        try:
+            if gender not in FILTERED_VOICES or not FILTERED_VOICES[gender]:
+                raise ValueError(f"No hay voces config. para género '{gender}'.")
+
+            default_voice_info = list(FILTERED_VOICES[gender].values())[0]
+            voice_id = default_voice_info["id"]
+            speed = default_voice_info.get("speed", DEFAULT_SPEED_SLIDER_VALUE)
+
+            # Guardar defaults en la configuración
+            narrator_voices[narrator_name] = default_voice_info
+            narrator_speeds[narrator_name] = speed
+
+        except Exception as e:
+             reporter.error(f"Fallo obtener voz default para '{narrator_name}' ({gender}): {e}.")
+             # Fallback final (primera voz femenina)
+             try:
+                 fallback_voice_info = list(FILTERED_VOICES["female"].values())[0]
+                 voice_id = fallback_voice_info["id"]
+                 speed = DEFAULT_VOICE_SPEED
+                 reporter.warning(f"Usando fallback: {voice_id}")
+             except Exception:
+                  reporter.error("¡FALLBACK FALLÓ! No hay voces femeninas config.")
+                  voice_id = None # Indicar fallo total
+                  speed = DEFAULT_VOICE_SPEED
+
+    return voice_id, speed
+
+def lookup_voice(spec):
+    """Voz a partir de una especificación: ID de Edge TTS o clave de FILTERED_VOICES (str), o
+    dict {"id"|"voice", "speed"}. Las voces de FILTERED_VOICES conservan su velocidad por defecto;
+    cualquier otro ID de Edge TTS se acepta con velocidad normal."""
+    if isinstance(spec, dict):
+        voice_info = lookup_voice(spec.get("id") or spec.get("voice"))
+        if spec.get("speed") is not None:
+            voice_info["speed"] = float(spec["speed"])
+        return voice_info
+    if not spec:
+        raise ValueError("Especificación de voz vacía")
+    for voices in FILTERED_VOICES.values():
+        for key, voice_info in voices.items():
+            if spec in (key, voice_info["id"]):
+                return dict(voice_info)
+    return {"id": spec, "display": spec, "speed": DEFAULT_VOICE_SPEED}
+
+def narrator_settings(voice_map):
+    """(narrator_voices, narrator_speeds) para generate_full_audio desde {narrador: especificación de voz}."""
+    narrator_voices = {narrator: lookup_voice(spec) for narrator, spec in voice_map.items()}
+    narrator_speeds = {narrator: voice_info["speed"] for narrator, voice_info in narrator_voices.items()}
+    return narrator_voices, narrator_speeds
+
+# --- TTS ---
+async def synthesize_to_bytes(text, voice_id, speed):
+    """Sintetiza texto con Edge TTS acumulando el stream de audio en memoria (MP3 en bytes)."""
+    rate_str = f"{int((speed - 1) * 100):+}%"
+    # Reutilizar audio idéntico (texto, voz, velocidad) de la caché compartida
+    audio_data = cache_tts.obtener_bytes(text, voice_id, rate_str)
+    if audio_data:
+        return audio_data
+    communicate = edge_tts.Communicate(text, voice_id, rate=rate_str)
+    buffer = bytearray()
+    async for chunk in communicate.stream():
+        if chunk["type"] == "audio":
+            buffer.extend(chunk["data"])
+    audio_data = bytes(buffer)
+    if len(audio_data) > 100:
+        cache_tts.guardar_bytes(text, voice_id, rate_str, audio_data)
+    return audio_data
+
+async def _synthesize_chunk_with_retry(text, voice_id, speed, semaphore, stats=None, reporter=None, max_retries=TTS_MAX_RETRIES):
+    """Sintetiza un fragmento con sus propios reintentos (único nivel de reintento: solo se repite lo que falló).
+    El semáforo se toma por petición y se libera antes del backoff, así que limita las peticiones en vuelo.
+    Si se pasa stats (dict), se acumulan las peticiones hechas y el tiempo de síntesis.
+    Los reintentos se avisan por reporter.warning."""
+    reporter = _reporter(reporter)
+    error = None
+    for attempt in range(1, max_retries + 1):
+        try:
+            async with semaphore:
+                request_start = time.perf_counter()
+                try:
+                    audio_data = await synthesize_to_bytes(text, voice_id, speed)
+                finally:
+                    if stats is not None:
+                        stats["requests"] = stats.get("requests", 0) + 1
+                        stats["synth_s"] = stats.get("synth_s", 0.0) + time.perf_counter() - request_start
+            if len(audio_data) > 100:
+                return audio_data
+            error = "audio vacío"
+        except Exception as e:
+            error = e
+        if attempt < max_retries:
+            reporter.warning(f"Fragmento fallido ({error}), intento {attempt}/{max_retries}. Reintentando...")
+            await asyncio.sleep(TTS_RETRY_BASE_DELAY_S * (2 ** (attempt - 1)))
+    raise RuntimeError(f"Fragmento fallido tras {max_retries} intentos: {error}")
+
+async def synthesize_long_text(text, voice_id, speed, semaphore=None, stats=None, max_chars=TTS_CHUNK_MAX_CHARS, reporter=None):
+    """Sintetiza un texto y lo decodifica una sola vez a PCM.
+    Los textos largos se dividen en fragmentos por oraciones/párrafos sintetizados en paralelo
+    y unidos como PCM (unión exacta a nivel de muestra). semaphore limita las peticiones a
+    Edge TTS en vuelo y debe ser compartido entre todas las partes de una narración; si no
+    se pasa, se usa uno propio de TTS_CHUNK_CONCURRENCY. Lanza RuntimeError si un fragmento
+    falla tras sus reintentos; los reintentos intermedios se avisan por reporter."""
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(TTS_CHUNK_CONCURRENCY)
+    chunks = dividir_texto(text, max_chars) or [text]
+    tasks = [asyncio.create_task(_synthesize_chunk_with_retry(chunk, voice_id, speed, semaphore, stats, reporter)) for chunk in chunks]
+    try:
+        chunk_data = await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+    return join_pcm([AudioPCM.desde_bytes(data) for data in chunk_data])
+
+async def _generate_part(text, voice_id, speed, semaphore, reporter, output_path=None):
+    """Genera el audio PCM de una parte en memoria; solo se escribe a disco (PCM) si se pide output_path.
+    Los reintentos son por fragmento (synthesize_long_text), no por parte."""
+    start = time.perf_counter()
+    stats = {}
+    audio_pcm = None
+    if not text or not voice_id:
+        reporter.warning(f"Saltando parte: Texto/Voz ID faltante (Voz: {voice_id})")
+    else:
+        try:
+            audio_pcm = await synthesize_long_text(text, voice_id, speed, semaphore, stats, reporter=reporter)
+            if audio_pcm.frames == 0:
+                 reporter.warning(f"Audio vacío para '{voice_id}'.")
+                 audio_pcm = None
+            elif output_path:
+                audio_pcm.guardar(output_path)
+        except Exception as e:
+            reporter.warning(f"Error generando parte con voz {voice_id}: {e}")
+            audio_pcm = None
+    return {"ok": audio_pcm is not None, "data": audio_pcm, "attempts": stats.get("requests", 0),
+            "synth_s": stats.get("synth_s", 0.0), "total_s": time.perf_counter() - start}
+
+def new_run_timestamp(output_dir=OUTPUT_SUBDIR):
+    """Marca de tiempo + número reservado: dos generaciones en el mismo segundo no colisionan."""
+    run_number = reservar_numero(str(output_dir))
+    return f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{run_number:04d}"
+
+async def generate_full_audio(title_text, script, outro_text, outro_enabled, narrator_voices, narrator_speeds, timestamp,
+                              reporter=None, max_concurrency=MAX_CONCURRENT_TTS_REQUESTS, parts_output_dir=None,
+                              gender_selection=None, output_dir=OUTPUT_SUBDIR, report=None):
+    """Genera archivo de audio completo combinando partes (síntesis concurrente en memoria, ensamblado en orden).
+    Las partes se mantienen como PCM y solo se codifica a MP3 el resultado final.
+    Si se indica parts_output_dir, cada parte se guarda además como PCM (AudioPCM.cargar) en esa carpeta.
+    Si se pasa report (dict), se anota la latencia de cada parte en report["latencies"] y las
+    estadísticas de la caché TTS en report["tts_cache"]; al reporter solo llega un resumen."""
+    reporter = _reporter(reporter)
+    segments = []
+    total_steps = 0
+    current_step = 0
+    has_any_audio = False
+
+    # Calcular pasos
+    if title_text: total_steps += 1
+    matches = parse_script(script)
+    total_steps += len(matches)
+    if outro_enabled and outro_text: total_steps += 1
+    total_steps += 1 # Combinación
+
+    def update_progress(step, message):
+        progress = min(1.0, step / total_steps) if total_steps > 0 else 0
+        reporter.progress(progress, f"({int(progress*100)}%) {message}")
+
+    def voice_settings(narrator, default_gender="female"):
+        return resolve_voice_settings(narrator, narrator_voices, narrator_speeds, gender_selection, default_gender, reporter)
+
+    # Preparar todas las partes en orden del guión (voces resueltas antes de lanzar tareas)
+    title_part = None
+    script_parts = []
+    outro_part = None
+
+    if title_text:
+        voice_id, speed = voice_settings(TITLE_NARRATOR_NAME, "male")
+        if voice_id:
+            title_part = {"label": TITLE_NARRATOR_NAME, "text": title_text.strip(), "voice_id": voice_id,
+                          "speed": speed, "filename": "title_part.pcm"}
+        else:
+            reporter.warning(f"No se pudo obtener voz para '{TITLE_NARRATOR_NAME}'. Saltando título.")
+
+    for i, (narrator, text_part) in enumerate(matches):
+        if not text_part:
+            reporter.info(f"Parte vacía para narrador '{narrator}'. Saltando.")
+            script_parts.append(None)
+            continue
+        voice_id, speed = voice_settings(narrator)
+        if not voice_id:
+            reporter.warning(f"No se pudo obtener voz para '{narrator}'. Saltando parte.")
+            script_parts.append(None)
+            continue
+        script_parts.append({"label": narrator, "text": text_part, "voice_id": voice_id, "speed": speed,
+                             "filename": PART_AUDIO_FILE_PATTERN.format(i)})
+
+    if outro_enabled and outro_text:
+        voice_id, speed = voice_settings(OUTRO_NARRATOR_NAME, "female")
+        if voice_id:
+            outro_part = {"label": OUTRO_NARRATOR_NAME, "text": outro_text.strip(), "voice_id": voice_id,
+                          "speed": speed, "filename": "outro_part.pcm"}
+        else:
+            reporter.warning(f"No se pudo obtener voz para '{OUTRO_NARRATOR_NAME}'. Saltando outro.")
+
+    # Lanzar todas las partes a la vez; el semáforo (compartido por todos los fragmentos de
+    # todas las partes) limita las peticiones a Edge TTS en vuelo a max_concurrency
+    pending_parts = [p for p in [title_part, *script_parts, outro_part] if p is not None]
+    semaphore = asyncio.Semaphore(max(1, int(max_concurrency)))
+    # Las partes descartadas (vacías o sin voz) cuentan como pasos completados
+    current_step = total_steps - 1 - len(pending_parts)
+    update_progress(current_step, f"Generando {len(pending_parts)} partes (máx. {max_concurrency} simultáneas)...")
+
+    async def run_part(part):
+        nonlocal current_step
+        output_path = os.path.join(parts_output_dir, part["filename"]) if parts_output_dir else None
+        part["result"] = await _generate_part(part["text"], part["voice_id"], part["speed"], semaphore, reporter, output_path)
+        current_step += 1
+        update_progress(current_step, f"Parte '{part['label']}' lista en {part['result']['total_s']:.1f}s...")
+
+    await asyncio.gather(*(run_part(p) for p in pending_parts))
+
+    # Informe de latencias por parte (para ajustar max_concurrency)
+    latency_report = [
+        {"part": idx, "narrator": p["label"], "chars": len(p["text"]), "ok": p["result"]["ok"],
+         "attempts": p["result"]["attempts"], "synth_s": round(p["result"]["synth_s"], 2),
+         "total_s": round(p["result"]["total_s"], 2)}
+        for idx, p in enumerate(pending_parts)
+    ]
+    cache_stats = cache_tts.estadisticas()
+    if report is not None:
+        report["latencies"] = latency_report
+        report["tts_cache"] = cache_stats
+    if latency_report:
+        slowest = max(latency_report, key=lambda row: row["total_s"])
+        reporter.info(f"TTS: {len(latency_report)} partes (concurrencia={max_concurrency}), "
+                      f"{sum(row['attempts'] for row in latency_report)} peticiones, la más lenta "
+                      f"'{slowest['narrator']}' en {slowest['total_s']:.1f}s; caché con {cache_stats['tasa_aciertos']:.0%} de aciertos.")
+
+    # Construir segmentos en orden del guión
+    if title_part and title_part["result"]["ok"]:
+        segments.append({"type": "audio", "name": title_part["filename"], "data": title_part["result"]["data"]})
+        if matches or (outro_enabled and outro_text):
+            segments.append({"type": "pause", "duration": PAUSE_BETWEEN_SECTIONS_MS})
+        has_any_audio = True
+
+    for part in script_parts:
+        if part is None:
+            continue
+        if part["result"]["ok"]:
+            if has_any_audio:
+                segments.append({"type": "crossfade", "duration": CROSSFADE_DURATION_MS})
+            segments.append({"type": "audio", "name": part["filename"], "data": part["result"]["data"]})
+            has_any_audio = True
+        else:
+            reporter.warning(f"Fallo al generar audio para '{part['label']}'. Saltando parte.")
+
+    if outro_enabled and outro_text:
+        if has_any_audio:
+             segments.append({"type": "pause", "duration": PAUSE_BETWEEN_SECTIONS_MS})
+        if outro_part and outro_part["result"]["ok"]:
+            if segments and segments[-1]["type"] == "pause" and len(segments) > 1:
+                 segments.append({"type": "crossfade", "duration": CROSSFADE_DURATION_MS})
+            segments.append({"type": "audio", "name": outro_part["filename"], "data": outro_part["result"]["data"]})
+            has_any_audio = True
+
+    # Combinar
+    current_step += 1
+    audio_segment_count = sum(1 for s in segments if s['type'] == 'audio')
+    if not audio_segment_count:
+        reporter.error("No se generó ningún segmento de audio válido para combinar.")
+        update_progress(total_steps, "Error: No hay audio para combinar.")
+        return None
+
+    update_progress(current_step, f"Combinando {audio_segment_count} partes de audio...")
+    try:
+        # Cada parte se decodifica una vez y se copia en un buffer PCM preasignado (tiempo lineal)
+        combined_audio = assemble_segments(
+            segments,
+            on_decode_error=lambda name, e: reporter.warning(f"Error cargando segmento {name}: {e}. Saltando.")
+        )
+
+        if combined_audio is not None and len(combined_audio) > 0:
+            output_filename = GENERATED_AUDIO_FILENAME.format(timestamp)
+            output_path = Path(output_dir) / output_filename
+            with escritura_atomica(str(output_path)) as temp_output_path:
+                combined_audio.exportar(temp_output_path, "mp3")
+            update_progress(total_steps, "¡Audio combinado con éxito!")
+            return str(output_path)
+        else:
+            reporter.error("Error: No se pudieron cargar los segmentos de audio generados.")
+            update_progress(total_steps, "Error combinando audio.")
+            return None
+    except Exception as e:
+        reporter.error(f"Error inesperado al combinar los archivos de audio: {e}")
+        update_progress(total_steps, f"Error combinando audio: {e}")
+        return None
+
+# --- Video ---
+def parse_duration_from_filename(filename):
+    """Extrae duración HH_MM_SS_ del nombre y devuelve segundos."""
+    match = re.match(VIDEO_FILENAME_PATTERN, filename)
+    if match:
+        try:
+            return int(match.group(1))*3600 + int(match.group(2))*60 + int(match.group(3))
+        except ValueError:
+            return None
+    return None
+
+def find_suitable_video(target_duration_sec, reporter=None, video_folder=VIDEO_SOURCE_FOLDER):
+    """Elige un video base con duración real >= target entre los menos usados (índice persistente)."""
+    reporter = _reporter(reporter)
+    video_folder = Path(video_folder)
+    if not video_folder.is_dir():
+        reporter.error(f"Carpeta videos base no encontrada: {video_folder}")
+        return None
+
+    library = get_video_library(video_folder, fallback_duration=parse_duration_from_filename)
+    video_path = library.pick(target_duration_sec)
+    if video_path is None:
+        reporter.warning(f"No hay videos base >= {target_duration_sec:.2f}s en '{video_folder}' ({len(library)} indexados).")
+    return video_path
+
+def create_video_with_audio(audio_path_str, video_filename_pattern, timestamp, reporter=None,
+                            video_folder=VIDEO_SOURCE_FOLDER, output_dir=OUTPUT_SUBDIR):
+    """Crea video combinando audio y video base con FFmpeg."""
+    reporter = _reporter(reporter)
+    audio_path = Path(audio_path_str)
+    if not audio_path.exists():
+        reporter.error(f"Audio no encontrado para crear video: {audio_path}")
+        return None
+
+    try:
+        reporter.text("Calculando duración audio...")
+        # Metadatos del contenedor (ffprobe, cacheados por ruta + mtime) en vez de decodificar el audio
+        audio_duration_sec = get_duration_s(audio_path)
+        reporter.text(f"Duración: {audio_duration_sec:.2f}s. Buscando video base...")
+
+        video_source_path = find_suitable_video(audio_duration_sec, reporter, video_folder)
+        if not video_source_path:
+            return None # Error ya notificado
+
+        video_info = get_video_library(video_folder).info(video_source_path.name) or {}
+        resolution = f"{video_info['width']}x{video_info['height']}, " if video_info.get("width") else ""
+        reporter.text(f"Video base: {video_source_path.name} ({resolution}{video_info.get('duration_s', 0):.0f}s). Preparando FFmpeg...")
+        output_video_filename = video_filename_pattern.format(timestamp)
+        output_video_path = Path(output_dir) / output_video_filename
+
+        reporter.text("Ejecutando FFmpeg (combinando audio y video)...")
+        try:
+            # FFmpeg escribe a un temporal que se renombra al terminar (nunca se ve un MP4 a medias)
+            with escritura_atomica(str(output_video_path)) as temp_video_path:
+                ffmpeg_cmd = [
+                    "ffmpeg", "-i", str(video_source_path), "-i", str(audio_path),
+                    "-map", "0:v:0", "-map", "1:a:0", "-c:v", "copy", "-c:a", "aac",
+                    "-b:a", "192k", "-shortest", "-t", str(audio_duration_sec), "-y",
+                    temp_video_path
+                ]
+                result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True, check=True, encoding='utf-8', errors='ignore')
+            if result.stderr and any(err in result.stderr.lower() for err in ["error", "fail", "invalid"]):
+                 reporter.warning(f"FFmpeg reportó problemas:\n{result.stderr[:500]}...")
+            reporter.text("¡Video generado con éxito!")
+            return str(output_video_path)
+
+        except FileNotFoundError:
+            reporter.error("Error Crítico: FFmpeg no encontrado. Instálalo y asegúrate que esté en el PATH.")
+            return None
+        except subprocess.CalledProcessError as e:
+            reporter.error(f"FFmpeg falló (código {e.returncode}):\n{e.stderr}")
+            return None
+
+    except Exception as e:
+        reporter.error(f"Error inesperado creando video: {e}")
+        return None
+
+def render_narration(title_text, script, outro_text, outro_enabled, narrator_voices, narrator_speeds, timestamp=None,
+                     reporter=None, max_concurrency=MAX_CONCURRENT_TTS_REQUESTS, gender_selection=None,
+                     with_video=True, video_folder=VIDEO_SOURCE_FOLDER, output_dir=OUTPUT_SUBDIR):
+    """Genera el audio y (opcionalmente) el video de un guión.
+    Devuelve {"timestamp", "audio_path", "video_path", "latencies"}; audio_path es None si el audio falló
+    y video_path si el video falló o no se pidió."""
+    reporter = _reporter(reporter)
+    timestamp = timestamp or new_run_timestamp(output_dir)
+    report = {}
+    audio_path = asyncio.run(generate_full_audio(
+        title_text, script, outro_text, outro_enabled, narrator_voices, narrator_speeds, timestamp,
+        reporter, max_concurrency, gender_selection=gender_selection, output_dir=output_dir, report=report
+    ))
+    video_path = None
+    if audio_path and with_video:
+        video_path = create_video_with_audio(audio_path, GENERATED_VIDEO_FILENAME, timestamp, reporter, video_folder, output_dir)
+    return {"timestamp": timestamp, "audio_path": audio_path, "video_path": video_path,
+            "latencies": report.get("latencies", [])}
+
+# --- Trabajos en segundo plano (job_queue) ---
+def run_youtube_job(params, reporter):
+    """Trabajo 'youtube': params {"url", "audio_only"}."""
+    return extract_youtube_script(params["url"], reporter, params.get("audio_only", True))
+
+def run_render_job(params, reporter):
+    """Trabajo 'render': params con guión, título, outro, voces y velocidades por narrador.
+    Falla si no se genera el audio; el video es opcional (video_path None si falla)."""
+    result = render_narration(
+        params.get("title_text", ""), params["script"], params.get("outro_text", ""), params.get("outro_enabled", False),
+        params.get("narrator_voices", {}), params.get("narrator_speeds", {}), params.get("timestamp"),
+        reporter, params.get("max_concurrency", MAX_CONCURRENT_TTS_REQUESTS), params.get("gender_selection"),
+        params.get("with_video", True), params.get("video_folder", VIDEO_SOURCE_FOLDER),
+        params.get("output_dir", OUTPUT_SUBDIR)
+    )
+    if not result["audio_path"]:
+        raise RuntimeError("Fallo generación archivo audio.")
+    return result
@@ -1,23 +1,26 @@
 # -*- coding: utf-8 -*-
 import streamlit as st
-import edge_tts
 import asyncio
 import re
 import os
-import tempfile
-from pydub import AudioSegment # Importante para dividir
-import aiofiles
 from openai import OpenAI
 from dotenv import load_dotenv
-import random
-import subprocess
 import time
 from pathlib import Path
-import datetime
-import shutil
-import yt_dlp
-import google.generativeai as genai
-import math # Para calcular chunks
+import sys
+
+# Módulos compartidos con EDGETTS (caché LLM, catálogo de voces) y lógica sin Streamlit (narrator_core)
+sys.path.append(str(Path(__file__).resolve().parent.parent / "EDGETTS"))
+from narrator_core import (
+    Reporter, get_gemini_model, synthesize_to_bytes, resolve_voice_settings, detect_narrators, new_run_timestamp,
+    FILTERED_VOICES, MAX_CONCURRENT_TTS_REQUESTS, DEFAULT_SPEED_SLIDER_VALUE, OUTPUT_SUBDIR,
+    TITLE_NARRATOR_NAME, OUTRO_NARRATOR_NAME,
+)
+from job_queue import (
+    get_job_queue, STATUS_QUEUED, STATUS_RUNNING, STATUS_DONE, STATUS_FAILED, STATUS_CANCELLED, FINISHED_STATUSES,
+)
+from llm_cache import cache_llm, semilla_estable
+from voice_catalog import obtener_catalogo
 
 #######################################################################################
 # CORRER EN TERMINAL: streamlit run narrator_tts.py
@@ -41,38 +44,24 @@ except Exception as e:
     st.error(f"Error al inicializar cliente OpenAI: {e}")
     st.stop()
 
-# Gemini (Google Generative AI)
+# Gemini (Google Generative AI): se usa en los trabajos de YouTube (narrator_core)
 gemini_api_key = os.getenv("GEMINI_API_KEY")
 if not gemini_api_key:
     st.error("CRÍTICO: Variable de entorno GEMINI_API_KEY no encontrada.")
     st.stop()
 try:
-    genai.configure(api_key=gemini_api_key)
+    get_gemini_model()
 except Exception as e:
     st.error(f"Error al configurar la API de Gemini: {e}")
     st.stop()
 
-# Modelo Gemini
-GEMINI_MODEL_NAME = "gemini-2.5-pro-preview-05-06" # Modelo recomendado y potente
-
 # --- Constantes de la Aplicación ---
-CROSSFADE_DURATION_MS = 450
-PAUSE_BETWEEN_SECTIONS_MS = 800
-DEFAULT_VOICE_SPEED = 1.0
-DEFAULT_SPEED_SLIDER_VALUE = 1.0
 MIN_SPEED_VALUE = 1.0
 MAX_SPEED_VALUE = 2.0
 SPEED_STEP = 0.1
 SAMPLE_TEXT = "Este es un ejemplo de esta voz."
-TEMP_AUDIO_FILE_PATTERN = "part_{:03d}.mp3"
-GENERATED_AUDIO_FILENAME = "generated_audio_{}.mp3"
-GENERATED_VIDEO_FILENAME = "generated_video_{}.mp4"
 DEFAULT_DOWNLOAD_FILENAME_AUDIO = "narracion.mp3"
 DEFAULT_DOWNLOAD_FILENAME_VIDEO = "video_narrado.mp4"
-OUTPUT_SUBDIR = "generated_files"
-# !!! IMPORTANTE: AJUSTA ESTA RUTA A TU CARPETA REAL DE VIDEOS BASE !!!
-VIDEO_SOURCE_FOLDER = Path("C:/Users/crist/OneDrive/Documents/Progra/Python/NewEdgeTTS/VIDEOS")
-VIDEO_FILENAME_PATTERN = r"(\d{2})_(\d{2})_(\d{2})_.*\.mp4"
 SPANISH_LOCALE_PREFIX = "es-"
 SCRIPT_TEXT_AREA_HEIGHT = 250
 SCRIPT_PLACEHOLDER = "[Narrador1] Hola\n\n[Narrador2] Qué haces\n\n[Narrador3] Te estabamos esperando"
@@ -80,35 +69,7 @@ NARRATOR_INPUT_PLACEHOLDER = "Opcional: Narrador4, Narrador5..."
 TITLE_PLACEHOLDER = "Introduce el título aquí"
 OUTRO_PLACEHOLDER = "Introduce el texto de cierre aquí"
 VIDEO_PREVIEW_WIDTH = 240
-TITLE_NARRATOR_NAME = "Título"
-OUTRO_NARRATOR_NAME = "Outro"
-
-# Duración máxima de cada fragmento de audio para Whisper (en milisegundos)
-# 15 minutos (900,000 ms) es un límite seguro para 192kbps MP3 vs 25MB API limit.
-WHISPER_CHUNK_DURATION_MS = 15 * 60 * 1000
-
-FILTERED_VOICES = {
-    "female": {
-        "es-CL-CatalinaNeural (Female - es-CL)": {"id": "es-CL-CatalinaNeural", "display": "CatalinaNeural (Chile)", "speed": 1.1},
-        "es-BO-SofiaNeural (Female - es-BO)": {"id": "es-BO-SofiaNeural", "display": "SofiaNeural (Bolivia)", "speed": 1.1},
-        "es-AR-ElenaNeural (Female - es-AR)": {"id": "es-AR-ElenaNeural", "display": "ElenaNeural (Argentina)", "speed": 1.1},
-        "es-CO-SalomeNeural (Female - es-CO)": {"id": "es-CO-SalomeNeural", "display": "SalomeNeural (Colombia)", "speed": 1.2},
-        "es-ES-XimenaNeural (Female - es-ES)": {"id": "es-ES-XimenaNeural", "display": "XimenaNeural (España)", "speed": 1.1},
-        "es-CU-BelkysNeural (Female - es-CU)": {"id": "es-CU-BelkysNeural", "display": "BelkysNeural (Cuba)", "speed": 1.2},
-        "es-PY-TaniaNeural (Female - es-PY)": {"id": "es-PY-TaniaNeural", "display": "TaniaNeural (Paraguay)", "speed": 1.1},
-        "es-UY-ValentinaNeural (Female - es-UY)": {"id": "es-UY-ValentinaNeural", "display": "ValentinaNeural (Uruguay)", "speed": 1.1}
-    },
-    "male": {
-        "es-CL-LorenzoNeural (Male - es-CL)": {"id": "es-CL-LorenzoNeural", "display": "LorenzoNeural (Chile)", "speed": 1.1},
-        "es-BO-MarceloNeural (Male - es-BO)": {"id": "es-BO-MarceloNeural", "display": "MarceloNeural (Bolivia)", "speed": 1.1},
-        "es-AR-TomasNeural (Male - es-AR)": {"id": "es-AR-TomasNeural", "display": "TomasNeural (Argentina)", "speed": 1.1},
-        "es-CO-GonzaloNeural (Male - es-CO)": {"id": "es-CO-GonzaloNeural", "display": "GonzaloNeural (Colombia)", "speed": 1.1},
-        "es-ES-AlvaroNeural (Male - es-ES)": {"id": "es-ES-AlvaroNeural", "display": "AlvaroNeural (España)", "speed": 1.1},
-        "es-CU-ManuelNeural (Male - es-CU)": {"id": "es-CU-ManuelNeural", "display": "ManuelNeural (Cuba)", "speed": 1.2},
-        "es-PY-MarioNeural (Male - es-PY)": {"id": "es-PY-MarioNeural", "display": "MarioNeural (Paraguay)", "speed": 1.1},
-        "es-UY-MateoNeural (Male - es-UY)": {"id": "es-UY-MateoNeural", "display": "MateoNeural (Uruguay)", "speed": 1.1}
-    }
-}
+JOB_POLL_INTERVAL_S = 2 # Cada cuánto se refresca el panel de trabajos en segundo plano
 
 # --- Inicialización de session_state ---
 # Gestión del método de entrada y sus datos asociados
@@ -137,6 +98,14 @@ if 'gender_selection' not in st.session_state: st.session_state.gender_selection
 if 'generated_audio_path' not in st.session_state: st.session_state.generated_audio_path = None
 if 'generated_video_path' not in st.session_state: st.session_state.generated_video_path = None
 if 'last_run_timestamp' not in st.session_state: st.session_state.last_run_timestamp = None
+if 'tts_max_concurrency' not in st.session_state: st.session_state.tts_max_concurrency = MAX_CONCURRENT_TTS_REQUESTS
+if 'tts_part_latencies' not in st.session_state: st.session_state.tts_part_latencies = []
+if 'youtube_audio_only' not in st.session_state: st.session_state.youtube_audio_only = True
+
+# Trabajos en segundo plano (job_queue) lanzados desde esta sesión
+if 'youtube_job_id' not in st.session_state: st.session_state.youtube_job_id = None
+if 'render_job_ids' not in st.session_state: st.session_state.render_job_ids = []
+if 'applied_job_ids' not in st.session_state: st.session_state.applied_job_ids = []
 
 # --- Crear Directorio de Salida ---
 try:
@@ -146,9 +115,29 @@ except OSError as e:
     st.stop()
 
 # --- Funciones Auxiliares Generales ---
+class StreamlitReporter(Reporter):
+    """Reporter de narrator_core para llamadas en línea: avisos con st.* y mensajes en un placeholder"""
+
+    def __init__(self, placeholder=None):
+        self.placeholder = placeholder
+
+    def text(self, message):
+        if self.placeholder:
+            self.placeholder.text(message)
+
+    def info(self, message):
+        st.info(message)
+
+    def warning(self, message):
+        st.warning(message)
+
+    def error(self, message):
+        st.error(message)
+
 
-def generate_with_openai(prompt, option):
-    """Genera contenido usando OpenAI GPT."""
+def generate_with_openai(prompt, option, on_partial_text=None):
+    """Genera contenido usando OpenAI GPT.
+    Si se pasa on_partial_text, la respuesta se recibe en streaming y se llama con el texto acumulado."""
     if option == "Historia":
         system_prompt = os.getenv("PROMPT_SYSTEM_HISTORIA", "Eres un asistente útil que crea historias.") # Fallback
         user_prompt = os.getenv("PROMPT_CHATGPT_HISTORIA", "Crea una historia sobre: ") + prompt
@@ -166,209 +155,43 @@ def generate_with_openai(prompt, option):
     def remove_parentheses(text):
         return re.sub(r'\([^)]*\)', '', text).strip()
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            seed=abs(hash(prompt + option)) % 10000000,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.7
-        )
-        content = response.choices[0].message.content.strip()
-        return remove_parentheses(content)
-    except Exception as e:
-        st.error(f"Error al generar contenido con OpenAI: {str(e)}")
-        return ""
-
-def process_with_gemini(text, status_placeholder):
-    """Procesa el texto transcrito con Gemini para formatearlo como guión."""
-    prompt_template = os.getenv("PROMPT_GEMINI_HISTORIA", "Formatea la siguiente transcripción como un guión narrado:\n\n") # Fallback
-    if not prompt_template:
-        st.error("Error: Variable de entorno PROMPT_GEMINI_HISTORIA no configurada.")
-        return None
-
-    full_prompt = prompt_template + text
-
-    try:
-        status_placeholder.text(f"✨ Procesando transcripción con Gemini ({GEMINI_MODEL_NAME})...")
-        model = genai.GenerativeModel(GEMINI_MODEL_NAME)
-        # Llamada SIN safety_settings
-        response = model.generate_content(full_prompt)
-
-        if response.text:
-            status_placeholder.text("✅ Procesamiento con Gemini completado.")
-            return response.text.strip()
-        else:
-            reason = "Razón desconocida"
-            try: # Safe access to response attributes
-                 if response.prompt_feedback and response.prompt_feedback.block_reason:
-                      reason = f"Bloqueado: {response.prompt_feedback.block_reason}"
-                 elif response.candidates and response.candidates[0].finish_reason:
-                      reason = f"Finalizado: {response.candidates[0].finish_reason}"
-                 else:
-                      reason = "Respuesta vacía."
-            except Exception:
-                 pass
-            st.error(f"Gemini ({GEMINI_MODEL_NAME}) no devolvió texto útil. {reason}")
-            print(f"--- Respuesta Gemini (sin texto útil) ---\n{response}\n------------------------------------")
-            return None
-
-    except Exception as e:
-        st.error(f"Error durante la llamada a Gemini API ({GEMINI_MODEL_NAME}): {e}")
-        return None
-
-# --- Función Descarga YouTube ---
-def download_youtube_video_and_extract_audio(url, status_placeholder):
-    """
-    Descarga video de YouTube (360p MP4) y extrae audio a MP3 usando FFmpeg.
-    """
-    temp_dir = tempfile.mkdtemp()
-    video_filename = "youtube_video.mp4"
-    audio_filename = "extracted_audio.mp3"
-    video_path = Path(temp_dir) / video_filename
-    audio_path = Path(temp_dir) / audio_filename
-
-    ydl_opts = {
-        'format': 'bestvideo[height<=360][ext=mp4]+bestaudio[ext=m4a]/best[height<=360][ext=mp4]/best[height<=360]',
-        'outtmpl': str(video_path),
-        'quiet': True,
-        'no_warnings': True,
-        'noprogress': True,
-        'noplaylist': True,
+    request = {
+        "model": "gpt-4o-mini",
+        "seed": semilla_estable(prompt + option), # Estable entre ejecuciones (hash() cambia por proceso)
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        "temperature": 0.7
     }
+    cached_content = cache_llm.obtener(request)
+    if cached_content is not None:
+        return remove_parentheses(cached_content)
 
     try:
-        status_placeholder.text("📥 Descargando video YouTube (360p MP4)...")
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([url])
-
-        if not video_path.exists() or video_path.stat().st_size == 0:
-            raise yt_dlp.utils.DownloadError("Archivo video vacío/no encontrado tras descarga.")
-
-        status_placeholder.text("🎬 Video descargado. Extrayendo audio (FFmpeg)...")
-        ffmpeg_cmd = [
-            'ffmpeg', '-i', str(video_path), '-vn', '-acodec', 'libmp3lame',
-            '-ab', '192k', '-ar', '44100', '-y', str(audio_path)
-        ]
-
-        try:
-            result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True, check=True, encoding='utf-8', errors='ignore')
-            if result.stderr and any(err in result.stderr.lower() for err in ["error", "fail", "invalid"]):
-                 st.warning(f"FFmpeg reportó problemas extracción:\n{result.stderr[:500]}...")
-
-            if not audio_path.exists() or audio_path.stat().st_size == 0:
-                raise Exception("Fallo extracción audio FFmpeg (MP3 vacío/no creado).")
-
-            status_placeholder.text("✅ Audio MP3 extraído.")
-            return str(audio_path), temp_dir
-
-        except FileNotFoundError:
-            st.error("Error Crítico: FFmpeg no encontrado. Instálalo en el PATH.")
-            raise
-        except subprocess.CalledProcessError as e:
-            st.error(f"FFmpeg falló extracción (código {e.returncode}):\n{e.stderr}")
-            raise
-        except Exception as e_ffmpeg:
-             st.error(f"Error extracción FFmpeg: {e_ffmpeg}")
-             raise
-
-    except yt_dlp.utils.DownloadError as e_dl:
-        st.error(f"Error yt-dlp descarga video: {e_dl}")
-        if os.path.isdir(temp_dir): shutil.rmtree(temp_dir)
-        return None, None
-    except Exception as e_main:
-        st.error(f"Error proceso obtención audio: {e_main}")
-        if os.path.isdir(temp_dir): shutil.rmtree(temp_dir)
-        return None, None
-    finally:
-        if video_path.exists():
-            try:
-                os.remove(video_path)
-            except OSError as e_clean:
-                print(f"Adv: No se pudo limpiar video temp {video_path}: {e_clean}")
-
-# --- Función Transcripción Whisper con Chunking ---
-def transcribe_audio_whisper(audio_path_str, status_placeholder):
-    """
-    Transcribe audio MP3 usando Whisper, dividiendo en fragmentos si es necesario.
-    """
-    audio_path = Path(audio_path_str)
-    if not audio_path.exists():
-        st.error(f"Audio MP3 no existe: {audio_path}")
-        return None
-
-    full_transcript = ""
-    chunk_files_to_clean = []
-
-    try:
-        status_placeholder.text("🎙️ Cargando audio para transcripción...")
-        audio = AudioSegment.from_file(audio_path)
-        duration_ms = len(audio)
-        status_placeholder.text(f"Duración total: {duration_ms / 1000:.1f}s. Preparando fragmentos...")
-
-        num_chunks = math.ceil(duration_ms / WHISPER_CHUNK_DURATION_MS)
-        if num_chunks == 0:
-             st.warning("Audio vacío o demasiado corto.")
-             return ""
-
-        status_placeholder.text(f"Dividiendo en {num_chunks} fragmento(s) para Whisper...")
-
-        for i in range(num_chunks):
-            start_ms = i * WHISPER_CHUNK_DURATION_MS
-            end_ms = min((i + 1) * WHISPER_CHUNK_DURATION_MS, duration_ms)
-            chunk = audio[start_ms:end_ms]
-
-            chunk_fd, chunk_path_str = tempfile.mkstemp(suffix=".mp3")
-            os.close(chunk_fd)
-            chunk_path = Path(chunk_path_str)
-            chunk_files_to_clean.append(chunk_path)
-
-            status_placeholder.text(f"Exportando fragmento {i + 1}/{num_chunks} ({start_ms//1000}s - {end_ms//1000}s)...")
-            try:
-                chunk.export(chunk_path, format="mp3")
-                if chunk_path.stat().st_size == 0:
-                    st.warning(f"Fragmento {i+1} vacío. Saltando.")
+        if on_partial_text is None:
+            response = client.chat.completions.create(**request)
+            content = response.choices[0].message.content.strip()
+        else:
+            received = []
+            for chunk in client.chat.completions.create(**request, stream=True):
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
                     continue
-            except Exception as e_export:
-                st.warning(f"Error exportando fragmento {i+1}: {e_export}. Saltando.")
-                continue
-
-            status_placeholder.text(f"Transcribiendo fragmento {i + 1}/{num_chunks} con Whisper...")
-            try:
-                with open(chunk_path, "rb") as chunk_file:
-                    response = client.audio.transcriptions.create(
-                        model="whisper-1",
-                        file=chunk_file,
-                        response_format="text"
-                    )
-                transcript_part = response if isinstance(response, str) else str(response)
-                full_transcript += transcript_part + " "
-                status_placeholder.text(f"Fragmento {i + 1}/{num_chunks} transcrito.")
-
-            except Exception as e_whisper:
-                st.warning(f"Error transcribiendo fragmento {i + 1}: {e_whisper}. Saltando.")
-
-        status_placeholder.text("✅ Transcripción completada (todos los fragmentos).")
-        return full_transcript.strip()
-
+                received.append(delta)
+                on_partial_text("".join(received))
+            content = "".join(received).strip()
+        cache_llm.guardar(request, content)
+        return remove_parentheses(content)
     except Exception as e:
-        st.error(f"Error general durante transcripción con fragmentos: {e}")
-        return None
-    finally:
-        for chunk_file_path in chunk_files_to_clean:
-            if chunk_file_path.exists():
-                try:
-                    os.remove(chunk_file_path)
-                except OSError as e_clean_chunk:
-                    print(f"Adv: No se pudo limpiar chunk {chunk_file_path}: {e_clean_chunk}")
+        st.error(f"Error al generar contenido con OpenAI: {str(e)}")
+        return ""
 
 # --- Funciones TTS y Narradores ---
 async def get_voices():
-    """Obtiene lista de voces de Edge TTS."""
+    """Obtiene lista de voces de Edge TTS (catálogo compartido en disco, refrescado en segundo plano)."""
     try:
-        return await edge_tts.list_voices()
+        return (await asyncio.to_thread(obtener_catalogo))["voces"]
     except Exception as e:
         st.error(f"Error obtener voces EdgeTTS: {e}")
         return []
@@ -380,224 +203,18 @@ def load_filtered_voices():
 
 async def generate_sample(voice_id, speed=DEFAULT_SPEED_SLIDER_VALUE):
     """Genera audio de muestra."""
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3")
-    temp_file.close()
-    audio_data = None
     try:
-        rate_str = f"{int((speed - 1) * 100):+}%"
-        communicate = edge_tts.Communicate(SAMPLE_TEXT, voice_id, rate=rate_str)
-        await communicate.save(temp_file.name)
-        async with aiofiles.open(temp_file.name, mode='rb') as f:
-            audio_data = await f.read()
+        return await synthesize_to_bytes(SAMPLE_TEXT, voice_id, speed)
     except Exception as e:
          st.error(f"Error generando muestra para {voice_id}: {e}")
-    finally:
-        if os.path.exists(temp_file.name):
-            os.unlink(temp_file.name)
-    return audio_data
+         return None
 
 def get_narrator_voice_settings(narrator_name, default_gender="female"):
-    """Obtiene voz_id y velocidad para narrador, usando defaults."""
-    voice_id = None
-    speed = None
-
-    # Intentar desde session_state
-    if narrator_name in st.session_state.narrator_voices:
-        voice_info = st.session_state.narrator_voices[narrator_name]
-        if isinstance(voice_info, dict) and "id" in voice_info:
-            voice_id = voice_info["id"]
-            speed = st.session_state.narrator_speeds.get(narrator_name, voice_info.get("speed"))
-
-    # Si falla, usar defaults
-    if voice_id is None or speed is None:
-        gender = st.session_state.gender_selection.get(narrator_name, default_gender)
-        try:
-            if gender not in FILTERED_VOICES or not FILTERED_VOICES[gender]:
-                raise ValueError(f"No hay voces config. para género '{gender}'.")
-
-            default_voice_info = list(FILTERED_VOICES[gender].values())[0]
-            voice_id = default_voice_info["id"]
-            speed = default_voice_info.get("speed", DEFAULT_SPEED_SLIDER_VALUE)
-
-            # Guardar defaults en estado
-            st.session_state.narrator_voices[narrator_name] = default_voice_info
-            st.session_state.narrator_speeds[narrator_name] = speed
-
-        except Exception as e:
-             st.error(f"Fallo obtener voz default para '{narrator_name}' ({gender}): {e}.")
-             # Fallback final (primera voz femenina)
-             try:
-                 fallback_voice_info = list(FILTERED_VOICES["female"].values())[0]
-                 voice_id = fallback_voice_info["id"]
-                 speed = DEFAULT_VOICE_SPEED
-                 st.warning(f"Usando fallback: {voice_id}")
-             except Exception:
-                  st.error("¡FALLBACK FALLÓ! No hay voces femeninas config.")
-                  voice_id = None # Indicar fallo total
-                  speed = DEFAULT_VOICE_SPEED
-
-    return voice_id, speed
-
-async def _generate_single_part(text, voice_id, speed, output_path):
-    """Genera MP3 para un segmento de texto."""
-    if not text or not voice_id:
-        st.warning(f"Saltando parte: Texto/Voz ID faltante (Voz: {voice_id})")
-        return False
-    try:
-        rate_str = f"{int((speed - 1) * 100):+}%"
-        communicate = edge_tts.Communicate(text, voice_id, rate=rate_str)
-        await communicate.save(output_path)
-        if os.path.exists(output_path) and os.path.getsize(output_path) > 100:
-            return True
-        else:
-             st.warning(f"Archivo vacío/no creado para '{voice_id}'.")
-             if os.path.exists(output_path):
-                 os.remove(output_path)
-             return False
-    except Exception as e:
-        st.warning(f"Error generando parte con voz {voice_id}: {e}")
-        return False
-
-async def generate_full_audio(title_text, script, outro_text, outro_enabled, narrator_voices, narrator_speeds, progress_bar=None, progress_text=None):
-    """Genera archivo de audio completo combinando partes."""
-    temp_dir_obj = tempfile.TemporaryDirectory()
-    temp_dir = temp_dir_obj.name
-    segments = []
-    total_steps = 0
-    current_step = 0
-    has_any_audio = False
-
-    # Calcular pasos
-    if title_text: total_steps += 1
-    pattern = r'\[([^\]]+)\](.*?)(?=\n\[|\Z)'
-    matches = re.findall(pattern, script, re.DOTALL)
-    total_steps += len(matches)
-    if outro_enabled and outro_text: total_steps += 1
-    total_steps += 1 # Combinación
-
-    def update_progress(step, message):
-        progress = min(1.0, step / total_steps) if total_steps > 0 else 0
-        if progress_bar: progress_bar.progress(progress)
-        if progress_text: progress_text.text(f"({int(progress*100)}%) {message}")
-
-    # Generar Título
-    if title_text:
-        current_step += 1
-        update_progress(current_step, "Generando Título...")
-        voice_id, speed = get_narrator_voice_settings(TITLE_NARRATOR_NAME, "male")
-        if voice_id:
-            title_file = os.path.join(temp_dir, "title_part.mp3")
-            if await _generate_single_part(title_text.strip(), voice_id, speed, title_file):
-                segments.append({"type": "audio", "path": title_file})
-                if matches or (outro_enabled and outro_text):
-                    segments.append({"type": "pause", "duration": PAUSE_BETWEEN_SECTIONS_MS})
-                has_any_audio = True
-        else:
-            st.warning(f"No se pudo obtener voz para '{TITLE_NARRATOR_NAME}'. Saltando título.")
-
-    # Generar Script
-    for i, (narrator, text_part) in enumerate(matches):
-        current_step += 1
-        narrator = narrator.strip()
-        text_part = text_part.strip()
-        update_progress(current_step, f"Generando parte {i + 1}/{len(matches)} ({narrator})...")
-        if text_part:
-            voice_id, speed = get_narrator_voice_settings(narrator)
-            if voice_id:
-                 output_file = os.path.join(temp_dir, TEMP_AUDIO_FILE_PATTERN.format(i))
-                 if await _generate_single_part(text_part, voice_id, speed, output_file):
-                     if has_any_audio:
-                         segments.append({"type": "crossfade", "duration": CROSSFADE_DURATION_MS})
-                     segments.append({"type": "audio", "path": output_file})
-                     has_any_audio = True
-                 else:
-                     st.warning(f"Fallo al generar audio para '{narrator}'. Saltando parte.")
-            else:
-                 st.warning(f"No se pudo obtener voz para '{narrator}'. Saltando parte.")
-        else:
-             st.info(f"Parte vacía para narrador '{narrator}'. Saltando.")
-
-    # Generar Outro
-    if outro_enabled and outro_text:
-        current_step += 1
-        update_progress(current_step, "Generando Outro...")
-        if has_any_audio:
-             segments.append({"type": "pause", "duration": PAUSE_BETWEEN_SECTIONS_MS})
-        voice_id, speed = get_narrator_voice_settings(OUTRO_NARRATOR_NAME, "female")
-        if voice_id:
-            outro_file = os.path.join(temp_dir, "outro_part.mp3")
-            if await _generate_single_part(outro_text.strip(), voice_id, speed, outro_file):
-                if segments and segments[-1]["type"] == "pause" and len(segments) > 1:
-                     segments.append({"type": "crossfade", "duration": CROSSFADE_DURATION_MS})
-                segments.append({"type": "audio", "path": outro_file})
-                has_any_audio = True
-        else:
-             st.warning(f"No se pudo obtener voz para '{OUTRO_NARRATOR_NAME}'. Saltando outro.")
-
-    # Combinar
-    current_step += 1
-    audio_segment_paths = [s["path"] for s in segments if s['type'] == 'audio']
-    if not audio_segment_paths:
-        st.error("No se generó ningún segmento de audio válido para combinar.")
-        update_progress(total_steps, "Error: No hay audio para combinar.")
-        temp_dir_obj.cleanup()
-        return None
-
-    update_progress(current_step, f"Combinando {len(audio_segment_paths)} partes de audio...")
-    combined_audio = AudioSegment.empty()
-    last_audio_segment = None
-
-    try:
-        for idx, segment_info in enumerate(segments):
-            segment_type = segment_info["type"]
-            if segment_type == "audio":
-                try:
-                    current_segment = AudioSegment.from_file(segment_info["path"])
-                    if last_audio_segment is not None and idx > 0 and segments[idx-1]["type"] == "crossfade":
-                         cf_duration = segments[idx-1]["duration"]
-                         safe_cf = min(cf_duration, len(last_audio_segment) // 2, len(current_segment) // 2)
-                         if safe_cf > 10:
-                              combined_audio = combined_audio.append(current_segment, crossfade=safe_cf)
-                         else:
-                              combined_audio += current_segment
-                    else:
-                         combined_audio += current_segment
-                    last_audio_segment = current_segment
-                except Exception as e_load:
-                    st.warning(f"Error cargando segmento {segment_info['path']}: {e_load}. Saltando.")
-                    continue
-            elif segment_type == "pause":
-                if len(combined_audio) > 0:
-                    combined_audio += AudioSegment.silent(duration=segment_info["duration"])
-                last_audio_segment = None
-
-        if len(combined_audio) > 0:
-            timestamp = st.session_state.last_run_timestamp
-            output_filename = GENERATED_AUDIO_FILENAME.format(timestamp)
-            output_path = Path(OUTPUT_SUBDIR) / output_filename
-            combined_audio.export(output_path, format="mp3")
-            update_progress(total_steps, "¡Audio combinado con éxito!")
-            return str(output_path)
-        else:
-            st.error("Error: No se pudieron cargar los segmentos de audio generados.")
-            update_progress(total_steps, "Error combinando audio.")
-            return None
-    except Exception as e:
-        st.error(f"Error inesperado al combinar los archivos de audio: {e}")
-        update_progress(total_steps, f"Error combinando audio: {e}")
-        return None
-    finally:
-        temp_dir_obj.cleanup()
-
-def detect_narrators(script_text):
-    """Detecta nombres [Narrador] en el texto."""
-    if not script_text: return []
-    pattern = r'\[([^\]]+)\]'
-    narrators = list(set(
-        n.strip() for n in re.findall(pattern, script_text)
-        if n.strip() and n.strip() not in [TITLE_NARRATOR_NAME, OUTRO_NARRATOR_NAME]
-    ))
-    return sorted(narrators)
+    """Obtiene voz_id y velocidad para narrador desde session_state (los defaults se guardan en el estado)."""
+    return resolve_voice_settings(
+        narrator_name, st.session_state.narrator_voices, st.session_state.narrator_speeds,
+        st.session_state.gender_selection, default_gender, StreamlitReporter()
+    )
 
 def update_narrators_and_defaults():
     """Actualiza lista de narradores y asegura configs por defecto."""
@@ -651,38 +268,10 @@ def on_extract_youtube():
     st.session_state.edited_gemini_content = ""
     update_narrators_and_defaults()
 
-    status = st.status("Procesando YouTube...", expanded=True)
-    audio_path = None
-    temp_dir_path = None
-    try:
-        # Usar la nueva función de descarga/extracción
-        audio_path, temp_dir_path = download_youtube_video_and_extract_audio(url, status)
-        if not audio_path:
-            raise Exception("Fallo al obtener audio MP3 de YouTube.")
-
-        # Usar la nueva función de transcripción con chunking
-        transcript = transcribe_audio_whisper(audio_path, status)
-        if transcript is None: # Vacío "" es OK, None indica error
-            raise Exception("Fallo en transcripción Whisper.")
-        st.session_state.transcription_result = transcript
-
-        gemini_processed_text = process_with_gemini(transcript, status)
-        if gemini_processed_text is None:
-            raise Exception("Fallo en procesamiento Gemini.")
-
-        st.session_state.gemini_result = gemini_processed_text
-        st.session_state.edited_gemini_content = gemini_processed_text
-        status.update(label="¡Proceso completado! Revisa y acepta el guión.", state="complete", expanded=False)
-
-    except Exception as e:
-        status.update(label=f"Error: {e}", state="error", expanded=True)
-    finally:
-        # Limpieza del directorio temporal (contiene MP3 si existe)
-        if temp_dir_path and os.path.isdir(temp_dir_path):
-            try:
-                shutil.rmtree(temp_dir_path)
-            except OSError as e_clean:
-                print(f"Adv: No se pudo limpiar dir temp {temp_dir_path}: {e_clean}")
+    # Descarga, transcripción y Gemini en un trabajo en segundo plano; el panel de trabajos recoge el guión
+    st.session_state.youtube_job_id = get_job_queue().submit(
+        "youtube", {"url": url, "audio_only": st.session_state.youtube_audio_only}
+    )
 
 def on_accept_gemini_story():
     """Callback aceptar guión editado de Gemini."""
@@ -769,8 +358,22 @@ def on_generate_content_openai():
     st.session_state.edited_content = ""
     update_narrators_and_defaults()
 
+    latency = st.empty()
+    preview = st.empty()
+    start_time = time.monotonic()
+    first_text = True
+
+    def show_partial_text(text):
+        nonlocal first_text
+        if first_text:
+            # Latencia hasta el primer texto recibido (queda visible tras generar)
+            latency.caption(f"Primer texto de ChatGPT en {time.monotonic() - start_time:.2f}s")
+            first_text = False
+        preview.markdown(text)
+
     with st.spinner("Generando con ChatGPT..."):
-        generated = generate_with_openai(prompt, option)
+        generated = generate_with_openai(prompt, option, on_partial_text=show_partial_text)
+        preview.empty()
         st.session_state.generated_content = generated
         st.session_state.edited_content = generated
 
@@ -799,88 +402,73 @@ def delete_generated_video():
             st.session_state.generated_video_path = None
         st.warning("No hay video generado para eliminar.")
 
-def parse_duration_from_filename(filename):
-    """Extrae duración HH_MM_SS_ del nombre y devuelve segundos."""
-    match = re.match(VIDEO_FILENAME_PATTERN, filename)
-    if match:
-        try:
-            return int(match.group(1))*3600 + int(match.group(2))*60 + int(match.group(3))
-        except ValueError:
-            return None
-    return None
-
-def find_suitable_video(target_duration_sec):
-    """Encuentra video base aleatorio adecuado en duración."""
-    suitable_videos = []
-    if not VIDEO_SOURCE_FOLDER.is_dir():
-        st.error(f"Carpeta videos base no encontrada: {VIDEO_SOURCE_FOLDER}")
-        return None
-
-    for item in VIDEO_SOURCE_FOLDER.iterdir():
-        if item.is_file() and item.suffix.lower() == ".mp4":
-            video_duration = parse_duration_from_filename(item.name)
-            if video_duration is not None and video_duration >= target_duration_sec:
-                suitable_videos.append(item)
-
-    if not suitable_videos:
-        st.warning(f"No hay videos base >= {target_duration_sec:.2f}s en '{VIDEO_SOURCE_FOLDER}'.")
-        return None
-    return random.choice(suitable_videos)
-
-def create_video_with_audio(audio_path_str, video_filename_pattern, status_placeholder=None):
-    """Crea video combinando audio y video base con FFmpeg."""
-    audio_path = Path(audio_path_str)
-    if not audio_path.exists():
-        st.error(f"Audio no encontrado para crear video: {audio_path}")
-        return None
-
-    def update_status(message):
-        if status_placeholder:
-            status_placeholder.text(message)
+# --- Trabajos en Segundo Plano ---
+JOB_STATUS_LABELS = {STATUS_QUEUED: "⏳ En cola", STATUS_RUNNING: "⚙️ En curso", STATUS_DONE: "✅ Listo",
+                     STATUS_FAILED: "❌ Falló", STATUS_CANCELLED: "🚫 Cancelado"}
 
-    try:
-        update_status("Calculando duración audio...")
-        audio = AudioSegment.from_file(audio_path)
-        audio_duration_sec = len(audio) / 1000.0
-        update_status(f"Duración: {audio_duration_sec:.2f}s. Buscando video base...")
-
-        video_source_path = find_suitable_video(audio_duration_sec)
-        if not video_source_path:
-            return None # Error ya mostrado
-
-        update_status(f"Video base: {video_source_path.name}. Preparando FFmpeg...")
-        timestamp = st.session_state.last_run_timestamp
-        output_video_filename = video_filename_pattern.format(timestamp)
-        output_video_path = Path(OUTPUT_SUBDIR) / output_video_filename
-
-        ffmpeg_cmd = [
-            "ffmpeg", "-i", str(video_source_path), "-i", str(audio_path),
-            "-map", "0:v:0", "-map", "1:a:0", "-c:v", "copy", "-c:a", "aac",
-            "-b:a", "192k", "-shortest", "-t", str(audio_duration_sec), "-y",
-            str(output_video_path)
-        ]
-
-        update_status("Ejecutando FFmpeg (combinando audio y video)...")
-        try:
-            result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True, check=True, encoding='utf-8', errors='ignore')
-            if result.stderr and any(err in result.stderr.lower() for err in ["error", "fail", "invalid"]):
-                 st.warning(f"FFmpeg reportó problemas:\n{result.stderr[:500]}...")
-            update_status("¡Video generado con éxito!")
-            return str(output_video_path)
-
-        except FileNotFoundError:
-            st.error("Error Crítico: FFmpeg no encontrado. Instálalo y asegúrate que esté en el PATH.")
-            update_status("Error: FFmpeg no encontrado.")
-            return None
-        except subprocess.CalledProcessError as e:
-            st.error(f"FFmpeg falló (código {e.returncode}):\n{e.stderr}")
-            update_status("Error ejecutando FFmpeg.")
-            return None
+def apply_finished_job(job):
+    """Pasa a session_state el resultado de un trabajo terminado (una sola vez por trabajo)."""
+    if job["status"] not in FINISHED_STATUSES or job["id"] in st.session_state.applied_job_ids:
+        return
+    st.session_state.applied_job_ids.append(job["id"])
+    result = job["result"] or {}
+    if job["status"] != STATUS_DONE:
+        return
+    if job["kind"] == "youtube":
+        st.session_state.transcription_result = result.get("transcript")
+        st.session_state.gemini_result = result.get("script")
+        st.session_state.edited_gemini_content = result.get("script") or ""
+    elif job["kind"] == "render":
+        # Los archivos ya están en disco: solo se guardan sus rutas
+        st.session_state.last_run_timestamp = result.get("timestamp")
+        st.session_state.generated_audio_path = result.get("audio_path")
+        st.session_state.generated_video_path = result.get("video_path")
+        st.session_state.tts_part_latencies = result.get("latencies", [])
+
+def show_job(job, title):
+    """Estado, progreso, mensaje y avisos de un trabajo."""
+    st.markdown(f"**{title}** · {JOB_STATUS_LABELS.get(job['status'], job['status'])}")
+    if job["status"] in (STATUS_QUEUED, STATUS_RUNNING):
+        st.progress(min(1.0, job["progress"]))
+        st.caption(job["message"])
+    elif job["status"] == STATUS_FAILED:
+        st.error(job["error"] or job["message"])
+    if job["status"] == STATUS_QUEUED:
+        st.button("Cancelar", key=f"cancel_job_{job['id']}", on_click=get_job_queue().cancel, args=(job["id"],))
+    for entry in job["log"][-5:]:
+        st.caption(f"{'⚠️' if entry['level'] != 'info' else 'ℹ️'} {entry['message']}")
+
+def show_render_jobs(jobs):
+    for job in reversed(jobs):
+        show_job(job, f"Narración {job['params'].get('timestamp') or job['id'][:8]}")
+
+def apply_finished_jobs(jobs):
+    """Aplica los trabajos recién terminados; True si alguno acaba de terminar."""
+    finished = [job for job in jobs if job["status"] in FINISHED_STATUSES and job["id"] not in st.session_state.applied_job_ids]
+    for job in finished:
+        apply_finished_job(job)
+    return bool(finished)
+
+def any_job_active(jobs):
+    return any(job["status"] not in FINISHED_STATUSES for job in jobs)
+
+# Los paneles se refrescan solos (sin rerun de la página) y solo se usan mientras hay trabajos en marcha.
+# Cuando un trabajo termina se vuelve a ejecutar toda la página para mostrar su resultado.
+@st.fragment(run_every=JOB_POLL_INTERVAL_S)
+def youtube_job_panel():
+    job = get_job_queue().get(st.session_state.youtube_job_id)
+    if job is None:
+        return
+    if apply_finished_jobs([job]):
+        st.rerun()
+    show_job(job, "Procesando YouTube")
 
-    except Exception as e:
-        st.error(f"Error inesperado creando video: {e}")
-        update_status(f"Error inesperado creando video: {e}")
-        return None
+@st.fragment(run_every=JOB_POLL_INTERVAL_S)
+def render_jobs_panel():
+    jobs = get_job_queue().get_many(st.session_state.render_job_ids)
+    if apply_finished_jobs(jobs):
+        st.rerun()
+    show_render_jobs(jobs)
 
 # --- UI Principal (Layout y Widgets) ---
 st.set_page_config(layout="wide", page_title="Narrador TTS Pro")
@@ -945,10 +533,24 @@ with script_input_container:
             value=st.session_state.youtube_url,
             on_change=on_youtube_url_change
         )
+        st.checkbox(
+            "Solo audio (transcribir mientras se descarga)",
+            key="youtube_audio_only",
+            help="Descarga solo el stream de audio y transcribe cada fragmento en cuanto está listo. Si falla, se descarga el video completo."
+        )
         extract_disabled = not bool(st.session_state.youtube_url)
         if st.button("🎤 Extraer y Procesar Guión YouTube", key="extract_youtube_btn", type="primary", disabled=extract_disabled):
             on_extract_youtube()
 
+        if st.session_state.youtube_job_id:
+            youtube_job = get_job_queue().get(st.session_state.youtube_job_id)
+            if youtube_job and any_job_active([youtube_job]):
+                youtube_job_panel()
+            elif youtube_job:
+                apply_finished_jobs([youtube_job])
+                if youtube_job["status"] != STATUS_DONE:
+                    show_job(youtube_job, "Procesando YouTube")
+
         # Editor para resultado Gemini
         if st.session_state.gemini_result is not None:
             st.info("Revisa y edita el guión procesado por Gemini:")
@@ -1169,6 +771,13 @@ else:
 st.markdown("---")
 st.subheader("4. Generar Audio y Video Final")
 
+st.number_input(
+    "Peticiones TTS simultáneas:",
+    min_value=1, max_value=32, step=1,
+    key="tts_max_concurrency",
+    help="Número máximo de partes que se sintetizan a la vez con Edge TTS."
+)
+
 generation_disabled = not bool(st.session_state.get('script', ''))
 generation_tooltip = "Primero debes aceptar un guión." if generation_disabled else "Genera los archivos MP3 y MP4 finales"
 
@@ -1177,122 +786,35 @@ if st.button("🚀 Generar Audio y Video", type="primary", key="generate_button"
     if not st.session_state.script:
         st.error("Error: No hay guión cargado para generar.")
     else:
-        st.session_state.generated_audio_path = None
-        st.session_state.generated_video_path = None
-        st.session_state.last_run_timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-
-        progress_container = st.container()
-        results_container = st.container()
-        final_audio_path = None
-        final_video_path = None
-        audio_success = False
-        video_success = False
-
-        with progress_container:
-            st.info("Iniciando proceso de generación...")
-            audio_progress_bar = st.progress(0.0)
-            audio_progress_text = st.empty()
-            video_progress_text = st.empty()
-
-            # Generación Audio
-            with st.spinner("Generando audio..."):
-                audio_progress_text.text("Preparando audio...")
-                try:
-                    update_narrators_and_defaults() # Asegurar configs
-                    final_audio_path = asyncio.run(generate_full_audio(
-                        st.session_state.title_text, st.session_state.script, st.session_state.outro_text,
-                        st.session_state.outro_enabled, st.session_state.narrator_voices, st.session_state.narrator_speeds,
-                        audio_progress_bar, audio_progress_text
-                    ))
-                    if final_audio_path and Path(final_audio_path).exists():
-                        st.session_state.generated_audio_path = final_audio_path
-                        audio_success = True
-                    else:
-                        audio_progress_text.error("Fallo generación archivo audio.")
-                except Exception as e_audio:
-                    audio_progress_text.error(f"Error crítico durante generación audio: {e_audio}")
-                finally:
-                    audio_progress_bar.progress(1.0) # Completar barra
-
-            # Generación Video (si audio OK)
-            if audio_success:
-                with st.spinner("Generando video..."):
-                    video_progress_text.text("Iniciando generación de video...")
-                    try:
-                        final_video_path = create_video_with_audio(
-                            final_audio_path, GENERATED_VIDEO_FILENAME, video_progress_text
-                        )
-                        if final_video_path and Path(final_video_path).exists():
-                            st.session_state.generated_video_path = final_video_path
-                            video_success = True
-                        else:
-                            video_progress_text.warning("No se pudo generar el archivo de video.")
-                    except Exception as e_video:
-                        video_progress_text.error(f"Error crítico durante creación video: {e_video}")
-
-        # Mostrar Resultados
-        with results_container:
-            st.markdown("---")
-            st.subheader("Resultados Generados")
-            res_col1, res_col2 = st.columns(2)
-
-            # Columna Audio
-            with res_col1:
-                st.markdown("##### Audio (.mp3)")
-                audio_path = st.session_state.generated_audio_path
-                if audio_success and audio_path:
-                    try:
-                        with open(audio_path, "rb") as f:
-                            audio_bytes = f.read()
-                        st.audio(audio_bytes, format="audio/mp3")
-                        st.download_button(
-                            "⬇️ Descargar Audio", audio_bytes,
-                            Path(audio_path).name, "audio/mp3", key="dl_audio"
-                        )
-                    except Exception as e:
-                        st.error(f"Error leer/mostrar audio: {e}")
-                        st.session_state.generated_audio_path = None
-                elif not audio_success:
-                    st.error("La generación del audio falló.")
-                else: # Placeholder (should not be reached in normal flow)
-                    st.info("Audio aparecerá aquí.")
-
-            # Columna Video
-            with res_col2:
-                st.markdown("##### Video (.mp4)")
-                video_path = st.session_state.generated_video_path
-                if video_success and video_path:
-                    try:
-                        with open(video_path, "rb") as f:
-                            video_bytes = f.read()
-                        st.video(video_bytes, format="video/mp4")
-                        btn_col1, btn_col2 = st.columns(2)
-                        with btn_col1:
-                            st.button("🗑️ Eliminar Video", key="del_vid", on_click=delete_generated_video, type="secondary")
-                        with btn_col2:
-                            st.button("✅ Guardado", key="save_vid", help=f"En carpeta '{OUTPUT_SUBDIR}'", disabled=True)
-                        st.download_button(
-                            "⬇️ Descargar Video", video_bytes,
-                            Path(video_path).name, "video/mp4", key="dl_vid"
-                        )
-                    except Exception as e:
-                        st.error(f"Error leer/mostrar video: {e}")
-                        if Path(video_path).exists():
-                            st.button("🗑️ Eliminar Video Dañado", key="del_bad_vid", on_click=delete_generated_video, type="secondary")
-                        st.session_state.generated_video_path = None
-                elif audio_success and not video_success:
-                    st.warning("Audio generado, pero la creación del video falló.")
-                elif not audio_success:
-                    st.info("Video no generado (audio falló).")
-                else: # Placeholder
-                    st.info("Video aparecerá aquí.")
-
-# Mostrar resultados previos si existen (y no se acaba de generar)
-elif not st.session_state.get("generate_button", False) and \
-     (st.session_state.generated_audio_path or st.session_state.generated_video_path):
+        update_narrators_and_defaults() # Asegurar configs
+        # La síntesis y el video se generan en un proceso aparte: la página sigue respondiendo
+        # y se pueden lanzar varias narraciones a la vez
+        job_id = get_job_queue().submit("render", {
+            "title_text": st.session_state.title_text, "script": st.session_state.script,
+            "outro_text": st.session_state.outro_text, "outro_enabled": st.session_state.outro_enabled,
+            "narrator_voices": st.session_state.narrator_voices, "narrator_speeds": st.session_state.narrator_speeds,
+            "gender_selection": st.session_state.gender_selection,
+            "max_concurrency": st.session_state.tts_max_concurrency,
+            "timestamp": new_run_timestamp(OUTPUT_SUBDIR),
+        })
+        st.session_state.render_job_ids.append(job_id)
+
+render_jobs = get_job_queue().get_many(st.session_state.render_job_ids)
+if any_job_active(render_jobs):
+    render_jobs_panel()
+else:
+    apply_finished_jobs(render_jobs)
+    show_render_jobs(render_jobs)
+
+if st.session_state.tts_part_latencies:
+    with st.expander("⏱️ Latencia por parte (TTS)"):
+        st.dataframe(st.session_state.tts_part_latencies, use_container_width=True)
+
+# Mostrar los últimos resultados generados (leídos de disco)
+if st.session_state.generated_audio_path or st.session_state.generated_video_path:
 
      st.markdown("---")
-     st.subheader("Resultados Anteriores")
+     st.subheader("Resultados Generados")
      res_col1_prev, res_col2_prev = st.columns(2)
 
      # Columna Audio Previo
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""Índice persistente de la carpeta de videos base.
+
+Guarda para cada clip su duración real (ffprobe), resolución, códec y cuántas veces se
+ha usado, en un JSON de la subcarpeta .video_index/. Al refrescar solo se vuelven a
+consultar los archivos nuevos o modificados (por mtime y tamaño). Las duraciones se
+mantienen ordenadas, así que encontrar los clips de al menos N segundos es un bisect
+(O(log n)), y entre ellos se elige uno de los menos usados para repartir el uso.
+
+Varios procesos (trabajos de render, CLI) comparten el índice: cada cambio relee el
+JSON bajo un lock de archivo entre procesos, aplica el cambio sobre lo leído y lo
+guarda, así que ningún proceso pisa los usos registrados por otro.
+
+El índice y su lock viven en una subcarpeta para que escribirlos no cambie el mtime de
+la carpeta de videos: mientras ese mtime no cambie, refrescar no vuelve a recorrerla.
+"""
+import os
+import sys
+import json
+import time
+import bisect
+import random
+import threading
+from pathlib import Path
+
+from media_info import probe_media
+
+# Lock entre procesos y escritura atómica compartidos con EDGETTS
+_EDGETTS_DIR = str(Path(__file__).resolve().parent.parent / "EDGETTS")
+if _EDGETTS_DIR not in sys.path:
+    sys.path.append(_EDGETTS_DIR)
+from output_allocator import bloqueo_archivo, escritura_atomica
+
+INDEX_DIRNAME = ".video_index"
+INDEX_FILENAME = "index.json"
+INDEX_LOCK_FILENAME = "index.lock"
+LEGACY_INDEX_FILENAME = ".video_index.json" # Versión anterior: índice suelto en la carpeta de videos
+REFRESH_INTERVAL_S = 60 # Releer la carpeta como mucho cada minuto si su mtime no cambia
+VIDEO_EXTENSIONS = {".mp4"}
+
+class VideoLibrary:
+    """Clips de video de una carpeta indexados por duración"""
+
+    def __init__(self, folder, fallback_duration=None):
+        self.folder = Path(folder)
+        index_dir = self.folder / INDEX_DIRNAME
+        self.index_path = index_dir / INDEX_FILENAME
+        self.lock_path = index_dir / INDEX_LOCK_FILENAME
+        self._migrate_legacy_index()
+        # Duración a partir del nombre (p.ej. prefijo HH_MM_SS_) si ffprobe no puede leer el clip
+        self.fallback_duration = fallback_duration
+        self._lock = threading.Lock()
+        self._entries = self._load_index()
+        self._durations = []
+        self._names = []
+        self._folder_mtime = None
+        self._last_refresh = 0.0
+        self._rebuild_sorted()
+
+    def _migrate_legacy_index(self):
+        """Mueve el índice de la versión anterior a la subcarpeta (conserva duraciones y usos)"""
+        legacy_path = self.folder / LEGACY_INDEX_FILENAME
+        if self.index_path.exists() or not legacy_path.exists():
+            return
+        self.index_path.parent.mkdir(exist_ok=True)
+        try:
+            os.replace(legacy_path, self.index_path)
+        except OSError:
+            pass # Lo migró otro proceso entre medias
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f).get("videos", {})
+        except (OSError, ValueError):
+            return {}
+
+    def _update_index(self, change):
+        """Relee el índice del disco bajo el lock entre procesos, aplica change(entries) sobre
+        esa copia y la guarda. Así se parte siempre de los usos registrados por otros procesos."""
+        self.lock_path.parent.mkdir(exist_ok=True)
+        with bloqueo_archivo(str(self.lock_path)):
+            self._entries = self._load_index()
+            self._rebuild_sorted()
+            result = change(self._entries)
+            with escritura_atomica(str(self.index_path)) as temp_path:
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump({"videos": self._entries}, f, ensure_ascii=False)
+        return result
+
+    def _rebuild_sorted(self):
+        ordered = sorted(self._entries.items(), key=lambda item: (item[1]["duration_s"], item[0]))
+        self._durations = [entry["duration_s"] for _, entry in ordered]
+        self._names = [name for name, _ in ordered]
+
+    def _probe(self, path):
+        try:
+            info = probe_media(path)
+            return {"duration_s": info["duration_s"], "width": info["width"], "height": info["height"],
+                    "codec": info["video_codec"]}
+        except Exception as e:
+            duration = self.fallback_duration(path.name) if self.fallback_duration else None
+            if duration is None:
+                print(f"Adv: No se pudo indexar {path.name}: {e}")
+                return None
+            return {"duration_s": float(duration), "width": None, "height": None, "codec": None}
+
+    def refresh(self, force=False):
+        """Actualiza el índice: consulta con ffprobe solo los clips nuevos o modificados."""
+        with self._lock:
+            folder_mtime = self.folder.stat().st_mtime_ns
+            if (not force and folder_mtime == self._folder_mtime
+                    and time.monotonic() - self._last_refresh < REFRESH_INTERVAL_S):
+                return False
+            # ffprobe fuera del lock de archivo: se compara con la última versión guardada
+            # y solo se consultan los clips nuevos o modificados
+            known = self._load_index()
+            probed = {}
+            seen = set()
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    if not entry.is_file() or Path(entry.name).suffix.lower() not in VIDEO_EXTENSIONS:
+                        continue
+                    seen.add(entry.name)
+                    stat = entry.stat()
+                    current = known.get(entry.name)
+                    if current and current["mtime_ns"] == stat.st_mtime_ns and current["size"] == stat.st_size:
+                        continue
+                    probed[entry.name] = (self._probe(Path(entry.path)), stat)
+            removed = set(known) - seen
+            changed = bool(probed or removed)
+            if changed:
+                def apply_changes(entries):
+                    for name, (info, stat) in probed.items():
+                        current = entries.get(name)
+                        if info is None:
+                            entries.pop(name, None)
+                        else:
+                            uses = current["uses"] if current else 0
+                            entries[name] = {**info, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "uses": uses}
+                    for name in removed:
+                        entries.pop(name, None)
+                    self._rebuild_sorted()
+                self._update_index(apply_changes)
+            else:
+                self._entries = known
+                self._rebuild_sorted()
+            self._folder_mtime = folder_mtime
+            self._last_refresh = time.monotonic()
+            return changed
+
+    def pick(self, min_duration_s):
+        """Elige un clip suficientemente largo entre los menos usados y registra el uso. None si no hay."""
+        def choose(entries):
+            start = bisect.bisect_left(self._durations, min_duration_s)
+            if start == len(self._names):
+                return None
+            suitable = self._names[start:]
+            least_uses = min(entries[name]["uses"] for name in suitable)
+            name = random.choice([n for n in suitable if entries[n]["uses"] == least_uses])
+            entries[name]["uses"] += 1
+            return self.folder / name
+
+        with self._lock:
+            return self._update_index(choose)
+
+    def info(self, name):
+        with self._lock:
+            entry = self._entries.get(name)
+            return dict(entry) if entry else None
+
+    def __len__(self):
+        return len(self._names)
+
+
+_libraries = {}
+_libraries_lock = threading.Lock()
+
+def get_video_library(folder, fallback_duration=None):
+    """Devuelve la biblioteca (compartida) de una carpeta, refrescada de forma incremental."""
+    folder = Path(folder)
+    with _libraries_lock:
+        library = _libraries.get(folder)
+        if library is None:
+            library = _libraries[folder] = VideoLibrary(folder, fallback_duration)
+    library.refresh()
+    return library